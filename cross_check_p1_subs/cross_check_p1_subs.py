@@ -23,7 +23,7 @@ from collections import namedtuple
 import logging
 import os
 from pathlib import Path
-from range_strings import find_missing, get_ranges
+from range_strings import ShotIntervals
 import sys
 
 logging.basicConfig(level=logging.info, format='%(message)s')
@@ -89,10 +89,11 @@ def check_all_lines(line_info_list):
 
 def check_missing(name, shot_list):
     ''' Check for missing shots in shot_list. '''
-    shot_list_int = map(int, shot_list)
-    missing = find_missing(list(shot_list_int))
+    shot_list_int = [int(shot) for shot in shot_list]
+    missing = ShotIntervals.from_shots(shot_list_int).complement()
     if missing:
-        logging.info('***missing shots in p111 {} data: {}\n'.format(name, missing))
+        incrementing = shot_list_int[0] <= shot_list_int[-1]
+        logging.info('***missing shots in p111 {} data: {}\n'.format(name, missing.to_string(incrementing)))
     else:
         logging.debug('no missing shots in the shot_list for {}\n'.format(name))
 
@@ -8,14 +8,47 @@ duplicates: [22]
 ranges: 50,25,23-20,9-6,3-1
 missing: 49-26,24,19-10,5-4
 
+ShotIntervals stores the shots as (first, last) ranges, so that missing shots,
+duplicates and set operations between dropboxes scale with the number of gaps
+rather than the number of shots.
+
+The np_ functions are NumPy versions of the list functions for very large shot
+lists, e.g. every sequence in a survey concatenated together. They produce the
+same range strings. NumPy is optional:
+pip3 install numpy
+
+RangeAccumulator takes shots one at a time as they arrive during acquisition
+and keeps the live ranges, gaps and duplicates up to date without re-sorting.
+
+ShotBitmap counts how many times each shot in a dense window of shots is found,
+so that the shots from two dropboxes can be combined by adding the counters.
+
+For flip-flop or multi-source shooting, where each source only fires every
+stride shots, infer_stride finds the shot increment and phase_intervals splits
+the shots into one StridedIntervals for each source, so that a source is not
+reported as missing the other source's shots.
+
 Matthew Oppenheim
-Last update: 2023_06_09
+Last update: 2023_09_20
 '''
 
+from array import array
+import bisect
+from collections import Counter
 import logging
+import math
+import re
+# numpy is only needed for the np_ functions
+try:
+    import numpy as np
+except ModuleNotFoundError as e:
+    np = None
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
+# a shot or a range of shots in a range string, shots can be negative e.g. -3--1
+RANGE_PATTERN = re.compile(r'(-?\d+)(?:\s*-\s*(-?\d+))?$')
+
 # examples used for testing
 in_list = [25,7,9,8,6, 21,20, 3,2,1, 22,23, 50, 22, 22]
 ranges = '50,25,23-20,9-6,3-1'
@@ -40,18 +73,38 @@ def find_duplicates(in_list):
 
 
 def find_missing(in_list):
-    ''' Find missing values in a list of ints. '''
+    ''' Find missing values in a list. '''
     if len(in_list) == 0:
         return []
     incrementing = is_inc(in_list)
-    in_list.sort()
-    non_missing = [x for x in range(in_list[0], in_list[-1]+1)]
-    missing = list(set(in_list) ^ set(non_missing))
-    if incrementing:
-        missing = sorted(missing, reverse=False)
+    # in_list is not sorted in place, callers keep their own shot order
+    missing = ShotIntervals.from_shots(in_list).complement()
+    return missing.shots(incrementing)
+
+
+def infer_stride(in_list, min_shots=10):
+    ''' Find the shot increment, the most common step between distinct shots.
+    Returns 1 unless there are at least min_shots shots and the most common
+    step is at least half of the steps, so a few re-exported shots are not
+    mistaken for a multi-source line. '''
+    if np is not None:
+        shots = np.unique(np.asarray(in_list))
+        if shots.size < max(min_shots, 2):
+            return 1
+        step_counts = np.bincount(np.diff(shots))
+        stride = int(step_counts.argmax())
+        count = step_counts[stride]
     else:
-        missing = sorted(missing, reverse=True)
-    return missing
+        shots = sorted(set(in_list))
+        if len(shots) < max(min_shots, 2):
+            return 1
+        steps = Counter(b - a for a, b in zip(shots, shots[1:]))
+        # ties go to the smallest step, as with np.bincount
+        stride = max(steps, key=lambda step: (steps[step], -step))
+        count = steps[stride]
+    if 2 * count < len(shots) - 1:
+        return 1
+    return stride
 
 
 def is_inc(in_list):
@@ -68,15 +121,110 @@ def get_ranges(in_list):
     if len(in_list) == 0:
         return []
     inc = is_inc(in_list)
-    duplicates = find_duplicates(in_list)
-    if duplicates:
-        ('duplicates: {}'.format(duplicates))
-    in_list = remove_multiples(in_list)
-    ranges = range_tuples(in_list)
-    ranges = consecutives(ranges)
-    if not inc:
-        ranges = reverse_ranges(ranges)
-    return ranges
+    return ShotIntervals.from_shots(in_list).to_string(inc)
+
+
+def np_find_duplicates(in_list):
+    ''' NumPy version of find_duplicates, returns a sorted array. '''
+    values, counts = np.unique(np.asarray(in_list), return_counts=True)
+    return values[counts > 1]
+
+
+def np_find_missing(in_list):
+    ''' NumPy version of find_missing, returns an array. '''
+    shots = np.asarray(in_list)
+    if shots.size == 0:
+        return np.array([], dtype=int)
+    incrementing = is_inc(shots)
+    first = shots.min()
+    present = np.zeros(shots.max() - first + 1, dtype=bool)
+    present[shots - first] = True
+    missing = np.flatnonzero(~present) + first
+    if not incrementing:
+        missing = missing[::-1]
+    return missing
+
+
+def np_get_ranges(in_list):
+    ''' NumPy version of get_ranges. '''
+    if len(in_list) == 0:
+        return []
+    inc = is_inc(in_list)
+    starts, ends = np_range_bounds(in_list)
+    if inc:
+        return consecutives(zip(starts.tolist(), ends.tolist()))
+    return consecutives(zip(ends[::-1].tolist(), starts[::-1].tolist()))
+
+
+def np_range_bounds(in_list):
+    ''' Return arrays of the first and last shots of each consecutive range. '''
+    shots = np.sort(np.asarray(in_list))
+    if shots.size == 0:
+        return shots, shots
+    # np.sort then masking repeats is much faster than np.unique for ints
+    shots = shots[np.concatenate(([True], shots[1:] != shots[:-1]))]
+    breaks = np.flatnonzero(np.diff(shots) != 1)
+    starts = shots[np.concatenate(([0], breaks + 1))]
+    ends = shots[np.concatenate((breaks, [shots.size - 1]))]
+    return starts, ends
+
+
+def np_range_tuples(in_list):
+    ''' NumPy version of range_tuples. Repeated values are removed first. '''
+    starts, ends = np_range_bounds(in_list)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def np_shot_intervals(in_list):
+    ''' Create a ShotIntervals from a large shot list or array using NumPy. '''
+    values, counts = np.unique(np.asarray(in_list), return_counts=True)
+    repeated = counts > 1
+    intervals = ShotIntervals()
+    intervals.ranges = np_range_tuples(values)
+    intervals.duplicates = dict(zip(values[repeated].tolist(), (counts[repeated] - 1).tolist()))
+    return intervals
+
+
+def parse_ranges(ranges):
+    ''' Parse a range string, e.g. '50, 25, 23-20, 9-6', or a list of shots and
+    range strings, e.g. [33, '50-60', '72-80'], into (first, last) tuples.
+    Descending ranges are returned as (lowest, highest). The ranges are never
+    expanded into individual shots. '''
+    if isinstance(ranges, str):
+        ranges = ranges.split(',')
+    tuples = []
+    for single_range in ranges:
+        single_range = str(single_range).strip()
+        if not single_range:
+            continue
+        match = RANGE_PATTERN.match(single_range)
+        if match is None:
+            raise ValueError('not a shot or range of shots: {}'.format(single_range))
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) is not None else first
+        tuples.append((min(first, last), max(first, last)))
+    return tuples
+
+
+def phase_intervals(in_list, stride=None):
+    ''' Split shots into {phase: StridedIntervals}, one for each source, where
+    phase is shot % stride. The stride is inferred if it is not supplied. '''
+    if stride is None:
+        stride = infer_stride(in_list)
+    phases = {}
+    if np is not None:
+        shots = np.asarray(in_list)
+        shot_phases = shots % stride
+        for phase in np.unique(shot_phases).tolist():
+            reduced = (shots[shot_phases == phase] - phase) // stride
+            phases[phase] = StridedIntervals(np_shot_intervals(reduced), stride, phase)
+        return phases
+    grouped = {}
+    for shot in in_list:
+        grouped.setdefault(shot % stride, []).append((shot - shot % stride) // stride)
+    for phase in sorted(grouped):
+        phases[phase] = StridedIntervals(ShotIntervals.from_shots(grouped[phase]), stride, phase)
+    return phases
 
 
 def range_tuples(in_list):
@@ -121,6 +269,561 @@ def reverse_ranges(ranges):
     return ', '.join(reversed)
 
 
+class RangeAccumulator():
+    ''' Collect shots as they arrive and keep the consecutive ranges up to date.
+    Each shot is found in the ranges with a binary search, the shot history is
+    not re-sorted. A shot next to a range extends it in place. A shot that opens
+    a new gap, or fills a single shot gap, inserts into or deletes from the range
+    lists, which costs O(gaps), but gaps are few compared with the shots.
+    Shooting direction is taken from the first and latest shots.
+    e.g.
+    accumulator = RangeAccumulator()
+    accumulator.add_shots([1779, 1780, 1782])
+    accumulator.to_string()
+    '1779-1780, 1782'
+    accumulator.gaps().to_string()
+    '1781'
+    '''
+
+
+    def __init__(self, shots=None):
+        self.starts = []
+        self.ends = []
+        self.duplicates = {}
+        self.first_shot = None
+        self.latest_shot = None
+        self.count = 0
+        if shots is not None:
+            self.add_shots(shots)
+
+
+    def __len__(self):
+        return self.count
+
+
+    def add(self, shot):
+        ''' Add a shot. Returns False if the shot was already found. '''
+        if self.first_shot is None:
+            self.first_shot = shot
+        self.latest_shot = shot
+        index = bisect.bisect_right(self.starts, shot) - 1
+        if index >= 0 and self.ends[index] >= shot:
+            self.duplicates[shot] = self.duplicates.get(shot, 0) + 1
+            return False
+        joins_below = index >= 0 and self.ends[index] == shot - 1
+        joins_above = index + 1 < len(self.starts) and self.starts[index+1] == shot + 1
+        if joins_below and joins_above:
+            # shot fills a single shot gap, join the two ranges
+            self.ends[index] = self.ends[index+1]
+            del self.starts[index+1]
+            del self.ends[index+1]
+        elif joins_below:
+            self.ends[index] = shot
+        elif joins_above:
+            self.starts[index+1] = shot
+        else:
+            self.starts.insert(index+1, shot)
+            self.ends.insert(index+1, shot)
+        self.count += 1
+        return True
+
+
+    def add_shots(self, shots):
+        ''' Add a batch of shots. Returns a list of the shots that were new. '''
+        return [shot for shot in shots if self.add(shot)]
+
+
+    def duplicate_shots(self):
+        ''' Return the duplicated shots as a ShotIntervals. '''
+        return ShotIntervals.from_shots(self.duplicates)
+
+
+    def gaps(self):
+        ''' Return the missing shots between the first and last shots found. '''
+        return self.intervals().complement()
+
+
+    def incrementing(self):
+        ''' Detect if the shots are incrementing from the first and latest shots. '''
+        if self.first_shot is None:
+            return True
+        return self.latest_shot >= self.first_shot
+
+
+    def intervals(self):
+        ''' Return a ShotIntervals copy of the current ranges and duplicates. '''
+        intervals = ShotIntervals()
+        intervals.ranges = list(zip(self.starts, self.ends))
+        intervals.duplicates = dict(self.duplicates)
+        return intervals
+
+
+    def to_string(self, incrementing=None):
+        ''' Live range string, in the same format as get_ranges. '''
+        if incrementing is None:
+            incrementing = self.incrementing()
+        return self.intervals().to_string(incrementing)
+
+
+class ShotBitmap():
+    ''' Counter for each shot in a dense window of shots, e.g. 1779-4931.
+    self.counts[shot - self.first] is the number of times the shot was found,
+    stored in an array('H'), so a 30k shot line takes 60 kB.
+    The window grows in either direction as shots are added.
+    '''
+
+    # array('H') counters saturate at this value
+    MAX_COUNT = 65535
+
+
+    def __init__(self, first=None, last=None):
+        self.first = first
+        self.counts = array('H')
+        if first is not None and last is not None:
+            self.counts = array('H', [0]) * (last - first + 1)
+
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in self.present_ranges())
+
+
+    def __or__(self, other):
+        return self.union(other)
+
+
+    def add(self, shot):
+        ''' Count a shot. '''
+        self.grow(shot)
+        index = shot - self.first
+        if self.counts[index] < self.MAX_COUNT:
+            self.counts[index] += 1
+
+
+    def add_shots(self, shots):
+        ''' Count a list of shots. '''
+        for shot in shots:
+            self.add(shot)
+        return self
+
+
+    def combine(self, other, combine_counts):
+        ''' Return a new ShotBitmap covering both windows with the counters
+        combined by combine_counts(a, b). '''
+        if other.first is None:
+            return self.copy()
+        if self.first is None:
+            return other.copy()
+        first = min(self.first, other.first)
+        last = max(self.first + len(self.counts), other.first + len(other.counts)) - 1
+        combined = ShotBitmap(first, last)
+        if np is not None:
+            total = np.zeros(len(combined.counts), dtype=np.uint32)
+            counts = np.frombuffer(self.counts, dtype=np.uint16)
+            other_counts = np.frombuffer(other.counts, dtype=np.uint16)
+            total[self.first-first:self.first-first+counts.size] = counts
+            offset = other.first - first
+            total[offset:offset+other_counts.size] = combine_counts(total[offset:offset+other_counts.size],
+                    other_counts)
+            combined.counts = array('H', np.minimum(total, self.MAX_COUNT).astype(np.uint16).tobytes())
+            return combined
+        combined.counts[self.first-first:self.first-first+len(self.counts)] = self.counts
+        offset = other.first - first
+        for index, count in enumerate(other.counts):
+            total = combine_counts(combined.counts[offset+index], count)
+            combined.counts[offset+index] = min(total, self.MAX_COUNT)
+        return combined
+
+
+    def copy(self):
+        ''' Return a copy. '''
+        copied = ShotBitmap()
+        copied.first = self.first
+        copied.counts = array('H', self.counts)
+        return copied
+
+
+    def duplicates(self):
+        ''' Return {shot: number of extra copies} for shots found more than once. '''
+        if self.first is None:
+            return {}
+        if np is not None:
+            counts = np.frombuffer(self.counts, dtype=np.uint16)
+            indexes = np.flatnonzero(counts > 1)
+            return dict(zip((indexes + self.first).tolist(), (counts[indexes] - 1).tolist()))
+        return {self.first + index: count - 1 for index, count in enumerate(self.counts) if count > 1}
+
+
+    def grow(self, shot):
+        ''' Extend the window to include shot. The window at least doubles, so
+        that adding a decrementing line is not quadratic. '''
+        if self.first is None:
+            self.first = shot
+            self.counts = array('H', [0])
+            return
+        size = len(self.counts)
+        if shot < self.first:
+            extra = max(self.first - shot, size)
+            self.counts = array('H', [0]) * extra + self.counts
+            self.first -= extra
+        elif shot >= self.first + size:
+            extra = max(shot - self.first - size + 1, size)
+            self.counts.extend(array('H', [0]) * extra)
+
+
+    def intervals(self):
+        ''' Return the shots found as a ShotIntervals, including duplicates. '''
+        intervals = ShotIntervals()
+        intervals.ranges = self.present_ranges()
+        intervals.duplicates = self.duplicates()
+        return intervals
+
+
+    def merge(self, other):
+        ''' Add the counters of two bitmaps, as if the shot lists were concatenated.
+        Shots found in both are counted as duplicates. '''
+        return self.combine(other, lambda a, b: a + b)
+
+
+    def missing(self, first=None, last=None):
+        ''' Return the shots between first and last that were not found.
+        Defaults to the first and last shots found. '''
+        return self.intervals().complement(first, last)
+
+
+    def present_ranges(self):
+        ''' Return (first, last) tuples of consecutive shots that were found. '''
+        if self.first is None:
+            return []
+        if np is not None:
+            present = np.flatnonzero(np.frombuffer(self.counts, dtype=np.uint16))
+            return np_range_tuples(present + self.first)
+        ranges = []
+        start = None
+        for index, count in enumerate(self.counts):
+            if count and start is None:
+                start = index
+            elif not count and start is not None:
+                ranges.append((self.first + start, self.first + index - 1))
+                start = None
+        if start is not None:
+            ranges.append((self.first + start, self.first + len(self.counts) - 1))
+        return ranges
+
+
+    def union(self, other):
+        ''' OR two bitmaps, shots found in either. Duplicates within each are kept. '''
+        if np is not None:
+            return self.combine(other, np.maximum)
+        return self.combine(other, max)
+
+
+class ShotIntervals():
+    ''' A set of shots stored as sorted, non-overlapping (first, last) tuples.
+    Memory and the set operations scale with the number of gaps, not the number
+    of shots. Shots that were added more than once are counted in
+    self.duplicates as {shot: number of extra copies}.
+    e.g.
+    ShotIntervals.from_shots([25, 7, 9, 8, 6, 22, 22])
+    ranges: [(6, 9), (22, 22), (25, 25)]
+    duplicates: {22: 1}
+    '''
+
+
+    def __init__(self, ranges=None, duplicates=None):
+        self.ranges = merge_tuples(ranges or [])
+        self.duplicates = dict(duplicates or {})
+
+
+    def __contains__(self, shot):
+        index = bisect.bisect_right(self.ranges, (shot, math.inf)) - 1
+        return index >= 0 and self.ranges[index][1] >= shot
+
+
+    def __eq__(self, other):
+        if not isinstance(other, ShotIntervals):
+            return NotImplemented
+        return self.ranges == other.ranges and self.duplicates == other.duplicates
+
+
+    def __iter__(self):
+        for first, last in self.ranges:
+            yield from range(first, last+1)
+
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in self.ranges)
+
+
+    def __repr__(self):
+        return 'ShotIntervals({}, duplicates={})'.format(self.ranges, self.duplicates)
+
+
+    @classmethod
+    def from_shots(cls, shots):
+        ''' Create from an unsorted list of shots, which is left unchanged. '''
+        ranges = []
+        duplicates = {}
+        first = last = None
+        for shot in sorted(shots):
+            if first is None:
+                first = last = shot
+            elif shot == last:
+                duplicates[shot] = duplicates.get(shot, 0) + 1
+            elif shot == last + 1:
+                last = shot
+            else:
+                ranges.append((first, last))
+                first = last = shot
+        if first is not None:
+            ranges.append((first, last))
+        intervals = cls()
+        intervals.ranges = ranges
+        intervals.duplicates = duplicates
+        return intervals
+
+
+    def complement(self, first=None, last=None):
+        ''' Return the shots between first and last that are not in the set.
+        Defaults to the first and last shots in the set. '''
+        if first is None:
+            first = self.first()
+        if last is None:
+            last = self.last()
+        if first is None or last is None:
+            return ShotIntervals()
+        gaps = []
+        start = first
+        for range_first, range_last in self.ranges:
+            if range_last < start:
+                continue
+            if range_first > last:
+                break
+            if range_first > start:
+                gaps.append((start, range_first-1))
+            start = range_last + 1
+        if start <= last:
+            gaps.append((start, last))
+        return ShotIntervals(gaps)
+
+
+    def count_between(self, first=None, last=None):
+        ''' Return the number of shots between first and last, from the clipped
+        interval lengths. An end that is None is not clipped. '''
+        first = -math.inf if first is None else first
+        last = math.inf if last is None else last
+        return sum(max(0, min(range_last, last) - max(range_first, first) + 1) for range_first, range_last
+            in self.ranges)
+
+
+    def difference(self, other):
+        ''' Return shots in this set that are not in other. '''
+        result = []
+        others = iter(other.ranges)
+        other_range = next(others, None)
+        for first, last in self.ranges:
+            while other_range is not None and other_range[1] < first:
+                other_range = next(others, None)
+            start = first
+            while other_range is not None and other_range[0] <= last:
+                if other_range[0] > start:
+                    result.append((start, other_range[0]-1))
+                start = max(start, other_range[1]+1)
+                if other_range[1] > last:
+                    break
+                other_range = next(others, None)
+            if start <= last:
+                result.append((start, last))
+        return ShotIntervals(result)
+
+
+    def duplicate_count(self):
+        ''' Return the total number of extra copies of duplicated shots. '''
+        return sum(self.duplicates.values())
+
+
+    def duplicate_shots(self):
+        ''' Return the duplicated shots as a ShotIntervals. '''
+        return ShotIntervals.from_shots(self.duplicates)
+
+
+    def first(self):
+        ''' Return the lowest shot, or None if empty. '''
+        if not self.ranges:
+            return None
+        return self.ranges[0][0]
+
+
+    def intersection(self, other):
+        ''' Return shots that are in both sets. '''
+        result = []
+        i = j = 0
+        while i < len(self.ranges) and j < len(other.ranges):
+            first = max(self.ranges[i][0], other.ranges[j][0])
+            last = min(self.ranges[i][1], other.ranges[j][1])
+            if first <= last:
+                result.append((first, last))
+            if self.ranges[i][1] < other.ranges[j][1]:
+                i += 1
+            else:
+                j += 1
+        return ShotIntervals(result)
+
+
+    def last(self):
+        ''' Return the highest shot, or None if empty. '''
+        if not self.ranges:
+            return None
+        return self.ranges[-1][1]
+
+
+    def merge(self, other):
+        ''' Combine with other as if the two shot lists were concatenated.
+        Shots found in both sets are counted as duplicates. '''
+        duplicates = dict(self.duplicates)
+        for shot, count in other.duplicates.items():
+            duplicates[shot] = duplicates.get(shot, 0) + count
+        for shot in self.intersection(other):
+            duplicates[shot] = duplicates.get(shot, 0) + 1
+        return ShotIntervals(self.ranges + other.ranges, duplicates)
+
+
+    def shots(self, incrementing=True):
+        ''' Return a list of the shots, in decreasing order if not incrementing. '''
+        if incrementing:
+            return list(self)
+        return [shot for first, last in reversed(self.ranges)
+                for shot in range(last, first-1, -1)]
+
+
+    def split_phases(self, stride):
+        ''' Split into {phase: StridedIntervals}, one for each phase with shots,
+        where phase is shot % stride. Each range is split with arithmetic, so this
+        costs O(ranges x stride) rather than O(shots). '''
+        grouped = {}
+        for first, last in self.ranges:
+            for shot in range(first, min(last, first + stride - 1) + 1):
+                phase = shot % stride
+                grouped.setdefault(phase, ([], {}))[0].append(((shot - phase) // stride, (last - phase) // stride))
+        for shot, count in self.duplicates.items():
+            phase = shot % stride
+            grouped.setdefault(phase, ([], {}))[1][(shot - phase) // stride] = count
+        return {phase: StridedIntervals(ShotIntervals(ranges, duplicates), stride, phase)
+                for phase, (ranges, duplicates) in sorted(grouped.items())}
+
+
+    def to_string(self, incrementing=True):
+        ''' Range string in the same format as get_ranges, e.g. 50, 25, 23-20. '''
+        if incrementing:
+            return consecutives(self.ranges)
+        return consecutives([(last, first) for first, last in reversed(self.ranges)])
+
+
+    def union(self, other):
+        ''' Return shots that are in either set. '''
+        return ShotIntervals(self.ranges + other.ranges)
+
+
+class StridedIntervals():
+    ''' Shots from one source that fires every stride shots, e.g. shots 1, 3, 5
+    from one source of a flip-flop pair. The shots are stored in a ShotIntervals
+    as (shot - phase) // stride, so gaps are found in the source's own shots.
+    Has the same methods as ShotIntervals for displaying shot information.
+    Range strings use the real shot numbers, e.g. 1-9 is 1, 3, 5, 7, 9.
+    '''
+
+
+    def __init__(self, intervals, stride, phase):
+        self.intervals = intervals
+        self.stride = stride
+        self.phase = phase
+
+
+    def __iter__(self):
+        for index in self.intervals:
+            yield self.shot(index)
+
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+    def __repr__(self):
+        return 'StridedIntervals({}, stride={}, phase={})'.format(self.intervals, self.stride, self.phase)
+
+
+    @classmethod
+    def from_shots(cls, shots, stride, phase):
+        ''' Create from shots that all have shot % stride == phase. '''
+        return cls(ShotIntervals.from_shots([(shot - phase) // stride for shot in shots]), stride, phase)
+
+
+    def complement(self, first=None, last=None):
+        ''' Return this source's shots between first and last that are not found. '''
+        if first is not None:
+            first = -((self.phase - first) // self.stride)
+        if last is not None:
+            last = (last - self.phase) // self.stride
+        return StridedIntervals(self.intervals.complement(first, last), self.stride, self.phase)
+
+
+    def count_between(self, first=None, last=None):
+        ''' Return the number of this source's shots between first and last. '''
+        if first is not None:
+            first = -((self.phase - first) // self.stride)
+        if last is not None:
+            last = (last - self.phase) // self.stride
+        return self.intervals.count_between(first, last)
+
+
+    def duplicate_shots(self):
+        ''' Return the duplicated shots as a StridedIntervals. '''
+        return StridedIntervals(self.intervals.duplicate_shots(), self.stride, self.phase)
+
+
+    def first(self):
+        ''' Return the lowest shot, or None if empty. '''
+        if self.intervals.first() is None:
+            return None
+        return self.shot(self.intervals.first())
+
+
+    def last(self):
+        ''' Return the highest shot, or None if empty. '''
+        if self.intervals.last() is None:
+            return None
+        return self.shot(self.intervals.last())
+
+
+    def shot(self, index):
+        ''' Convert a stored index back to a shot number. '''
+        return index * self.stride + self.phase
+
+
+    def shots(self, incrementing=True):
+        ''' Return a list of the shots, in decreasing order if not incrementing. '''
+        return [self.shot(index) for index in self.intervals.shots(incrementing)]
+
+
+    def to_string(self, incrementing=True):
+        ''' Range string using shot numbers, e.g. 1-9 for 1, 3, 5, 7, 9. '''
+        ranges = [(self.shot(first), self.shot(last)) for first, last in self.intervals.ranges]
+        if incrementing:
+            return consecutives(ranges)
+        return consecutives([(last, first) for first, last in reversed(ranges)])
+
+
+def merge_tuples(ranges):
+    ''' Sort and join overlapping or adjacent (first, last) tuples. '''
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
 if __name__ == '__main__':
     logging.info('ranges: {}'.format(get_ranges(in_list)))
     logging.info('missing: {}'.format(get_ranges(find_missing(in_list))))
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+''' Timing of SEG-D file arrivals in a dropbox, from the file modification times.
+The times come from the directory snapshot, so no files are opened.
+
+For the files in a sequence folder, in modification time order:
+    median interval     median time between one file and the next
+    stalls              intervals longer than STALL_FACTOR x the median
+    bursts              at least MIN_BURST files arriving faster than
+                        BURST_FRACTION x the median, e.g. late re-exports to
+                        dropbox02, where the median from dropbox01 is used
+    out of order        shots that arrived after a later shot in the line
+    histogram           number of intervals in bins of multiples of the median
+
+Stalls can then be matched with recorder or transfer problems.
+
+Uses NumPy if it is installed.
+
+Last update: 2023-10-18 Matthew Oppenheim.
+'''
+
+from collections import namedtuple
+from datetime import datetime
+import logging
+from range_strings import ShotIntervals
+import statistics
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# intervals longer than this many median intervals are stalls
+STALL_FACTOR = 5
+
+# files arriving faster than this fraction of the median interval are in a burst
+BURST_FRACTION = 0.2
+
+# fewest files in a burst
+MIN_BURST = 5
+
+# histogram bin edges as multiples of the median interval
+HISTOGRAM_BINS = [0, 0.5, 0.9, 1.1, 2, STALL_FACTOR, float('inf')]
+
+# width of the longest histogram bar
+HISTOGRAM_WIDTH = 40
+
+# tuple for a stall, between shot after and shot before
+Stall = namedtuple('Stall', 'after before start seconds')
+
+# tuple for a burst of files, shots is a ShotIntervals
+Burst = namedtuple('Burst', 'shots start seconds')
+
+# tuple for the timing of the files in a folder, out_of_order is a ShotIntervals
+# and histogram is a list of counts for HISTOGRAM_BINS
+Timing = namedtuple('Timing', 'median stalls bursts out_of_order histogram')
+
+
+def arrival_timing(shots, mtimes, reference=None, incrementing=True):
+    ''' Analyse the arrival of files with shots and mtimes in modification time order.
+    Bursts are found against the reference interval if it is supplied, else the
+    median interval. Returns Timing, or None for fewer than two files. '''
+    if len(shots) < 2:
+        return None
+    if np is not None:
+        return np_arrival_timing(shots, mtimes, reference, incrementing)
+    intervals = [later - earlier for earlier, later in zip(mtimes, mtimes[1:])]
+    median = statistics.median(intervals)
+    stalls = [Stall(shots[index], shots[index+1], mtimes[index], interval)
+            for index, interval in enumerate(intervals) if median and interval > STALL_FACTOR * median]
+    fast = [interval < BURST_FRACTION * (reference or median) for interval in intervals]
+    bursts = [burst(shots, mtimes, first, last) for first, last in runs(fast)]
+    # highest shot so far, or lowest for a decrementing line
+    latest = shots[0]
+    out_of_order = []
+    for shot in shots[1:]:
+        if (shot < latest) if incrementing else (shot > latest):
+            out_of_order.append(shot)
+        else:
+            latest = shot
+    histogram = [0] * (len(HISTOGRAM_BINS) - 1)
+    if median:
+        for interval in intervals:
+            for index, edge in enumerate(HISTOGRAM_BINS[1:]):
+                if interval / median < edge:
+                    histogram[index] += 1
+                    break
+    return Timing(median, stalls, bursts, ShotIntervals.from_shots(out_of_order), histogram)
+
+
+def burst(shots, mtimes, first, last):
+    ''' Return a Burst for the files between the intervals first and last. '''
+    return Burst(ShotIntervals.from_shots(shots[first:last+2]), mtimes[first], mtimes[last+1] - mtimes[first])
+
+
+def display_timing(timing, incrementing=True):
+    ''' Display the median interval, stalls, bursts, out of order shots and histogram. '''
+    if timing is None:
+        return
+    logging.info('median interval between files: {:.1f} s'.format(timing.median))
+    for stall in timing.stalls:
+        logging.info('*** stall of {:.0f} s after shot {} at {}, next shot {}'.format(stall.seconds, stall.after,
+            format_time(stall.start), stall.before))
+    for found in timing.bursts:
+        logging.info('+++ burst of {} files in {:.0f} s at {}: {}'.format(len(found.shots), found.seconds,
+            format_time(found.start), found.shots.to_string(incrementing)))
+    if len(timing.out_of_order):
+        logging.info('+++ shots arriving after a later shot: {}'.format(timing.out_of_order.to_string(incrementing)))
+    logging.info('intervals as multiples of the median:')
+    for low, high, count in zip(HISTOGRAM_BINS, HISTOGRAM_BINS[1:], timing.histogram):
+        bar = '#' * -(-count * HISTOGRAM_WIDTH // max(max(timing.histogram), 1))
+        logging.info('{:>5}-{:<4} {:>6} {}'.format(low, high if high != float('inf') else '', count, bar).rstrip())
+
+
+def format_time(mtime):
+    ''' Format a modification time for display. '''
+    return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def np_arrival_timing(shots, mtimes, reference=None, incrementing=True):
+    ''' NumPy version of arrival_timing. '''
+    shots_array = np.asarray(shots, dtype=np.int64)
+    mtimes = np.asarray(mtimes, dtype=np.float64)
+    intervals = np.diff(mtimes)
+    median = float(np.median(intervals))
+    stalls = []
+    if median:
+        for index in np.flatnonzero(intervals > STALL_FACTOR * median).tolist():
+            stalls.append(Stall(shots[index], shots[index+1], float(mtimes[index]), float(intervals[index])))
+    fast = intervals < BURST_FRACTION * (reference or median)
+    bursts = [burst(shots, mtimes.tolist(), first, last) for first, last in np_runs(fast)]
+    signed = shots_array if incrementing else -shots_array
+    latest = np.maximum.accumulate(signed)
+    out_of_order = shots_array[1:][signed[1:] < latest[:-1]].tolist()
+    histogram = [0] * (len(HISTOGRAM_BINS) - 1)
+    if median:
+        histogram = np.histogram(intervals / median, bins=HISTOGRAM_BINS)[0].tolist()
+    return Timing(median, stalls, bursts, ShotIntervals.from_shots(out_of_order), histogram)
+
+
+def np_runs(flags):
+    ''' NumPy version of runs. '''
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    # a run of n fast intervals is n+1 files
+    keep = ends - starts + 2 >= MIN_BURST
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def runs(flags):
+    ''' Return (first, last) indexes of the runs of True in flags that are long
+    enough to be a burst of MIN_BURST files. '''
+    found = []
+    first = None
+    for index, flag in enumerate(list(flags) + [False]):
+        if flag and first is None:
+            first = index
+        elif not flag and first is not None:
+            if index - first + 1 >= MIN_BURST:
+                found.append((first, index - 1))
+            first = None
+    return found
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+''' Benchmarks for range_strings.py
+Times the range_strings functions on synthetic shot lists and saves the
+results as JSON, so that changes to the functions can be compared run to run.
+
+Shot lists:
+    clean       every shot in the line
+    gaps        one shot in twenty missing
+    duplicates  one shot in five duplicated
+    descending  a clean line shot in decreasing order
+
+To run with the default sizes of 10^3 to 10^7 shots:
+python3 bench_range_strings.py
+The results are saved to bench_range_strings.json in the temporary directory.
+
+To run quickly on smaller lists and save to a named file:
+python3 bench_range_strings.py --sizes 1000 10000 --output before.json
+
+NumPy versions of the functions are timed as well if NumPy is installed.
+'''
+
+import argparse
+from datetime import datetime
+import json
+import logging
+import os
+import platform
+import random
+import range_strings
+from range_strings import find_duplicates, find_missing, get_ranges, range_tuples, reverse_ranges
+import tempfile
+import timeit
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# default number of shots in each synthetic list
+SIZES = [10**3, 10**4, 10**5, 10**6, 10**7]
+
+# first shot of each synthetic line
+FIRST_SHOT = 1000
+
+# seed so every run uses the same shot lists
+SEED = 2023
+
+# number of timing runs for each function, the fastest is kept
+REPEATS = 3
+
+# results are saved in the temporary directory, not in the repository
+BENCH_OUTPUT = os.path.join(tempfile.gettempdir(), 'bench_range_strings.json')
+
+
+def clean_line(size):
+    ''' Every shot in the line, in time order. '''
+    return list(range(FIRST_SHOT, FIRST_SHOT + size))
+
+
+def descending_line(size):
+    ''' A clean line shot in decreasing order. '''
+    return list(range(FIRST_SHOT + size - 1, FIRST_SHOT - 1, -1))
+
+
+def duplicates_line(size):
+    ''' One shot in five duplicated, saved out of order. '''
+    rng = random.Random(SEED)
+    shots = clean_line(size - size // 5)
+    shots += rng.sample(shots, size // 5)
+    rng.shuffle(shots)
+    return shots
+
+
+def gaps_line(size):
+    ''' One shot in twenty missing. '''
+    rng = random.Random(SEED)
+    return [shot for shot in range(FIRST_SHOT, FIRST_SHOT + size + size // 20) if rng.random() > 0.05][:size]
+
+
+LINES = {'clean': clean_line, 'gaps': gaps_line, 'duplicates': duplicates_line, 'descending': descending_line}
+
+
+def benchmark_functions():
+    ''' Return {name: function taking the shot list and its range string}. '''
+    functions = {
+        'get_ranges': lambda shots, ranges: get_ranges(shots),
+        'find_missing': lambda shots, ranges: find_missing(shots),
+        'find_duplicates': lambda shots, ranges: find_duplicates(shots),
+        'range_tuples': lambda shots, ranges: range_tuples(shots),
+        'reverse_ranges': lambda shots, ranges: reverse_ranges(ranges),
+    }
+    if range_strings.np is not None:
+        functions['np_get_ranges'] = lambda shots, ranges: range_strings.np_get_ranges(shots)
+        functions['np_find_missing'] = lambda shots, ranges: range_strings.np_find_missing(shots)
+        functions['np_find_duplicates'] = lambda shots, ranges: range_strings.np_find_duplicates(shots)
+        functions['np_range_tuples'] = lambda shots, ranges: range_strings.np_range_tuples(shots)
+    return functions
+
+
+def run_benchmarks(sizes, repeats):
+    ''' Time each function on each line type and size. '''
+    results = []
+    functions = benchmark_functions()
+    for size in sizes:
+        for line_name, make_line in LINES.items():
+            shots = make_line(size)
+            ranges = get_ranges(shots)
+            array_shots = None
+            if range_strings.np is not None:
+                array_shots = range_strings.np.asarray(shots)
+            for function_name, function in functions.items():
+                # the numpy functions are timed on an array, as they would be used
+                function_shots = array_shots if function_name.startswith('np_') else shots
+                timer = timeit.Timer(lambda: function(function_shots, ranges))
+                seconds = min(timer.repeat(repeat=repeats, number=1))
+                logging.info('{:>9} {:<11} {:<19} {:.6f} s'.format(size, line_name, function_name, seconds))
+                results.append({'function': function_name, 'line': line_name, 'size': size,
+                    'seconds': seconds, 'ranges': len(ranges.split(','))})
+    return results
+
+
+def machine_info():
+    ''' Information to identify the run. '''
+    info = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': None,
+    }
+    if range_strings.np is not None:
+        info['numpy'] = range_strings.np.__version__
+    return info
+
+
+def main(args):
+    logging.info('benchmarking range_strings for sizes: {}'.format(args.sizes))
+    results = run_benchmarks(args.sizes, args.repeats)
+    output = {'machine': machine_info(), 'repeats': args.repeats, 'seed': SEED, 'results': results}
+    with open(args.output, 'w') as bench_file:
+        json.dump(output, bench_file, indent=1)
+    logging.info('saved results: {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='numbers of shots to benchmark')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='timing runs, the fastest is kept')
+    parser.add_argument('--output', type=str, default=BENCH_OUTPUT, help='JSON file to save results to')
+    args = parser.parse_args()
+    main(args)
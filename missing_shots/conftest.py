@@ -0,0 +1,30 @@
+''' Fixtures and helpers shared by the tests
+run using:
+python -m pytest
+'''
+
+import arrival_times
+import file_sizes
+import os
+import pytest
+
+
+def make_files(directory, names):
+    # files written a second apart, in the order given, each containing its name
+    os.makedirs(directory, exist_ok=True)
+    for index, name in enumerate(names):
+        filepath = os.path.join(directory, name)
+        with open(filepath, 'w') as segd:
+            segd.write(name)
+        os.utime(filepath, (1000000000 + index, 1000000000 + index))
+
+
+@pytest.fixture(params=['numpy', 'statistics'])
+def numpy_or_not(request, monkeypatch):
+    # run the test with NumPy, then with the statistics module versions of the functions
+    modules = [arrival_times, file_sizes]
+    if request.param == 'statistics':
+        for module in modules:
+            monkeypatch.setattr(module, 'np', None)
+    elif any(module.np is None for module in modules):
+        pytest.skip('NumPy is not installed')
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+''' Directory listing in a single os.scandir pass.
+Collects the name, type, size and modification time of every entry in a
+directory without changing the working directory. On the NFS mounted dropboxes
+this replaces an os.path.isfile and an os.path.getmtime call for every file.
+
+scan_directories lists several directories at the same time in a thread pool.
+Each dropbox is a different NFS export, so the listings do not wait on each other.
+
+SnapshotCache keeps the listings on disk, one JSON file per directory, keyed on
+the directory's inode, mtime and ctime. Adding, removing or renaming a file
+changes the directory's mtime, so a completed sequence directory is served from
+the cache with a single stat call. Directories changed in the last CACHE_MIN_AGE
+seconds are not cached, as files in them may still be being written.
+
+DirectoryWatch polls a directory during acquisition and returns only the files
+added since the last poll. inotify does not see files written on another NFS
+client, so the directory is polled, and only listed again when its stat changes.
+
+Last update: 2023-09-27 Matthew Oppenheim.
+'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# tuple to describe a directory entry: (filename, is a file, size in bytes, modification time)
+Entry = namedtuple('Entry', 'name is_file size mtime')
+
+# directory to keep the cached snapshots in
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'missing_shots')
+
+# seconds since a directory or any file in it changed before its snapshot is cached
+CACHE_MIN_AGE = 60
+
+# increment if the format of the cache files changes
+CACHE_VERSION = 1
+
+# seconds, a directory changed more recently than this is listed again even if its
+# stat is the same, as the mtime on some NFS servers only changes once a second
+MTIME_RESOLUTION = 2
+
+
+class DirectoryWatch():
+    ''' Poll a directory and return the files added since the last poll. '''
+
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (inode, mtime, ctime) of the directory when it was last listed
+        self.key = None
+        self.names = set()
+
+
+    def changed(self):
+        ''' Check if the directory needs to be listed again.
+        Raises FileNotFoundError if directory does not exist. '''
+        stat = os.stat(self.directory)
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns)
+        if key == self.key and time.time() - stat.st_mtime > MTIME_RESOLUTION:
+            return False
+        self.key = key
+        return True
+
+
+    def poll(self):
+        ''' Return a list of Entry for the files added since the last poll, in time order.
+        Returns an empty list if the directory is unchanged or not found. '''
+        try:
+            if not self.changed():
+                return []
+            entries = snapshot_directory(self.directory)
+        except FileNotFoundError:
+            return []
+        added = [entry for entry in entries if entry.name not in self.names]
+        # keep the current names only, so a file renamed back again is new
+        self.names = {entry.name for entry in entries}
+        return time_sorted_files(added)
+
+
+class SnapshotCache():
+    ''' Directory snapshots kept on disk, reused while the directory is unchanged. '''
+
+
+    def __init__(self, cache_dir=CACHE_DIR, min_age=CACHE_MIN_AGE):
+        self.cache_dir = cache_dir
+        self.min_age = min_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def cache_filepath(self, directory):
+        ''' Path of the cache file for directory. '''
+        directory = os.path.abspath(os.fspath(directory))
+        digest = hashlib.sha1(directory.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, '{}.json'.format(digest))
+
+
+    def clear(self):
+        ''' Remove all the cached snapshots. '''
+        try:
+            filenames = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for filename in filenames:
+            if filename.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+
+    def count(self, hit):
+        ''' Count cache hits and misses, snapshots are taken from several threads. '''
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+    def load(self, directory, key):
+        ''' Return the cached list of Entry for directory if its key matches, else None. '''
+        try:
+            with open(self.cache_filepath(directory)) as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if cached.get('version') != CACHE_VERSION or cached.get('key') != key:
+            return None
+        if cached.get('directory') != os.path.abspath(os.fspath(directory)):
+            return None
+        return [Entry(*fields) for fields in zip(cached['names'], cached['is_file'], cached['sizes'],
+            cached['mtimes'])]
+
+
+    def save(self, directory, key, entries):
+        ''' Write the snapshot of directory to its cache file. '''
+        cached = {
+            'version': CACHE_VERSION,
+            'directory': os.path.abspath(os.fspath(directory)),
+            'key': key,
+            'names': [entry.name for entry in entries],
+            'is_file': [entry.is_file for entry in entries],
+            'sizes': [entry.size for entry in entries],
+            'mtimes': [entry.mtime for entry in entries],
+        }
+        cache_filepath = self.cache_filepath(directory)
+        # unique temporary name so that threads and processes do not write over each other
+        temp_filepath = '{}.{}.{}.tmp'.format(cache_filepath, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_filepath, 'w') as cache_file:
+                json.dump(cached, cache_file, separators=(',', ':'))
+            os.replace(temp_filepath, cache_filepath)
+        except OSError as e:
+            logging.info('cannot write snapshot cache: {} {}'.format(cache_filepath, e))
+
+
+    def snapshot(self, directory):
+        ''' Return a list of Entry for directory, from the cache if the directory is unchanged.
+        Raises FileNotFoundError if directory does not exist. '''
+        # stat before listing, a change during the listing then fails the next key check
+        stat = os.stat(directory)
+        key = [stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns]
+        entries = self.load(directory, key)
+        self.count(entries is not None)
+        if entries is not None:
+            return entries
+        entries = snapshot_directory(directory)
+        newest = max([stat.st_mtime] + [entry.mtime for entry in entries])
+        if time.time() - newest > self.min_age:
+            self.save(directory, key, entries)
+        return entries
+
+
+def scan_directories(directories, workers=None, cache=None):
+    ''' List directories concurrently, using cache if supplied.
+    Returns {directory: list of Entry}, the value is None if a directory is not found. '''
+    directories = list(directories)
+    if not directories:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers or len(directories)) as executor:
+        snapshots = executor.map(lambda directory: scan_directory(directory, cache), directories)
+        return dict(zip(directories, snapshots))
+
+
+def scan_directory(directory, cache=None):
+    ''' Return a list of Entry for directory, or None if it is not found. '''
+    try:
+        return snapshot(directory, cache)
+    except FileNotFoundError:
+        return None
+
+
+def snapshot(directory, cache=None):
+    ''' Return a list of Entry for directory, from cache if one is supplied.
+    Raises FileNotFoundError if directory does not exist. '''
+    if cache is None:
+        return snapshot_directory(directory)
+    return cache.snapshot(directory)
+
+
+def snapshot_directory(directory):
+    ''' Return a list of Entry for everything in directory.
+    Raises FileNotFoundError if directory does not exist. '''
+    entries = []
+    with os.scandir(directory) as dir_entries:
+        for dir_entry in dir_entries:
+            try:
+                is_file = dir_entry.is_file()
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                # file was removed or renamed during the scan
+                continue
+            entries.append(Entry(dir_entry.name, is_file, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def time_sorted_files(entries):
+    ''' Return the file entries sorted in modification time order. '''
+    files = [entry for entry in entries if entry.is_file]
+    files.sort(key=lambda entry: entry.mtime)
+    return files
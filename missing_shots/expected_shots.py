@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+''' Expected first and last shotpoints for each sequence.
+The dropboxes only show the shots that arrived, so shots missing at the start
+or end of a line cannot be seen from the files alone. The first and last
+shotpoints (FSP and LSP) are read from the substitutions.csv file, or from the
+P1 records in the P111 files, in the same way as cross_check_p1_subs.py.
+
+The files are read once for the survey into {sequence: Line_info}. The expected
+shots for a sequence are then a single range, which is compared with the
+ShotIntervals from a dropbox using range arithmetic, not shot by shot.
+
+To list the expected shots for each sequence:
+python3 expected_shots.py subs
+python3 expected_shots.py p111
+
+Last update: 2023-10-04 Matthew Oppenheim.
+'''
+
+import argparse
+from collections import namedtuple
+import logging
+import os
+from range_strings import ShotIntervals
+from shot_store import P111_DIR, P1_LINE_ID, p111_records
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# use a named tuple to store line information, as in cross_check_p1_subs.py
+Line_info = namedtuple('Line_info', 'sequence linename fsp lsp')
+
+# the P111 files are read with shot_store.py, which has their directory and record ids
+SUBS_FILE = r'/nfs/D01/Reveal_Projects/7021_Eni_Hewett_Stmr/substitutions.csv'
+
+# column numbers for information in the substitutions.csv file. Starts at 0:
+SUBS_LINENAME_COLUMN = 1
+SUBS_FSP_COLUMN = 7
+SUBS_LSP_COLUMN = 8
+SUBS_SEQ_COLUMN = 0
+
+# where the expected shots can be read from
+EXPECTED_SOURCES = ['subs', 'p111']
+
+
+def expected_bounds(line_info):
+    ''' Return the lowest and highest expected shots, both None if line_info is None. '''
+    if line_info is None:
+        return None, None
+    return min(line_info.fsp, line_info.lsp), max(line_info.fsp, line_info.lsp)
+
+
+def expected_intervals(line_info):
+    ''' Return the expected shots for a line as a ShotIntervals. '''
+    return ShotIntervals([expected_bounds(line_info)])
+
+
+def outside_shots(intervals, line_info):
+    ''' Return the shots in a ShotIntervals that are outside the expected range. '''
+    if line_info is None:
+        return ShotIntervals()
+    return intervals.difference(expected_intervals(line_info))
+
+
+def read_expected_lines(source):
+    ''' Return {sequence: Line_info} from 'subs' or 'p111', an empty dict for None. '''
+    if source is None:
+        return {}
+    if source == 'subs':
+        lines = read_subs_lines(SUBS_FILE)
+    elif source == 'p111':
+        lines = read_p111_lines(P111_DIR)
+    else:
+        raise ValueError('unknown source for the expected shots: {}'.format(source))
+    logging.info('expected shots for {} sequences from: {}'.format(len(lines), source))
+    return lines
+
+
+def read_p111_lines(p111_dir):
+    ''' Return {sequence: Line_info} from the first and last P1 records in each P111. '''
+    lines = {}
+    for sequence, line_id, split_line in p111_records(p111_dir):
+        if line_id != P1_LINE_ID:
+            continue
+        shot = int(split_line[4])
+        if sequence in lines:
+            lines[sequence] = lines[sequence]._replace(lsp=shot)
+        else:
+            lines[sequence] = Line_info(sequence, split_line[2], shot, shot)
+    return lines
+
+
+def read_subs_lines(subs_filepath):
+    ''' Return {sequence: Line_info} from the substitutions.csv file. '''
+    lines = {}
+    if not os.path.isfile(subs_filepath):
+        logging.info('cannot find file: {}'.format(subs_filepath))
+        return lines
+    with open(subs_filepath, 'r') as subs:
+        for line in subs:
+            line = line.split(',')
+            sequence = line[SUBS_SEQ_COLUMN]
+            # lots of lines just containing ',' in the subs file
+            if not sequence.isnumeric():
+                continue
+            fsp = line[SUBS_FSP_COLUMN].strip()
+            lsp = line[SUBS_LSP_COLUMN].strip()
+            if not (fsp.isdigit() and lsp.isdigit()):
+                continue
+            # make linename match the one in the p111
+            linename = line[SUBS_LINENAME_COLUMN][7:]
+            lines[int(sequence)] = Line_info(int(sequence), linename, int(fsp), int(lsp))
+    return lines
+
+
+def main(args):
+    lines = read_expected_lines(args.source)
+    for sequence in sorted(lines):
+        line_info = lines[sequence]
+        logging.info('{:>6} {:<20} fsp: {:>6} lsp: {:>6}'.format(sequence, line_info.linename,
+            line_info.fsp, line_info.lsp))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', choices=EXPECTED_SOURCES, help='read the expected shots from')
+    # comment out the following line for testing
+    args = parser.parse_args()
+    # uncomment the line below for testing
+    # args = argparse.Namespace(source='subs')
+    main(args)
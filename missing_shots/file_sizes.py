@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+''' Find SEG-D files with an unusual size from a directory snapshot.
+In a sequence almost every file has the same size, so a truncated export or a
+short record stands out against the other files. The sizes are already in the
+directory snapshot, so no files are opened.
+
+A file is an outlier if its size is more than MAD_THRESHOLD scaled median
+absolute deviations (MAD) from the median size of the files. The median and MAD
+are not moved by a few bad files, as a mean and standard deviation would be.
+When nearly every file has the same size the MAD is 0, so sizes differing from
+the median by more than MIN_DEVIATION of the median are outliers.
+
+Uses NumPy if it is installed, the statistics module if not.
+
+Last update: 2023-10-16 Matthew Oppenheim.
+'''
+
+from collections import namedtuple
+from range_strings import ShotIntervals
+import statistics
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+# sizes further than this many scaled MADs from the median are outliers
+MAD_THRESHOLD = 5
+
+# scales the MAD to estimate the standard deviation of normally distributed sizes
+MAD_SCALE = 1.4826
+
+# smallest difference from the median reported, as a fraction of the median
+MIN_DEVIATION = 0.001
+
+# tuple for the result, small and large are ShotIntervals of the outlier shots
+SizeOutliers = namedtuple('SizeOutliers', 'median mad small large')
+
+
+def size_outliers(shots, sizes, threshold=MAD_THRESHOLD):
+    ''' Find the shots with outlier file sizes. shots and sizes are lists of the same
+    length, a shot can appear more than once. Returns SizeOutliers. '''
+    if not len(sizes):
+        return SizeOutliers(None, None, ShotIntervals(), ShotIntervals())
+    if np is not None:
+        return np_size_outliers(shots, sizes, threshold)
+    median = statistics.median(sizes)
+    mad = statistics.median(abs(size - median) for size in sizes)
+    limit = size_limit(median, mad, threshold)
+    small = [shot for shot, size in zip(shots, sizes) if size < median - limit]
+    large = [shot for shot, size in zip(shots, sizes) if size > median + limit]
+    return SizeOutliers(median, mad, ShotIntervals.from_shots(small), ShotIntervals.from_shots(large))
+
+
+def np_size_outliers(shots, sizes, threshold=MAD_THRESHOLD):
+    ''' NumPy version of size_outliers. '''
+    sizes = np.asarray(sizes, dtype=np.int64)
+    shots = np.asarray(shots, dtype=np.int64)
+    median = float(np.median(sizes))
+    deviations = sizes - median
+    mad = float(np.median(np.abs(deviations)))
+    limit = size_limit(median, mad, threshold)
+    small = shots[deviations < -limit].tolist()
+    large = shots[deviations > limit].tolist()
+    return SizeOutliers(median, mad, ShotIntervals.from_shots(small), ShotIntervals.from_shots(large))
+
+
+def size_limit(median, mad, threshold=MAD_THRESHOLD):
+    ''' Return the largest difference from the median size that is not an outlier. '''
+    return max(threshold * MAD_SCALE * mad, MIN_DEVIATION * median)
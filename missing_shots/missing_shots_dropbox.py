@@ -1,20 +1,74 @@
 #!/usr/bin/python3
 ''' List missing shots in dropbox1 and dropbox2 for a sequence.
-Expects a sequence number to be supplied.
 To run on e.g. sequence 38 type:
 ./missing_shots.py 38
+To check a range of sequences, or all the sequences if none are supplied:
+./missing_shots.py 3-45
+./missing_shots.py
+A range open at one end runs from, or up to, the first or last sequence found:
+./missing_shots.py 40-
+./missing_shots.py -12
+A summary table is shown for each sequence, with the full report only for
+sequences with missing or duplicated shots.
+If the line is shot on every other shot number, or every n numbers, the shot
+increment can be supplied, or inferred from the shots:
+./missing_shots.py 38 --stride 2
+./missing_shots.py 38 --stride auto
+For flip-flop or multi-source shooting, the number of sources is supplied, e.g.
+for two sources:
+./missing_shots.py 38 --sources 2
+Missing shots are then listed for each source, which fires every stride x
+sources shots. A source with no shots has all its shots listed as missing.
+To list all four dropbox directories at the same time:
+./missing_shots.py 38 --concurrent
+To write a record for each sequence and dropbox as JSON, JSON lines or CSV,
+e.g. for all the sequences, instead of the report:
+./missing_shots.py --format ndjson > survey.ndjson
+To follow the sequence being acquired, listing the dropboxes every 10 seconds
+and showing new shots, new missing shots and new duplicates as they arrive:
+./missing_shots.py 38 --watch --interval 10
+To take the expected first and last shots of each line from the
+substitutions.csv file or the P111 files, so that shots missing at the start or
+end of a line are found:
+./missing_shots.py 38 --expected subs
+./missing_shots.py --expected p111
+To check that the file number in the SEG-D general header of each file matches
+the shot in the filename:
+./missing_shots.py 38 --verify
+To count the traces in each file and list files with missing channels:
+./missing_shots.py 38 --traces
+./missing_shots.py 38 --traces --aux-channels 4
+To show the median time between files, stalls, bursts of re-exports and shots
+arriving out of order, from the file modification times:
+./missing_shots.py 38 --timing
+Directory listings are cached in ~/.cache/missing_shots and reused while a
+directory is unchanged. To list every directory again:
+./missing_shots.py --no-cache
 Dependancy:
-    range_strings.py needs to be in the same directory as this script
+    range_strings.py, arrival_times.py, dir_snapshot.py, expected_shots.py, file_sizes.py,
+    segd_header.py, segd_traces.py and shot_scan.py need to be in the same directory as this script
 pip3 install termcolor for coloured output text.
 Last update: 2023-06-09 Matthew Oppenheim.
 '''
 
 import argparse
+from arrival_times import arrival_timing, display_timing
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dir_snapshot import DirectoryWatch, SnapshotCache, scan_directories, scan_directory, snapshot, time_sorted_files
+from expected_shots import EXPECTED_SOURCES, expected_bounds, outside_shots, read_expected_lines
+from file_sizes import size_outliers
+import json
 import logging
 import os
-from pathlib import Path
-from range_strings import find_duplicates, find_missing, get_ranges
+from range_strings import (RangeAccumulator, ShotBitmap, ShotIntervals, StridedIntervals, infer_stride, is_inc,
+    phase_intervals)
+import segd_header
+import segd_traces
+from shot_scan import scan_entries, scan_intervals, scan_shots, valid_shot_name
 import sys
+import time
 # Stu added termcolor to highlight missing shots
 # install with 'pip3 install termcolor -U'
 try:
@@ -39,50 +93,174 @@ DROPBOX1_NFH = r'/nfs/dropbox01/dropobp-nfh/'
 # base directory for folders containing re-exported nfh
 DROPBOX2_NFH = r'/nfs/dropbox02/dropobp-nfh/'
 
+# number of sequences checked at the same time for a range of sequences
+WORKERS = 8
+
+# seconds between listings of the dropbox directories in watch mode
+POLL_INTERVAL = 10
+
+# value of --stride to infer the shot increment of the line from the shots
+STRIDE_AUTO = 'auto'
+
+# formats for --format, text is the report, the others write a record for each sequence and dropbox
+FORMATS = ['text', 'json', 'ndjson', 'csv']
+
+# fields of a record for a sequence in a dropbox, or the two dropboxes combined
+RECORD_FIELDS = ['sequence', 'directory', 'dropbox', 'found', 'first', 'last', 'fsp', 'lsp', 'expected',
+    'missing_count', 'missing', 'duplicate_count', 'duplicates', 'outside', 'stride', 'sources', 'median_size',
+    'small_files', 'large_files']
+
+# tuple for the segd and nfh shots in a sequence, each is a ShotIntervals
+Reconciliation = namedtuple('Reconciliation', 'sequence segd nfh segd_only nfh_only incrementing')
+
+# tuple to summarise the shots for a sequence in a dropbox
+Summary = namedtuple('Summary', 'first last missing duplicates')
+
+# tuple for the changes found by a poll in watch mode
+WatchUpdate = namedtuple('WatchUpdate', 'shots intervals gaps new_gaps filled_gaps new_duplicates')
+
 
 class MissingShots():
 
 
-    def __init__(self, directory_path,  *args):
+    def __init__(self, directory_path,  *args, snapshots=None, cache=None, line_info=None,
+            reference_interval=None, shot_scan=None, report=True):
+        # ShotScan made beforehand, the directory is then not listed again
+        self.shot_scan = shot_scan
+        # False to only scan the directory, the caller can use display() later
+        self.report = report
+        # {directory: list of Entry} listed beforehand, e.g. by scan_directories
+        self.snapshots = snapshots or {}
+        # SnapshotCache for directories not listed beforehand
+        self.cache = cache
+        # Line_info with the expected first and last shots, None to use the shots found
+        self.line_info = line_info
+        # seconds between shots to find bursts of files against, e.g. from dropbox1 for dropbox2
+        self.reference_interval = reference_interval
         self.main(directory_path, *args)
 
 
-    def display_duplicates(self, duplicates):
+    def display(self, shot_scan, args):
+        ''' Display the report for a ShotScan. '''
+        self.entries = list(shot_scan.entries)
+        self.shots = list(shot_scan.shots)
+        if args.verify:
+            self.display_header_checks(shot_scan.directory)
+        if args.traces:
+            self.display_trace_checks(shot_scan.directory, args.aux_channels)
+        self.incrementing = shot_scan.incrementing
+        self.bitmap = ShotBitmap().add_shots(self.shots)
+        self.stride = source_stride(self.shots, args.stride)
+        self.display_size_outliers(self.entries, self.incrementing)
+        if args.timing:
+            self.display_arrival_timing(self.entries, self.incrementing)
+        intervals = scan_intervals(shot_scan)
+        self.display_outside(intervals, self.line_info, self.incrementing)
+        if self.stride * args.sources > 1:
+            self.display_source_info(self.shots, self.stride, self.incrementing, self.line_info, args.sources)
+        else:
+            self.display_shot_info(intervals, self.incrementing, self.line_info)
+
+
+    def display_arrival_timing(self, entries, incrementing=True):
+        ''' Display the timing of the file arrivals from the modification times. '''
+        files = [entry for entry in entries if valid_shot_name(entry.name)]
+        self.timing = arrival_timing([int(entry.name[:5]) for entry in files], [entry.mtime for entry in files],
+            self.reference_interval, incrementing)
+        logging.info('\narrival times')
+        display_timing(self.timing, incrementing)
+
+
+    def display_duplicates(self, duplicates, incrementing=True):
         ''' Display information about duplicated shots. '''
         if len(duplicates) == 0:
             logging.info('+++ no duplicates found')
         else:
-            logging.info('+++duplicates: {}'.format(get_ranges(duplicates)))
+            logging.info('+++duplicates: {}'.format(duplicates.to_string(incrementing)))
         return duplicates
 
 
-    def display_missing(self, missing):
+    def display_header_checks(self, directory_path):
+        ''' Check the SEG-D general header of each file and display the files that fail. '''
+        logging.info('\nchecking segd headers')
+        segd_header.display_checks(segd_header.check_directory(directory_path, entries=self.entries))
+
+
+    def display_missing(self, missing, incrementing=True):
         ''' Display missing shot information. '''
         if len(missing) == 0:
             logging.info('+++ no missing shots +++')
             return
+        missing_ranges = missing.to_string(incrementing)
         logging.info('')
         # if termcolor is installed, highlight missing shots
         try:
-            logging.info((colored('!! !! !! ' 'missing shots !! -----> : {}'.format(get_ranges(missing)),'red')))
+            logging.info((colored('!! !! !! ' 'missing shots !! -----> : {}'.format(missing_ranges),'red')))
         except NameError as e:
-            logging.info('+++ missing shots range +++\n\t{}'.format(get_ranges(missing)))
+            logging.info('+++ missing shots range +++\n\t{}'.format(missing_ranges))
         logging.info('')
-        logging.info('first missing shot: {}'.format(missing[0]))
-        logging.info('last missing shot: {}'.format(missing[-1]))
+        first_missing, last_missing = first_last(missing, incrementing)
+        logging.info('first missing shot: {}'.format(first_missing))
+        logging.info('last missing shot: {}'.format(last_missing))
         logging.info('number missing shots: {}'.format(len(missing)))
 
 
-    def display_shot_info(self, shots):
-        ''' Display information about the shots. '''
-        logging.info('\nfirst shot: {}'.format(shots[0]))
-        logging.info('last shot: {}'.format(shots[-1]))
-        missing = find_missing(shots)
-        self.display_missing(missing)
-        number_expected = abs(shots[-1] - shots[0]) + 1
+    def display_outside(self, intervals, line_info, incrementing=True):
+        ''' Display shots found outside the expected first and last shots. '''
+        outside = outside_shots(intervals, line_info)
+        if len(outside):
+            logging.info('*** shots outside the expected range {}-{}: {}'.format(line_info.fsp, line_info.lsp,
+                outside.to_string(incrementing)))
+
+
+    def display_shot_info(self, intervals, incrementing=True, line_info=None, missing=None):
+        ''' Display information about the shots in a ShotIntervals.
+        Missing shots are found between the expected first and last shots in
+        line_info if it is supplied, else between the first and last shots found,
+        unless missing is supplied. '''
+        first_shot, last_shot = first_last(intervals, incrementing)
+        logging.info('\nfirst shot: {}'.format(first_shot))
+        logging.info('last shot: {}'.format(last_shot))
+        if line_info is not None:
+            logging.info('expected first shot: {} last shot: {}'.format(line_info.fsp, line_info.lsp))
+        if missing is None:
+            missing = intervals.complement(*expected_bounds(line_info))
+        self.display_missing(missing, incrementing)
+        # shots outside the expected range are not expected
+        number_expected = intervals.count_between(*expected_bounds(line_info)) + len(missing)
         logging.info('number expected files: {}'.format(number_expected))
-        duplicates = find_duplicates(shots)
-        self.display_duplicates(duplicates)
+        self.display_duplicates(intervals.duplicate_shots(), incrementing)
+
+
+    def display_size_outliers(self, entries, incrementing=True):
+        ''' Display shots with unusually small or large files, from the sizes in the listing. '''
+        outliers = file_size_outliers(entries)
+        if len(outliers.small):
+            logging.info('*** small files, median size {:.0f} bytes: {}'.format(outliers.median,
+                outliers.small.to_string(incrementing)))
+        if len(outliers.large):
+            logging.info('*** large files, median size {:.0f} bytes: {}'.format(outliers.median,
+                outliers.large.to_string(incrementing)))
+
+
+    def display_source_info(self, shots, stride, incrementing=True, line_info=None, sources=1):
+        ''' Display shot information for each source, when each source fires
+        every stride x sources shots. '''
+        logging.info('\nshot increment for each source: {}'.format(stride * sources))
+        for source, (strided, missing) in enumerate(source_missing(shots, stride, line_info, sources).values(), 1):
+            logging.info('\nsource {} (shot % {} = {})'.format(source, stride * sources, strided.phase))
+            if not len(strided):
+                logging.info('*** no shots found for this source')
+            self.display_shot_info(strided, incrementing, line_info, missing)
+
+
+    def display_trace_checks(self, directory_path, aux_channels=segd_traces.AUX_CHANNELS):
+        ''' Count the traces in each file and display the files with missing traces. '''
+        logging.info('\ncounting segd traces')
+        cache_dir = self.cache.cache_dir if self.cache is not None else None
+        checks = segd_traces.check_directory(directory_path, entries=self.entries, cache_dir=cache_dir,
+            expected_auxiliary=aux_channels)
+        segd_header.display_checks(checks)
 
 
     def drop_dir_path(self, sequence, dropbox_dir):
@@ -99,91 +277,482 @@ class MissingShots():
         raise SystemExit
 
 
-    def get_filenames(self, input_dir):
-        ''' Create a list of filenames in input_dir sorted in time order. '''
-        basepath = Path(input_dir)
+    def parse_arguments(self, *args):
+        ''' Parse command line arguments. '''
+        try:
+            args = ''.join(*args)
+        except TypeError:
+            logging.info('no arguments passed, using defaults:')
+
+
+    def scan(self, directory_path):
+        ''' List directory_path, or use its listing in self.snapshots, and return a
+        ShotScan. Returns None if the directory is not found. '''
         try:
-            os.chdir(basepath)
+            if directory_path in self.snapshots:
+                entries = self.snapshots[directory_path]
+                if entries is None:
+                    raise FileNotFoundError(directory_path)
+                return scan_entries(directory_path, entries)
+            # one scandir pass collects the names, types, sizes and mtimes
+            return scan_shots(directory_path, self.cache)
         except FileNotFoundError as e:
-            logging.info('directory path is not found: {}'.format(basepath))
+            logging.info('directory path is not found: {}'.format(directory_path))
             return None
-        filenames = list(filter(os.path.isfile, os.listdir(basepath)))
-        filenames.sort(key=lambda x: os.path.getmtime(x))
-        return filenames
 
 
-    def is_inc(self, shot_list):
-        ''' Detect if shot_list is incrementing or decrementing. '''
-        if shot_list[0] > shot_list[-1]:
-            return False
-        return True
+    def main(self, directory_path, args):
+        sequence = args.sequence.__str__()
+        if self.report:
+            logging.info('\nseq {}'.format(sequence))
+        directory_path = self.drop_dir_path(sequence, directory_path)
+        if not directory_path:
+            return
+        if self.report:
+            logging.info('directory: {}'.format(directory_path))
+        if self.shot_scan is None:
+            self.shot_scan = self.scan(directory_path)
+        if not self.report or self.shot_scan is None or not self.shot_scan.shots:
+            return
+        self.display(self.shot_scan, args)
 
 
-    def correct_shot_name(self, file_name):
-        ''' Check that file_name is a valid segd file. '''
-        if file_name.endswith('.segd') and file_name[:5].isdigit():
-            return True
-        return False
+class RecordWriter():
+    ''' Write records to a stream as json, ndjson or csv as soon as they are made.
+    The stream is flushed after each record, so the output can be piped. json
+    writes a single array, opened by the first record and closed by close(). '''
 
 
-    def parse_arguments(self, *args):
-        ''' Parse command line arguments. '''
-        try:
-            args = ''.join(*args)
-        except TypeError:
-            logging.info('no arguments passed, using defaults:')
+    def __init__(self, output_format, stream=sys.stdout):
+        self.output_format = output_format
+        self.stream = stream
+        self.count = 0
+        self.csv_writer = None
+        if output_format == 'csv':
+            self.csv_writer = csv.DictWriter(stream, fieldnames=RECORD_FIELDS, lineterminator='\n')
+            self.csv_writer.writeheader()
 
 
-    def shot_list(self, filename_list):
-        ''' Extract shots from the filenames. '''
-        shot_list = []
-        for filename in filename_list:
-            # check that the file is a valid segd file
-            if not self.correct_shot_name(filename):
-                continue
-            shot_list.append(int(filename[:5]))
-        return shot_list
+    def close(self):
+        ''' Finish the output. '''
+        if self.output_format == 'json':
+            self.stream.write('\n]\n' if self.count else '[]\n')
+        self.stream.flush()
 
 
-    def sort_shots(self, shot_list):
-        ''' Sort the shots. '''
-        # sometimes the shots are saved out of time order
-        inc = self.is_inc(shot_list)
-        if inc:
-            shot_list.sort()
+    def write(self, record):
+        ''' Write a record. '''
+        if self.output_format == 'csv':
+            self.csv_writer.writerow(record)
+        elif self.output_format == 'ndjson':
+            self.stream.write(json.dumps(record) + '\n')
         else:
-            shot_list.sort(reverse=True)
-        return shot_list
+            self.stream.write(('[\n' if self.count == 0 else ',\n') + json.dumps(record))
+        self.count += 1
+        self.stream.flush()
 
 
-    def main(self, directory_path, args):
-        sequence = args.sequence.__str__()
-        logging.info('\nseq {}'.format(sequence))
-        directory_path = self.drop_dir_path(sequence, directory_path)
-        if not directory_path:
-            return
-        logging.info('directory: {}'.format(directory_path))
-        files = self.get_filenames(directory_path)
-        if not files:
-           return
-        self.shots = self.shot_list(files)
-        self.incrementing = self.is_inc(self.shots)
-        self.sorted_shots = self.sort_shots(self.shots)
-        self.display_shot_info(self.sorted_shots)
-
-
-def sort_list(shot_list, is_incrementing):
-    ''' Sort shot lists. '''
-    if is_incrementing:
-        shot_list.sort()
+class SequenceWatch():
+    ''' Follow a sequence in dropbox1 and dropbox2 during acquisition.
+    Only files added since the last poll are read, the shots are kept in a
+    RangeAccumulator for each dropbox. '''
+
+
+    def __init__(self, dropbox1, dropbox2, sequence, stride=1, sources=1):
+        self.sequence = sequence
+        self.stride = stride
+        self.sources = sources
+        self.watches = [DirectoryWatch(os.path.join(dropbox, sequence)) for dropbox in (dropbox1, dropbox2)]
+        self.accumulators = [RangeAccumulator(), RangeAccumulator()]
+        self.gaps = ShotIntervals()
+        self.duplicates = ShotIntervals()
+
+
+    def incrementing(self):
+        ''' Shooting direction from the first dropbox with shots. '''
+        for accumulator in self.accumulators:
+            if len(accumulator):
+                return accumulator.incrementing()
+        return True
+
+
+    def poll(self):
+        ''' List the directories if they have changed and add the new shots.
+        Returns a WatchUpdate, or None if there are no new shots. '''
+        new_shots = []
+        for watch, accumulator in zip(self.watches, self.accumulators):
+            shots = [int(entry.name[:5]) for entry in watch.poll() if valid_shot_name(entry.name)]
+            accumulator.add_shots(shots)
+            new_shots.extend(shots)
+        if not new_shots:
+            return None
+        # shots found in both dropboxes are duplicates, as for the combined report
+        intervals1, intervals2 = (accumulator.intervals() for accumulator in self.accumulators)
+        intervals = intervals1.union(intervals2)
+        gaps = missing_intervals(intervals, self.stride, sources=self.sources)
+        duplicates = intervals1.duplicate_shots().union(intervals2.duplicate_shots()).union(
+            intervals1.intersection(intervals2))
+        update = WatchUpdate(new_shots, intervals, gaps, gaps.difference(self.gaps), self.gaps.difference(gaps),
+            duplicates.difference(self.duplicates))
+        self.gaps = gaps
+        self.duplicates = duplicates
+        return update
+
+
+def check_sequence(sequence, dropbox1, dropbox2, stride=1, cache=None, line_info=None, sources=1):
+    ''' List and summarise one sequence in both dropboxes, without logging.
+    Returns (sequence, snapshots, dropbox1 Summary, dropbox2 Summary, combined Summary). '''
+    directories = [os.path.join(dropbox1, sequence), os.path.join(dropbox2, sequence)]
+    snapshots = {directory: scan_directory(directory, cache) for directory in directories}
+    shots1, shots2 = (snapshot_shots(snapshots[directory]) for directory in directories)
+    return (sequence, snapshots, shot_summary(shots1, stride, line_info, sources),
+            shot_summary(shots2, stride, line_info, sources), shot_summary(shots1 + shots2, stride, line_info, sources))
+
+
+def check_sequences(dropbox1, dropbox2, args, first_seq=None, last_seq=None, cache=None, lines=None):
+    ''' Check a range of sequences with a worker pool and display a summary table.
+    The full report is only displayed for sequences with missing or duplicated shots.
+    lines is {sequence: Line_info} with the expected first and last shots. '''
+    lines = lines or {}
+    logging.info('\nlooking in: {} {}'.format(dropbox1, dropbox2))
+    sequences = find_sequences([dropbox1, dropbox2], first_seq, last_seq, lines)
+    if not sequences:
+        logging.info('no sequences found')
+        return
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda sequence: check_sequence(sequence, dropbox1, dropbox2, args.stride,
+            cache, lines.get(int(sequence)), args.sources), sequences))
+    display_summary_table(results)
+    for sequence, snapshots, summary1, summary2, combined in results:
+        if combined is None or not (combined.missing or combined.duplicates):
+            continue
+        logging.info('\n*** details for seq {}'.format(sequence))
+        main(dropbox1, dropbox2, argparse.Namespace(**{**vars(args), 'sequence': sequence}), snapshots, cache,
+            lines.get(int(sequence)))
+
+
+def display_reconciliation(reconciliations):
+    ''' Display the shots with segd and no nfh, and the reverse, for each sequence
+    and the totals for the survey. '''
+    header = '{:>6} | {:>6} | {:>6} | {:>12} | {:>12} |'.format('seq', 'segd', 'nfh', 'segd no nfh',
+        'nfh no segd')
+    logging.info('\n{}\n{}'.format(header, '-' * len(header)))
+    for result in reconciliations:
+        status = ' ***' if len(result.segd_only) or len(result.nfh_only) else ''
+        logging.info('{:>6} | {:>6} | {:>6} | {:>12} | {:>12} |{}'.format(result.sequence, len(result.segd),
+            len(result.nfh), len(result.segd_only), len(result.nfh_only), status))
+    unmatched = [result for result in reconciliations if len(result.segd_only) or len(result.nfh_only)]
+    logging.info('\nsurvey: {} sequences, {} segd shots, {} nfh shots'.format(len(reconciliations),
+        sum(len(result.segd) for result in reconciliations), sum(len(result.nfh) for result in reconciliations)))
+    logging.info('segd with no nfh: {} shots, nfh with no segd: {} shots, in {} sequences'.format(
+        sum(len(result.segd_only) for result in reconciliations),
+        sum(len(result.nfh_only) for result in reconciliations), len(unmatched)))
+    for result in unmatched:
+        logging.info('\n*** seq {}'.format(result.sequence))
+        if len(result.segd_only):
+            logging.info('segd with no nfh: {}'.format(result.segd_only.to_string(result.incrementing)))
+        if len(result.nfh_only):
+            logging.info('nfh with no segd: {}'.format(result.nfh_only.to_string(result.incrementing)))
+
+
+def display_summary_table(results):
+    ''' Display a line for each sequence with the summaries for each dropbox and combined. '''
+    header = '{:>6} | {:^26} | {:^26} | {:^26} |'.format('seq', 'dropbox1', 'dropbox2', 'combined')
+    columns = '{:>6} | {:^26} | {:^26} | {:^26} |'.format('', *['first  last  miss  dups'] * 3)
+    logging.info('\n{}\n{}\n{}'.format(header, columns, '-' * len(header)))
+    for sequence, snapshots, summary1, summary2, combined in results:
+        status = ''
+        if combined is not None and (combined.missing or combined.duplicates):
+            status = ' ***'
+        logging.info('{:>6} | {} | {} | {} |{}'.format(sequence, format_summary(summary1),
+            format_summary(summary2), format_summary(combined), status))
+
+
+def display_watch_update(label, sequence, update, incrementing=True):
+    ''' Display the new shots, new gaps and new duplicates found by a poll. '''
+    logging.info('\n{} seq {} {}: {} new shots: {}'.format(time.strftime('%H:%M:%S'), sequence, label,
+        len(update.shots), ShotIntervals.from_shots(update.shots).to_string(incrementing)))
+    logging.info('shots: {}'.format(update.intervals.to_string(incrementing)))
+    if len(update.new_gaps):
+        new_gaps = update.new_gaps.to_string(incrementing)
+        try:
+            logging.info(colored('!! !! !! new missing shots !! -----> : {}'.format(new_gaps), 'red'))
+        except NameError as e:
+            logging.info('+++ new missing shots +++\n\t{}'.format(new_gaps))
+    if len(update.filled_gaps):
+        logging.info('+++ missing shots now found: {}'.format(update.filled_gaps.to_string(incrementing)))
+    if len(update.new_duplicates):
+        logging.info('+++ new duplicates: {}'.format(update.new_duplicates.to_string(incrementing)))
+    logging.info('number missing shots: {}'.format(len(update.gaps)))
+
+
+def dropbox_records(dropbox1, dropbox2, sequences, writer, workers=WORKERS, stride=1, cache=None, lines=None,
+        sources=1):
+    ''' Make the records for each sequence with a worker pool and write them in
+    sequence order as each sequence is finished. '''
+    lines = lines or {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for records in executor.map(lambda sequence: sequence_records(sequence, dropbox1, dropbox2, stride, cache,
+                lines.get(int(sequence)), sources), sequences):
+            for record in records:
+                writer.write(record)
+
+
+def file_size_outliers(entries):
+    ''' Return SizeOutliers for the segd files in a list of Entry. '''
+    files = [entry for entry in entries if valid_shot_name(entry.name)]
+    return size_outliers([int(entry.name[:5]) for entry in files], [entry.size for entry in files])
+
+
+def find_sequences(dropboxes, first_seq=None, last_seq=None, expected=()):
+    ''' Return the sequence folder names in the dropboxes, between first_seq and
+    last_seq if they are supplied, sorted by sequence number. Sequences in
+    expected are included if they have no folder, as all their shots are missing. '''
+    sequences = {str(sequence) for sequence in expected if in_sequence_range(sequence, first_seq, last_seq)}
+    for dropbox in dropboxes:
+        for entry in scan_directory_entries(dropbox):
+            if not entry.name.isdigit():
+                continue
+            if not in_sequence_range(int(entry.name), first_seq, last_seq):
+                continue
+            sequences.add(entry.name)
+    return sorted(sequences, key=int)
+
+
+def first_last(intervals, incrementing):
+    ''' Return the first and last shots of a ShotIntervals in shooting order. '''
+    if incrementing:
+        return intervals.first(), intervals.last()
+    return intervals.last(), intervals.first()
+
+
+def first_last_seq(sequence):
+    ''' Parse a sequence argument, e.g. '22', '3-45', or '3-' and '-45' for a range
+    open at one end. Returns first and last sequence, None for an open end, both
+    None if no sequence is supplied. Exits with a usage message if not valid. '''
+    if not sequence:
+        return None, None
+    seqs = sequence.split('-')
+    if len(seqs) > 2 or not any(seqs) or not all(seq.isdigit() for seq in seqs if seq):
+        raise SystemExit('The sequence needs to be a sequence or a range of sequences, e.g. 22, 3-45, 3- or -45, '
+            'not: {}'.format(sequence))
+    first_seq = int(seqs[0]) if seqs[0] else None
+    last_seq = int(seqs[-1]) if seqs[-1] else None
+    if None not in (first_seq, last_seq) and first_seq > last_seq:
+        raise SystemExit('The last sequence needs to be greater or equal than the first sequence')
+    return first_seq, last_seq
+
+
+def format_summary(summary):
+    ''' Format a Summary as a fixed width table cell. '''
+    if summary is None:
+        return '{:^26}'.format('-')
+    return '{:>5} {:>5} {:>5} {:>5}   '.format(*summary)
+
+
+def in_sequence_range(sequence, first_seq, last_seq):
+    ''' Check that sequence is between first_seq and last_seq, None for an open end. '''
+    return (first_seq is None or first_seq <= sequence) and (last_seq is None or sequence <= last_seq)
+
+
+def missing_intervals(intervals, stride=1, line_info=None, sources=1):
+    ''' Return the missing shots in a ShotIntervals, for each source if stride x
+    sources is more than 1. The stride is inferred from the shots if it is
+    STRIDE_AUTO. Missing shots are found between the expected first and last shots
+    in line_info if it is supplied. The ranges are used, the shots are only listed
+    to infer the stride. '''
+    if stride == STRIDE_AUTO:
+        stride = infer_stride(intervals.shots())
+    if stride * sources <= 1:
+        return intervals.complement(*expected_bounds(line_info))
+    return ShotIntervals.from_shots([shot for strided, missing in
+        phase_missing(intervals.split_phases(stride * sources), stride, line_info, sources).values()
+        for shot in missing])
+
+
+def phase_missing(phases, stride, line_info=None, sources=1):
+    ''' Return {phase: (StridedIntervals, missing StridedIntervals)} for each source
+    from phases, {phase: StridedIntervals} with a stride of stride x sources. See
+    source_missing. '''
+    step = stride * sources
+    first, last = expected_bounds(line_info)
+    lowest = min((strided.first() for strided in phases.values()), default=None)
+    highest = max((strided.last() for strided in phases.values()), default=None)
+    phases = dict(phases)
+    start = lowest if first is None else first
+    if sources > 1 and start is not None:
+        for source in range(sources):
+            phase = (start + source * stride) % step
+            phases.setdefault(phase, StridedIntervals(ShotIntervals(), step, phase))
+    missing = {}
+    for phase in sorted(phases):
+        strided = phases[phase]
+        if len(strided) or line_info is not None:
+            missing[phase] = strided, strided.complement(first, last)
+        else:
+            missing[phase] = strided, strided.complement(lowest, highest)
+    return missing
+
+
+def reconcile_sequence(sequence, shot_dropboxes, nfh_dropboxes, cache=None):
+    ''' Join the segd shots and the nfh shots for a sequence, from both dropboxes
+    of each. Returns Reconciliation. '''
+    shots = []
+    for dropboxes in (shot_dropboxes, nfh_dropboxes):
+        shots.append([shot for dropbox in dropboxes
+            for shot in snapshot_shots(scan_directory(os.path.join(dropbox, sequence), cache))])
+    segd, nfh = (ShotIntervals.from_shots(dropbox_shots) for dropbox_shots in shots)
+    return Reconciliation(sequence, segd, nfh, segd.difference(nfh), nfh.difference(segd),
+        is_inc(shots[0] or shots[1]))
+
+
+def reconcile_sequences(shot_dropboxes, nfh_dropboxes, first_seq=None, last_seq=None, workers=WORKERS,
+        cache=None, lines=None):
+    ''' Reconcile the sequences found in any of the dropboxes, or in lines, with a
+    worker pool. Returns a list of Reconciliation in sequence order. '''
+    sequences = find_sequences([*shot_dropboxes, *nfh_dropboxes], first_seq, last_seq, lines or {})
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda sequence: reconcile_sequence(sequence, shot_dropboxes, nfh_dropboxes,
+            cache), sequences))
+
+
+def scan_directory_entries(directory):
+    ''' Return the entries in directory, or an empty list if it is not found. '''
+    try:
+        return snapshot(directory)
+    except FileNotFoundError:
+        logging.info('cannot find directory: {}'.format(directory))
+        return []
+
+
+def sequence_records(sequence, dropbox1, dropbox2, stride=1, cache=None, line_info=None, sources=1):
+    ''' Return the records for one sequence in dropbox1, dropbox2 and combined. '''
+    directories = [os.path.join(dropbox1, sequence), os.path.join(dropbox2, sequence)]
+    entries1, entries2 = (scan_directory(directory, cache) or [] for directory in directories)
+    shots1, shots2 = snapshot_shots(entries1), snapshot_shots(entries2)
+    records = [shot_record(sequence, directories[0], 'dropbox1', shots1, stride, line_info, sources),
+            shot_record(sequence, directories[1], 'dropbox2', shots2, stride, line_info, sources),
+            shot_record(sequence, None, 'combined', shots1 + shots2, stride, line_info, sources)]
+    for record, entries in zip(records, [entries1, entries2, entries1 + entries2]):
+        outliers = file_size_outliers(entries)
+        incrementing = record['first'] is None or record['first'] <= record['last']
+        record.update(median_size=outliers.median, small_files=outliers.small.to_string(incrementing),
+            large_files=outliers.large.to_string(incrementing))
+    return records
+
+
+def shot_record(sequence, directory, dropbox, shots, stride=1, line_info=None, sources=1):
+    ''' Return a record, a dict with RECORD_FIELDS, for a list of shots in time order.
+    Shots and ranges are in shooting order. '''
+    record = dict.fromkeys(RECORD_FIELDS)
+    record.update(sequence=int(sequence), directory=directory, dropbox=dropbox, found=0, expected=0,
+        missing_count=0, missing='', duplicate_count=0, duplicates='', outside='')
+    if line_info is not None:
+        record.update(fsp=line_info.fsp, lsp=line_info.lsp)
+    if not shots:
+        if line_info is not None:
+            # no shots found, every expected shot is missing
+            missing = ShotIntervals([expected_bounds(line_info)])
+            record.update(expected=len(missing), missing_count=len(missing),
+                missing=missing.to_string(line_info.fsp <= line_info.lsp))
+        return record
+    incrementing = is_inc(shots)
+    intervals = ShotBitmap().add_shots(shots).intervals()
+    stride = source_stride(shots, stride)
+    missing = missing_intervals(intervals, stride, line_info, sources)
+    first_shot, last_shot = first_last(intervals, incrementing)
+    outside = outside_shots(intervals, line_info)
+    record.update(found=len(intervals), first=first_shot, last=last_shot,
+        expected=len(intervals) - len(outside) + len(missing), missing_count=len(missing),
+        missing=missing.to_string(incrementing), duplicate_count=intervals.duplicate_count(),
+        duplicates=intervals.duplicate_shots().to_string(incrementing), outside=outside.to_string(incrementing),
+        stride=stride, sources=sources)
+    return record
+
+
+def shot_summary(shots, stride=1, line_info=None, sources=1):
+    ''' Summarise a list of shots in time order, None if there are no shots and
+    no expected shots in line_info. '''
+    if not shots:
+        if line_info is None:
+            return None
+        first, last = expected_bounds(line_info)
+        return Summary('-', '-', last - first + 1, 0)
+    incrementing = is_inc(shots)
+    bitmap = ShotBitmap().add_shots(shots)
+    intervals = bitmap.intervals()
+    first_shot, last_shot = first_last(intervals, incrementing)
+    stride = source_stride(shots, stride)
+    if stride * sources > 1:
+        missing = sum(len(missing) for strided, missing in source_missing(shots, stride, line_info, sources).values())
     else:
-        shot_list.sort(reverse=True)
-    return shot_list
+        missing = len(intervals.complement(*expected_bounds(line_info)))
+    return Summary(first_shot, last_shot, missing, intervals.duplicate_count())
+
+
+def snapshot_shots(entries):
+    ''' Return the shots from the segd files in a snapshot, in time order. '''
+    if entries is None:
+        return []
+    return [int(entry.name[:5]) for entry in time_sorted_files(entries) if valid_shot_name(entry.name)]
+
+
+def source_missing(shots, stride, line_info=None, sources=1):
+    ''' Return {phase: (StridedIntervals, missing StridedIntervals)} for each source,
+    where stride is the shot increment of the line and each source fires every
+    stride x sources shots. Only the phases with shots are sources, unless sources
+    is more than 1, when each of the sources is expected from the phase of the lowest
+    shot, or expected shot in line_info, and a source with no shots has all of its
+    shots missing between the lowest and highest shots, or the expected shots. '''
+    return phase_missing(phase_intervals(shots, stride * sources), stride, line_info, sources)
+
+
+def source_stride(shots, stride):
+    ''' Return stride, or the stride inferred from shots if it is STRIDE_AUTO. '''
+    if stride == STRIDE_AUTO:
+        return infer_stride(shots)
+    return stride
+
 
-def main(dropbox1, dropbox2, args):
+def stride_argument(value):
+    ''' Parse --stride, a shot increment of 1 or more or STRIDE_AUTO. '''
+    if value == STRIDE_AUTO:
+        return value
+    try:
+        stride = int(value)
+    except ValueError:
+        stride = 0
+    if stride < 1:
+        raise argparse.ArgumentTypeError('stride must be a whole number of 1 or more, or {}'.format(STRIDE_AUTO))
+    return stride
+
+
+def watch_sequence(sequence, args):
+    ''' List the dropboxes for sequence every args.interval seconds and display
+    the changes, until stopped with ctrl-c. '''
+    watches = {
+        'dropobp': SequenceWatch(DROPBOX1_SHOTS, DROPBOX2_SHOTS, sequence, args.stride, args.sources),
+        'dropobp-nfh': SequenceWatch(DROPBOX1_NFH, DROPBOX2_NFH, sequence, args.stride, args.sources),
+    }
+    logging.info('watching seq {} every {} s, ctrl-c to stop'.format(sequence, args.interval))
+    try:
+        while True:
+            for label, watch in watches.items():
+                update = watch.poll()
+                if update is not None:
+                    display_watch_update(label, sequence, update, watch.incrementing())
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        logging.info('\nstopped watching seq {}'.format(sequence))
+
+
+def main(dropbox1, dropbox2, args, snapshots=None, cache=None, line_info=None):
     logging.info('\nlooking in: {} {}'.format(dropbox1, dropbox2))
-    dropped1 = MissingShots(dropbox1, args)
-    dropped2 = MissingShots(dropbox2, args)
+    dropped1 = MissingShots(dropbox1, args, snapshots=snapshots, cache=cache, line_info=line_info)
+    # bursts of re-exports in dropbox2 are found against the shot interval in dropbox1
+    timing = getattr(dropped1, 'timing', None)
+    dropped2 = MissingShots(dropbox2, args, snapshots=snapshots, cache=cache, line_info=line_info,
+        reference_interval=timing.median if timing is not None else None)
     try:
         drop1_incrementing = dropped1.incrementing
     except AttributeError:
@@ -192,25 +761,99 @@ def main(dropbox1, dropbox2, args):
         drop2_incrementing = dropped2.incrementing
     except AttributeError:
         return
-    drop1_shots = dropped1.shots
-    drop2_shots = dropped2.shots
-    # I don't know why the class variables drop1_shots and drop2_shots are
-    # always returned sorted in ascending order, not in the order they
-    # exist in the class, so I added a sort_list function
-    drop1_shots = sort_list(drop1_shots, drop1_incrementing)
-    drop2_shots = sort_list(drop2_shots, drop2_incrementing)
-    all_shots = [*drop1_shots, *drop2_shots]
-    sorted_all_shots = dropped1.sort_shots(all_shots)
     logging.info('\nCombined shots for dropbox1 and dropbox2')
-    dropped1.display_shot_info(sorted_all_shots)
+    dropped1.display_size_outliers(dropped1.entries + dropped2.entries, drop1_incrementing)
+    stride = source_stride([*dropped1.shots, *dropped2.shots], args.stride)
+    if stride * args.sources > 1:
+        dropped1.display_source_info([*dropped1.shots, *dropped2.shots], stride, drop1_incrementing, line_info,
+            args.sources)
+        return
+    # add the shot counters, shots found in both dropboxes are duplicates
+    all_shots = dropped1.bitmap.merge(dropped2.bitmap)
+    dropped1.display_shot_info(all_shots.intervals(), drop1_incrementing, line_info)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('sequence', type=str, nargs='?', default=SEQ, help='sequence to find missing shots')
+    parser.add_argument('sequence', type=str, nargs='?', default=None,
+            help='sequence, or range of sequences e.g. 3-45, 3- or -45, to find missing shots. '
+            'All sequences if not supplied')
+    parser.add_argument('--stride', type=stride_argument, default=1,
+            help='shot increment of the line, e.g. 2 for every other shot, or {} to infer it from the shots'.format(
+            STRIDE_AUTO))
+    parser.add_argument('--sources', type=int, default=1,
+            help='number of sources, e.g. 2 for flip-flop, missing shots are listed for each source')
+    parser.add_argument('--concurrent', action='store_true',
+            help='list the four dropbox directories at the same time')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+            help='number of sequences checked at the same time for a range of sequences')
+    parser.add_argument('--watch', action='store_true',
+            help='list the dropboxes every interval seconds and show new shots, gaps and duplicates')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+            help='seconds between listings in watch mode')
+    parser.add_argument('--format', choices=FORMATS, default='text',
+            help='write a record for each sequence and dropbox as json, ndjson or csv instead of the report')
+    parser.add_argument('--expected', choices=EXPECTED_SOURCES, default=None,
+            help='take the expected first and last shots from the substitutions.csv file or the P111 files')
+    parser.add_argument('--verify', action='store_true',
+            help='check the file number in the segd general header matches the shot in the filename')
+    parser.add_argument('--traces', action='store_true',
+            help='count the traces in each segd file and list files with missing channels')
+    parser.add_argument('--aux-channels', type=int, default=segd_traces.AUX_CHANNELS,
+            help='auxiliary channels in each file for --traces, the number in most of the files if not supplied')
+    parser.add_argument('--timing', action='store_true',
+            help='show the time between files, stalls, bursts and out of order shots from the file times')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+            help='list every directory again instead of using the cached listings')
+    parser.add_argument('--reconcile', action='store_true',
+            help='list the shots with segd and no nfh, and nfh with no segd, for each sequence and the survey')
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT',
+            help='serve the records as json on PORT, checking changed sequences every interval seconds')
+    parser.add_argument('--bind', type=str, default=None, metavar='ADDRESS',
+            help='address to serve on, e.g. 0.0.0.0 for every network interface, 127.0.0.1 if not supplied')
     # comment out the following line for testing
     args = parser.parse_args()
     # uncomment the line below for testing
-    # args = argparse.Namespace(sequence=SEQ)
-    main(DROPBOX1_SHOTS, DROPBOX2_SHOTS, args)
-    main(DROPBOX1_NFH, DROPBOX2_NFH, args)
+    # args = argparse.Namespace(sequence=SEQ, stride=1, sources=1, concurrent=False, workers=WORKERS, cache=True,
+    #     watch=False, interval=POLL_INTERVAL, format='text', expected=None,
+    #     verify=False, traces=False, aux_channels=None, timing=False, reconcile=False, serve=None,
+    #     bind=None)
+    if args.sources < 1:
+        parser.error('--sources must be 1 or more')
+    cache = SnapshotCache() if args.cache else None
+    first_seq, last_seq = first_last_seq(args.sequence)
+    # read once for the survey
+    lines = read_expected_lines(args.expected)
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        for dropbox1, dropbox2 in [(DROPBOX1_SHOTS, DROPBOX2_SHOTS), (DROPBOX1_NFH, DROPBOX2_NFH)]:
+            sequences = find_sequences([dropbox1, dropbox2], first_seq, last_seq, lines)
+            dropbox_records(dropbox1, dropbox2, sequences, writer, args.workers, args.stride, cache, lines,
+                args.sources)
+        writer.close()
+        raise SystemExit
+    if args.reconcile:
+        display_reconciliation(reconcile_sequences([DROPBOX1_SHOTS, DROPBOX2_SHOTS], [DROPBOX1_NFH, DROPBOX2_NFH],
+            first_seq, last_seq, args.workers, cache, lines))
+        raise SystemExit
+    if args.serve is not None:
+        # imported here, as shot_server imports this module
+        from shot_server import serve
+        serve(args.serve, {'dropobp': (DROPBOX1_SHOTS, DROPBOX2_SHOTS), 'dropobp-nfh': (DROPBOX1_NFH, DROPBOX2_NFH)},
+            args, cache, lines)
+        raise SystemExit
+    if args.watch:
+        if first_seq is None or first_seq != last_seq:
+            raise SystemExit('--watch needs a single sequence')
+        watch_sequence(args.sequence, args)
+        raise SystemExit
+    if first_seq is None or first_seq != last_seq:
+        check_sequences(DROPBOX1_SHOTS, DROPBOX2_SHOTS, args, first_seq, last_seq, cache, lines)
+        check_sequences(DROPBOX1_NFH, DROPBOX2_NFH, args, first_seq, last_seq, cache, lines)
+        raise SystemExit
+    snapshots = None
+    if args.concurrent:
+        dropboxes = [DROPBOX1_SHOTS, DROPBOX2_SHOTS, DROPBOX1_NFH, DROPBOX2_NFH]
+        snapshots = scan_directories((os.path.join(dropbox, args.sequence) for dropbox in dropboxes), cache=cache)
+    main(DROPBOX1_SHOTS, DROPBOX2_SHOTS, args, snapshots, cache, lines.get(first_seq))
+    main(DROPBOX1_NFH, DROPBOX2_NFH, args, snapshots, cache, lines.get(first_seq))
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+''' Check the SEG-D general header of each file in a sequence folder.
+The shot in a filename, e.g. 01779.segd, is not always the shot in the file. We
+have had mislabelled files and files that were only partly written. Only the
+first HEADER_BYTES of each file are memory mapped, the trace data is never read.
+
+From general header block 1:
+    file number     bytes 0-1, 4 BCD digits, FFFF if more than 9999
+    date            bytes 10-12, year and julian day in BCD
+    time            bytes 13-15, hour, minute and second in BCD
+    record length   bytes 25-26, 3 BCD digits in units of 0.512 s, FFF if extended
+From general header block 2, which starts at byte 32:
+    expanded file number    bytes 0-2, binary, used if the file number is FFFF
+    revision                bytes 10-11, binary, major and minor
+    extended record length  bytes 14-16, binary, in ms
+
+Files are checked in a thread pool, as each one is a separate NFS round trip.
+
+To check a sequence folder:
+python3 segd_header.py /nfs/dropbox01/dropobp/38
+
+Last update: 2023-10-09 Matthew Oppenheim.
+'''
+
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from dir_snapshot import snapshot_directory, time_sorted_files
+import logging
+import mmap
+import os
+from range_strings import ShotIntervals
+from shot_scan import valid_shot_name
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# bytes mapped from the start of each file, general header blocks 1 and 2
+HEADER_BYTES = 64
+
+# length of a general header block
+BLOCK_BYTES = 32
+
+# number of files checked at the same time
+WORKERS = 16
+
+# record length units in general header block 1 are 0.5 x 1.024 s
+RECORD_LENGTH_UNIT_MS = 512
+
+# tuple for the decoded general header
+SegdHeader = namedtuple('SegdHeader', 'file_number timestamp record_length revision')
+
+# tuple for the result of checking a file, error is None if the file is good
+HeaderCheck = namedtuple('HeaderCheck', 'name shot header error')
+
+
+def bcd(data, start, digits, skip_first_nibble=False):
+    ''' Decode digits BCD digits from data starting at byte start.
+    Raises ValueError if a nibble is not a decimal digit. '''
+    value = 0
+    nibble = 1 if skip_first_nibble else 0
+    for index in range(nibble, nibble + digits):
+        byte = data[start + index // 2]
+        digit = byte >> 4 if index % 2 == 0 else byte & 0x0f
+        if digit > 9:
+            raise ValueError('invalid BCD digit at byte {}'.format(start + index // 2))
+        value = value * 10 + digit
+    return value
+
+
+def check_directory(directory, workers=WORKERS, entries=None):
+    ''' Check the header of every segd file in directory, in time order.
+    entries is a list of Entry if the directory has already been listed.
+    Returns a list of HeaderCheck. '''
+    if entries is None:
+        entries = snapshot_directory(directory)
+    names = [entry.name for entry in time_sorted_files(entries) if valid_shot_name(entry.name)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda name: check_file(os.path.join(directory, name)), names))
+
+
+def check_file(filepath):
+    ''' Check that the file number in the general header matches the shot in the filename. '''
+    name = os.path.basename(filepath)
+    shot = int(name[:5])
+    try:
+        header = read_general_header(filepath)
+    except (OSError, ValueError) as e:
+        return HeaderCheck(name, shot, None, str(e))
+    if header.file_number != shot:
+        return HeaderCheck(name, shot, header, 'file number {} does not match'.format(header.file_number))
+    return HeaderCheck(name, shot, header, None)
+
+
+def decode_general_header(data):
+    ''' Decode general header blocks 1 and 2 from the first HEADER_BYTES of a file.
+    Raises ValueError if the header is too short or not valid. '''
+    if len(data) < HEADER_BYTES:
+        raise ValueError('file too short for a general header: {} bytes'.format(len(data)))
+    block2 = data[BLOCK_BYTES:2 * BLOCK_BYTES]
+    if data[0:2] == b'\xff\xff':
+        file_number = int.from_bytes(block2[0:3], 'big')
+    else:
+        file_number = bcd(data, 0, 4)
+    year = bcd(data, 10, 2)
+    # byte 11 high nibble is the number of additional general header blocks
+    julian_day = bcd(data, 11, 3, skip_first_nibble=True)
+    hour, minute, second = bcd(data, 13, 2), bcd(data, 14, 2), bcd(data, 15, 2)
+    if not 1 <= julian_day <= 366 or hour > 23 or minute > 59 or second > 59:
+        raise ValueError('invalid date or time in general header')
+    timestamp = datetime(2000 + year, 1, 1, hour, minute, second) + timedelta(days=julian_day - 1)
+    # byte 25 high nibble is the record type
+    if data[25] & 0x0f == 0x0f and data[26] == 0xff:
+        record_length = int.from_bytes(block2[14:17], 'big')
+    else:
+        record_length = bcd(data, 25, 3, skip_first_nibble=True) * RECORD_LENGTH_UNIT_MS
+    revision = '{}.{}'.format(block2[10], block2[11])
+    return SegdHeader(file_number, timestamp, record_length, revision)
+
+
+def display_checks(checks):
+    ''' Display the files that failed, with the failed shots as a range string. '''
+    failed = [check for check in checks if check.error is not None]
+    logging.info('checked {} files, {} failed'.format(len(checks), len(failed)))
+    for check in failed:
+        logging.info('*** {}: {}'.format(check.name, check.error))
+    if failed:
+        failed_shots = ShotIntervals.from_shots(check.shot for check in failed)
+        logging.info('*** failed shots: {}'.format(failed_shots.to_string()))
+    return failed
+
+
+def read_general_header(filepath):
+    ''' Memory map the first HEADER_BYTES of filepath and decode the general header.
+    Raises ValueError if the file is too short or the header is not valid. '''
+    with open(filepath, 'rb') as segd:
+        size = os.fstat(segd.fileno()).st_size
+        if size < HEADER_BYTES:
+            raise ValueError('file too short for a general header: {} bytes'.format(size))
+        with mmap.mmap(segd.fileno(), HEADER_BYTES, access=mmap.ACCESS_READ) as header:
+            return decode_general_header(header[:HEADER_BYTES])
+
+
+def main(args):
+    for directory in args.directories:
+        logging.info('\nchecking segd headers in: {}'.format(directory))
+        try:
+            checks = check_directory(directory, args.workers)
+        except FileNotFoundError:
+            logging.info('cannot find directory: {}'.format(directory))
+            continue
+        display_checks(checks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directories', type=str, nargs='+', help='sequence folders to check')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of files checked at the same time')
+    # comment out the following line for testing
+    args = parser.parse_args()
+    # uncomment the line below for testing
+    # args = argparse.Namespace(directories=['/nfs/dropbox01/dropobp/17'], workers=WORKERS)
+    main(args)
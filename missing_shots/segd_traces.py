@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+''' Check that each SEG-D file in a sequence folder has every channel.
+A file can have the right name and general header and still be missing traces.
+The channel set descriptors are read from the scan type headers, then each trace
+header is read and the trace data is stepped over without being decoded. The
+traces for each channel set are counted and compared with the channels in the
+descriptor, and the seismic traces with CHANNELS_PER_STREAMER x MAX_STREAMER.
+The auxiliary traces are compared with AUX_CHANNELS, or with --aux-channels, or
+if neither is set with the number of auxiliary traces in most of the files in
+the sequence folder.
+
+The file is memory mapped, so only the pages holding the headers are read.
+
+SEG-D revision 2 layout:
+    general header      32 bytes x (1 + additional blocks in GH1 byte 11)
+    scan type headers   for each scan type, a 32 byte channel set descriptor
+                        for each channel set, then the sample skew blocks
+    extended header     32 bytes x the blocks in GH1 byte 30 or GH2 bytes 5-6
+    external header     32 bytes x the blocks in GH1 byte 31 or GH2 bytes 7-8
+    traces              20 byte trace header, 32 byte trace header extensions,
+                        then the samples
+    general trailer     32 bytes x the blocks in GH2 bytes 12-13
+
+The counts for each file are cached by file size and modification time, so a
+file is only read again if it changes.
+
+To check a sequence folder:
+python3 segd_traces.py /nfs/dropbox01/dropobp/38
+
+To check for e.g. 4 auxiliary channels in each file:
+python3 segd_traces.py /nfs/dropbox01/dropobp/38 --aux-channels 4
+
+Last update: 2023-10-12 Matthew Oppenheim.
+'''
+
+import argparse
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dir_snapshot import CACHE_DIR, snapshot_directory, time_sorted_files
+import hashlib
+import json
+import logging
+import mmap
+import os
+from segd_header import BLOCK_BYTES, HEADER_BYTES, bcd, display_checks
+from shot_scan import valid_shot_name
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# channels in each streamer and number of streamers, as in eni_edits.py
+CHANNELS_PER_STREAMER = 799
+MAX_STREAMER = 6
+
+# auxiliary channels recorded in each file, None to expect the number in most of
+# the files in a sequence folder
+AUX_CHANNELS = None
+
+# channel type in a channel set descriptor for seismic channels
+SEISMIC_CHANNEL_TYPE = 1
+
+# length of a trace header before any extensions
+TRACE_HEADER_BYTES = 20
+
+# bytes per sample for each SEG-D format code
+SAMPLE_BYTES = {8022: 1, 8024: 2, 8036: 3, 8038: 4, 8042: 1, 8044: 2, 8048: 4, 8058: 4, 8080: 8}
+
+# number of files checked at the same time
+WORKERS = 16
+
+# tuple for a channel set descriptor
+ChannelSet = namedtuple('ChannelSet', 'scan_type number channel_type channels samples')
+
+# tuple for the traces counted in a file
+TraceCount = namedtuple('TraceCount', 'seismic auxiliary declared truncated')
+
+# tuple for the result of checking a file, error is None if the file is good
+TraceCheck = namedtuple('TraceCheck', 'name shot count error')
+
+
+def cache_filepath(directory, cache_dir=CACHE_DIR):
+    ''' Path of the trace count cache file for directory. '''
+    directory = os.path.abspath(os.fspath(directory))
+    digest = hashlib.sha1(directory.encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(cache_dir, 'traces-{}.json'.format(digest))
+
+
+def channel_sets(data, general_blocks, scan_types, sets_per_scan, skew_blocks, base_scan_interval):
+    ''' Decode the channel set descriptors. Returns {(scan type, channel set): ChannelSet}. '''
+    descriptors = {}
+    offset = general_blocks * BLOCK_BYTES
+    for scan_type in range(scan_types):
+        for index in range(sets_per_scan):
+            descriptor = data[offset:offset + BLOCK_BYTES]
+            start_time, end_time = (int.from_bytes(descriptor[i:i+2], 'big') for i in (2, 4))
+            # times are in 2 ms units, the base scan interval is in 1/16 ms units
+            samples = (end_time - start_time) * 32 // base_scan_interval if base_scan_interval else 0
+            channel_set = ChannelSet(bcd(descriptor, 0, 2), bcd(descriptor, 1, 2), descriptor[10] >> 4,
+                bcd(descriptor, 8, 4), samples)
+            descriptors[(channel_set.scan_type, channel_set.number)] = channel_set
+            offset += BLOCK_BYTES
+        offset += skew_blocks * BLOCK_BYTES
+    return descriptors
+
+
+def check_counts(count, expected_seismic=CHANNELS_PER_STREAMER * MAX_STREAMER, expected_auxiliary=AUX_CHANNELS):
+    ''' Return a description of the first problem with a TraceCount, None if there are none. '''
+    if count.truncated:
+        return 'file ends after {} traces'.format(count.seismic + count.auxiliary)
+    if count.seismic + count.auxiliary != count.declared:
+        return '{} traces, channel sets have {}'.format(count.seismic + count.auxiliary, count.declared)
+    if count.seismic != expected_seismic:
+        return '{} seismic traces, expected {}'.format(count.seismic, expected_seismic)
+    if expected_auxiliary is not None and count.auxiliary != expected_auxiliary:
+        return '{} auxiliary traces, expected {}'.format(count.auxiliary, expected_auxiliary)
+    return None
+
+
+def check_directory(directory, workers=WORKERS, entries=None, cache_dir=CACHE_DIR, expected_auxiliary=AUX_CHANNELS):
+    ''' Count the traces in every segd file in directory, in time order.
+    entries is a list of Entry if the directory has already been listed.
+    Counts are reused from the cache for files with the same size and mtime,
+    the cache is not used if cache_dir is None. The auxiliary traces are compared
+    with expected_auxiliary, or if it is None with the usual number of auxiliary
+    traces in the directory. Returns a list of TraceCheck. '''
+    if entries is None:
+        entries = snapshot_directory(directory)
+    files = [entry for entry in time_sorted_files(entries) if valid_shot_name(entry.name)]
+    cached = load_counts(directory, cache_dir) if cache_dir is not None else {}
+
+    def check(entry):
+        fields = cached.get(entry.name)
+        if fields is not None and fields[:2] == [entry.size, entry.mtime]:
+            return TraceCheck(entry.name, int(entry.name[:5]), TraceCount(*fields[2:]), None)
+        try:
+            count = count_traces(os.path.join(directory, entry.name))
+        except (OSError, ValueError) as e:
+            return TraceCheck(entry.name, int(entry.name[:5]), None, str(e))
+        return TraceCheck(entry.name, int(entry.name[:5]), count, None)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        checks = list(executor.map(check, files))
+    if expected_auxiliary is None:
+        expected_auxiliary = usual_auxiliary([check.count for check in checks if check.count is not None])
+    checks = [check._replace(error=check_counts(check.count, expected_auxiliary=expected_auxiliary))
+            if check.count is not None else check for check in checks]
+    counts = {entry.name: [entry.size, entry.mtime, *check.count]
+            for entry, check in zip(files, checks) if check.count is not None}
+    if cache_dir is not None and counts != cached:
+        save_counts(directory, counts, cache_dir)
+    return checks
+
+
+def count_mapped_traces(data, size):
+    ''' Count the traces in the SEG-D file in data, which is size bytes long. '''
+    block2 = data[BLOCK_BYTES:2 * BLOCK_BYTES]
+    format_code = bcd(data, 2, 4)
+    if format_code not in SAMPLE_BYTES:
+        raise ValueError('unsupported format code: {}'.format(format_code))
+    sample_bytes = SAMPLE_BYTES[format_code]
+    general_blocks = 1 + (data[11] >> 4)
+    scan_types = bcd(data, 27, 2)
+    sets_per_scan = int.from_bytes(block2[3:5], 'big') if data[28] == 0xff else bcd(data, 28, 2)
+    skew_blocks = bcd(data, 29, 2)
+    extended_blocks = int.from_bytes(block2[5:7], 'big') if data[30] == 0xff else bcd(data, 30, 2)
+    external_blocks = int.from_bytes(block2[7:9], 'big') if data[31] == 0xff else bcd(data, 31, 2)
+    trailer_bytes = int.from_bytes(block2[12:14], 'big') * BLOCK_BYTES
+    descriptors = channel_sets(data, general_blocks, scan_types, sets_per_scan, skew_blocks, data[22])
+    offset = (general_blocks + scan_types * (sets_per_scan + skew_blocks) + extended_blocks
+        + external_blocks) * BLOCK_BYTES
+    end = size - trailer_bytes
+    counts = Counter()
+    truncated = False
+    while offset < end:
+        if offset + TRACE_HEADER_BYTES > end:
+            truncated = True
+            break
+        trace_header = data[offset:offset + TRACE_HEADER_BYTES]
+        number = int.from_bytes(trace_header[15:17], 'big') if trace_header[3] == 0xff else bcd(trace_header, 3, 2)
+        key = (bcd(trace_header, 2, 2), number)
+        if key not in descriptors:
+            raise ValueError('trace {} is in an unknown channel set at byte {}'.format(sum(counts.values()) + 1,
+                offset))
+        header_bytes = TRACE_HEADER_BYTES + trace_header[9] * BLOCK_BYTES
+        if offset + header_bytes > end:
+            truncated = True
+            break
+        samples = descriptors[key].samples
+        if trace_header[9]:
+            # number of samples is in bytes 7-9 of trace header extension 1
+            extension = offset + TRACE_HEADER_BYTES
+            samples = int.from_bytes(data[extension + 7:extension + 10], 'big')
+        trace_bytes = header_bytes + samples * sample_bytes
+        if offset + trace_bytes > end:
+            truncated = True
+            break
+        counts[key] += 1
+        offset += trace_bytes
+    seismic = sum(count for key, count in counts.items() if descriptors[key].channel_type == SEISMIC_CHANNEL_TYPE)
+    declared = sum(channel_set.channels for channel_set in descriptors.values())
+    return TraceCount(seismic, sum(counts.values()) - seismic, declared, truncated)
+
+
+def count_traces(filepath):
+    ''' Count the traces in a SEG-D file by stepping from trace header to trace header.
+    Raises ValueError if the headers cannot be decoded. '''
+    with open(filepath, 'rb') as segd:
+        size = os.fstat(segd.fileno()).st_size
+        if size < HEADER_BYTES:
+            raise ValueError('file too short for a general header: {} bytes'.format(size))
+        with mmap.mmap(segd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return count_mapped_traces(data, size)
+
+
+def load_counts(directory, cache_dir=CACHE_DIR):
+    ''' Return the cached {filename: [size, mtime, *TraceCount]} for directory. '''
+    try:
+        with open(cache_filepath(directory, cache_dir)) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_counts(directory, counts, cache_dir=CACHE_DIR):
+    ''' Write the trace counts for directory to its cache file. '''
+    filepath = cache_filepath(directory, cache_dir)
+    temp_filepath = '{}.{}.tmp'.format(filepath, os.getpid())
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_filepath, 'w') as cache_file:
+            json.dump(counts, cache_file, separators=(',', ':'))
+        os.replace(temp_filepath, filepath)
+    except OSError as e:
+        logging.info('cannot write trace count cache: {} {}'.format(filepath, e))
+
+
+def usual_auxiliary(counts):
+    ''' Return the most common number of auxiliary traces in a list of TraceCount,
+    None if the list is empty. '''
+    if not counts:
+        return None
+    return Counter(count.auxiliary for count in counts).most_common(1)[0][0]
+
+
+def main(args):
+    for directory in args.directories:
+        logging.info('\ncounting segd traces in: {}'.format(directory))
+        try:
+            checks = check_directory(directory, args.workers, expected_auxiliary=args.aux_channels)
+        except FileNotFoundError:
+            logging.info('cannot find directory: {}'.format(directory))
+            continue
+        display_checks(checks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directories', type=str, nargs='+', help='sequence folders to check')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of files checked at the same time')
+    parser.add_argument('--aux-channels', type=int, default=AUX_CHANNELS,
+        help='auxiliary channels in each file, the number in most of the files if not supplied')
+    # comment out the following line for testing
+    args = parser.parse_args()
+    # uncomment the line below for testing
+    # args = argparse.Namespace(directories=['/nfs/dropbox01/dropobp/17'], workers=WORKERS, aux_channels=AUX_CHANNELS)
+    main(args)
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+''' Local SQLite catalog of every shot file in the dropboxes.
+One row for each file: dropbox root, sequence, shot, filename, size, mtime and
+whether the file has been renamed to <filename>.bak by rename_duplicates.py.
+The rows are indexed on (sequence, shot), so finding every copy of a shot is
+an indexed query instead of listing the dropboxes again.
+
+The catalog is refreshed incrementally. The (inode, mtime, ctime) of each
+sequence folder is kept with its rows, and a folder is only listed again when
+its stat changes. Folders modified in the last MTIME_RESOLUTION seconds are
+always listed again, as NFS mtimes are coarse. Folders are kept by their name,
+so folders such as 022 and 22 in the same dropbox are listed separately.
+
+The catalog is a standalone tool. rename_duplicates.py and
+missing_shots_dropbox.py still list the sequence folders themselves.
+
+Use:
+
+To list the dropboxes and update the catalog:
+./shot_catalog.py refresh
+
+To find every copy of shot 3012 in sequence 22:
+./shot_catalog.py locate 22 3012
+
+To list the files and copies for each sequence:
+./shot_catalog.py list
+
+Last update: 2023-10-22 Matthew Oppenheim.
+'''
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dir_snapshot import MTIME_RESOLUTION, snapshot_directory
+import logging
+import os
+from shot_store import DROPBOX_SOURCES
+import sqlite3
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# local file the catalog is saved to
+CATALOG_FILE = os.path.join(os.path.expanduser('~'), '.shot_catalog.sqlite')
+
+FILE_SUFFIX = r'.segd'
+
+# suffix added by rename_duplicates.py to the older copies of a shot
+RENAMED_SUFFIX = r'.bak'
+
+# number of sequence folders listed at the same time
+WORKERS = 8
+
+# changed when the tables change, a catalog with another version is made again
+SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS folders (
+    root TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, folder));
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    shot INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    renamed INTEGER NOT NULL,
+    PRIMARY KEY (root, folder, name));
+CREATE INDEX IF NOT EXISTS files_sequence_shot ON files (sequence, shot);
+'''
+
+
+class ShotCatalog():
+    ''' SQLite catalog of the shot files in the dropbox roots. '''
+
+
+    def __init__(self, filepath=CATALOG_FILE):
+        self.connection = sqlite3.connect(filepath)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            # the catalog can be listed again, so tables from an older version are dropped
+            self.connection.executescript('DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS files; '
+                'PRAGMA user_version = {};'.format(SCHEMA_VERSION))
+        self.connection.executescript(SCHEMA)
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def copies(self, sequence):
+        ''' Return {shot: number of files} for the shots in sequence with more than
+        one file that has not been renamed. '''
+        rows = self.connection.execute('SELECT shot, COUNT(*) FROM files WHERE sequence = ? AND renamed = 0 '
+            'GROUP BY shot HAVING COUNT(*) > 1 ORDER BY shot', (int(sequence),))
+        return dict(rows)
+
+
+    def delete_folder(self, root, folder):
+        ''' Delete the rows for a sequence folder. '''
+        self.connection.execute('DELETE FROM folders WHERE root = ? AND folder = ?', (root, folder))
+        self.connection.execute('DELETE FROM files WHERE root = ? AND folder = ?', (root, folder))
+
+
+    def locate(self, sequence, shot):
+        ''' Return a list of (root, folder, name, size, mtime, renamed) for every file of a shot. '''
+        return self.connection.execute('SELECT root, folder, name, size, mtime, renamed FROM files '
+            'WHERE sequence = ? AND shot = ? ORDER BY mtime', (int(sequence), int(shot))).fetchall()
+
+
+    def refresh(self, roots, workers=WORKERS):
+        ''' Update the rows for the sequence folders in roots that have changed.
+        Returns the number of folders listed. '''
+        listed = 0
+        for root in roots:
+            listed += self.refresh_root(root, workers)
+        return listed
+
+
+    def refresh_root(self, root, workers=WORKERS):
+        ''' Update the rows for the sequence folders in root that have changed.
+        Rows for folders that have gone are deleted. Returns the number of folders listed. '''
+        try:
+            folders = [name for name in os.listdir(root) if name.isdigit()]
+        except FileNotFoundError:
+            logging.info('cannot find directory: {}'.format(root))
+            return 0
+        known = {row[0]: row[1:] for row in self.connection.execute(
+            'SELECT folder, inode, mtime_ns, ctime_ns FROM folders WHERE root = ?', (root,))}
+
+        def list_folder(folder):
+            ''' Return (key, entries) for a changed folder, (key, None) if unchanged. '''
+            directory = os.path.join(root, folder)
+            try:
+                stat = os.stat(directory)
+                key = (stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns)
+                if key == known.get(folder) and time.time() - stat.st_mtime > MTIME_RESOLUTION:
+                    return key, None
+                return key, snapshot_directory(directory)
+            except (FileNotFoundError, NotADirectoryError):
+                return None, None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(list_folder, folders))
+        listed = 0
+        with self.connection:
+            for folder in set(known) - set(folders):
+                self.delete_folder(root, folder)
+            for folder, (key, entries) in zip(folders, results):
+                if key is None:
+                    self.delete_folder(root, folder)
+                elif entries is not None:
+                    self.update_folder(root, folder, key, entries)
+                    listed += 1
+        return listed
+
+
+    def sequences(self):
+        ''' Return a list of (sequence, files, shots, renamed) for each sequence. '''
+        return self.connection.execute('SELECT sequence, COUNT(*), COUNT(DISTINCT shot), SUM(renamed) '
+            'FROM files GROUP BY sequence ORDER BY sequence').fetchall()
+
+
+    def update_folder(self, root, folder, key, entries):
+        ''' Replace the rows for a sequence folder with the files in entries. '''
+        self.delete_folder(root, folder)
+        sequence = int(folder)
+        self.connection.execute('INSERT INTO folders VALUES (?, ?, ?, ?, ?, ?)', (root, folder, sequence, *key))
+        self.connection.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((root, folder, sequence, int(entry.name[:5]), entry.name, entry.size, entry.mtime,
+            int(entry.name.endswith(RENAMED_SUFFIX))) for entry in entries if entry.is_file
+            and valid_catalog_name(entry.name)))
+
+
+def valid_catalog_name(file_name):
+    ''' Check that file_name is a segd file, or a segd file renamed by rename_duplicates.py. '''
+    if file_name.endswith(RENAMED_SUFFIX):
+        file_name = file_name[:-len(RENAMED_SUFFIX)]
+    if file_name.endswith(FILE_SUFFIX) and file_name[:5].isdigit():
+        return True
+    return False
+
+
+def main(args):
+    catalog = ShotCatalog(args.catalog)
+    try:
+        if args.action == 'refresh':
+            start = time.time()
+            listed = catalog.refresh(DROPBOX_SOURCES.values(), args.workers)
+            logging.info('listed {} changed folders in {:.1f} s'.format(listed, time.time() - start))
+        elif args.action == 'list':
+            for sequence, files, shots, renamed in catalog.sequences():
+                logging.info('seq {}: {} files, {} shots, {} renamed'.format(sequence, files, shots, renamed))
+        elif args.action == 'locate':
+            if args.shot is None:
+                logging.info('locate needs a sequence and a shot')
+                return
+            rows = catalog.locate(args.sequence, args.shot)
+            logging.info('seq {} shot {}: {} files'.format(args.sequence, args.shot, len(rows)))
+            for root, folder, name, size, mtime, renamed in rows:
+                logging.info('{} {} bytes {}{}'.format(os.path.join(root, folder, name), size,
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime)), ' renamed' if renamed else ''))
+    finally:
+        catalog.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('action', choices=['refresh', 'list', 'locate'], help='refresh, list or query the catalog')
+    parser.add_argument('sequence', type=int, nargs='?', default=None, help='sequence for locate')
+    parser.add_argument('shot', type=int, nargs='?', default=None, help='shot for locate')
+    parser.add_argument('--catalog', type=str, default=CATALOG_FILE, help='catalog file')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of folders listed at the same time')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+''' Scan a sequence folder once and keep the result for every tool that needs it.
+scan_shots lists the folder and returns a ShotScan, which holds the listing,
+the segd files with their shots, sizes and modification times, and the shot,
+missing and duplicate intervals. Nothing is displayed, so the same ShotScan can
+be used by MissingShots to display the report, by rename_duplicates.py to find
+the files to rename and by cross checks, without listing the folder again.
+
+A ShotScan is shared by the tools that use it, so it only holds tuples. The
+intervals are kept as tuples of (first, last) ranges, and each tool makes its
+own ShotIntervals from them with scan_intervals or ShotIntervals(ranges).
+
+Last update: 2023-10-23 Matthew Oppenheim.
+'''
+
+from collections import namedtuple
+from dir_snapshot import snapshot, time_sorted_files
+from range_strings import ShotIntervals
+
+FILE_SUFFIX = r'.segd'
+
+# tuple for a segd file in a sequence folder
+ShotFile = namedtuple('ShotFile', 'name shot size mtime')
+
+# tuple for the result of scanning a sequence folder
+# entries       tuple of Entry for every file, in modification time order
+# files         tuple of ShotFile for the segd files, in modification time order
+# shots         tuple of the shots in files, in the same order
+# ranges            tuple of (first, last) ranges of the shots
+# duplicate_counts  tuple of (shot, number of extra files) for the shots with more than one file
+# missing           tuple of (first, last) ranges of the shots missing between the first and last shots
+# duplicates        tuple of (first, last) ranges of the shots with more than one file
+# incrementing      True if the shots increase through the sequence
+ShotScan = namedtuple('ShotScan', 'directory entries files shots ranges duplicate_counts missing duplicates '
+    'incrementing')
+
+
+def scan_entries(directory, entries):
+    ''' Return a ShotScan for directory from a list of Entry already listed. '''
+    entries = tuple(time_sorted_files(entries))
+    files = tuple(ShotFile(entry.name, int(entry.name[:5]), entry.size, entry.mtime) for entry in entries
+            if valid_shot_name(entry.name))
+    shots = tuple(shot_file.shot for shot_file in files)
+    intervals = ShotIntervals.from_shots(shots)
+    incrementing = not shots or shots[0] <= shots[-1]
+    return ShotScan(directory, entries, files, shots, tuple(intervals.ranges),
+        tuple(sorted(intervals.duplicates.items())), tuple(intervals.complement().ranges),
+        tuple(intervals.duplicate_shots().ranges), incrementing)
+
+
+def scan_intervals(shot_scan):
+    ''' Return a new ShotIntervals of the shots in a ShotScan, with the duplicates. '''
+    return ShotIntervals(shot_scan.ranges, dict(shot_scan.duplicate_counts))
+
+
+def scan_shots(directory, cache=None):
+    ''' List directory and return a ShotScan. Uses the SnapshotCache cache if supplied.
+    Raises FileNotFoundError if directory does not exist. '''
+    return scan_entries(directory, snapshot(directory, cache))
+
+
+def valid_shot_name(file_name):
+    ''' Check that file_name is a valid segd file. '''
+    if file_name.endswith(FILE_SUFFIX) and file_name[:5].isdigit():
+        return True
+    return False
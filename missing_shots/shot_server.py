@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+''' Serve the missing shot records for every sequence as JSON over HTTP.
+One scanner lists the dropboxes in the background and everyone on board reads
+the results from it, instead of each person listing the NFS mounts themselves.
+
+Started by missing_shots_dropbox.py with the --serve argument, e.g.
+./missing_shots_dropbox.py --serve 8050 --interval 60
+The server only listens on this computer unless an address is given, e.g. to
+listen on every network interface:
+./missing_shots_dropbox.py --serve 8050 --bind 0.0.0.0
+
+The records are the same as for --format json. A sequence is only checked again
+when the stat of one of its folders changes, so completed sequences cost one
+stat call for each refresh. The JSON is made once for each refresh and the
+requests are answered from memory.
+
+    /                   sequences for dropobp and dropobp-nfh, time of the last refresh
+    /sequence/<seq>     records for a sequence in dropobp and dropobp-nfh
+    /survey             records for every sequence
+
+Last update: 2023-10-20 Matthew Oppenheim.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dir_snapshot import DirectoryWatch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+from missing_shots_dropbox import find_sequences, first_last_seq, sequence_records
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# address to listen on if --bind is not supplied, only this computer can connect
+SERVER_ADDRESS = '127.0.0.1'
+
+# seconds between refreshes of the records
+REFRESH_INTERVAL = 60
+
+
+class ShotServer():
+    ''' Records for every sequence, held in memory and refreshed in the background. '''
+
+
+    def __init__(self, dropboxes, args, cache=None, lines=None):
+        # {label: (dropbox1, dropbox2)}
+        self.dropboxes = dropboxes
+        self.args = args
+        self.cache = cache
+        self.lines = lines or {}
+        # {(label, sequence): list of records}
+        self.records = {}
+        # {directory: DirectoryWatch} to find the folders that have changed
+        self.watches = {}
+        # {path: JSON bytes} answered to requests
+        self.responses = {}
+        self.refreshed = None
+        self.lock = threading.Lock()
+
+
+    def changed(self, directory):
+        ''' Check if a sequence folder has changed since the last refresh. '''
+        watch = self.watches.setdefault(directory, DirectoryWatch(directory))
+        try:
+            return watch.changed()
+        except FileNotFoundError:
+            # changed if the folder was found at the last refresh
+            found = watch.key is not None
+            watch.key = None
+            return found
+
+
+    def refresh(self):
+        ''' Check the sequences with folders that have changed and make the responses.
+        Returns the number of sequences checked. '''
+        first_seq, last_seq = first_last_seq(self.args.sequence)
+        records = dict(self.records)
+        checked = 0
+        for label, (dropbox1, dropbox2) in self.dropboxes.items():
+            sequences = find_sequences([dropbox1, dropbox2], first_seq, last_seq, self.lines)
+            for key in [key for key in records if key[0] == label and key[1] not in sequences]:
+                del records[key]
+            # check every folder, so each watch is up to date
+            stale = [sequence for sequence in sequences
+                    if [self.changed(os.path.join(dropbox, sequence)) for dropbox in (dropbox1, dropbox2)] != [False] * 2
+                    or (label, sequence) not in records]
+            with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+                results = executor.map(lambda sequence: sequence_records(sequence, dropbox1, dropbox2,
+                    self.args.stride, self.cache, self.lines.get(int(sequence)), self.args.sources), stale)
+                for sequence, sequence_result in zip(stale, results):
+                    records[(label, sequence)] = sequence_result
+            checked += len(stale)
+        refreshed = datetime.now().isoformat(timespec='seconds')
+        responses = make_responses(records, list(self.dropboxes), refreshed)
+        with self.lock:
+            self.records = records
+            self.responses = responses
+            self.refreshed = refreshed
+        return checked
+
+
+    def response(self, path):
+        ''' Return the JSON bytes for a request path, None if there is none. '''
+        with self.lock:
+            return self.responses.get(path.rstrip('/') or '/')
+
+
+    def run(self, interval=REFRESH_INTERVAL):
+        ''' Refresh every interval seconds until the program stops. '''
+        while True:
+            start = time.time()
+            try:
+                checked = self.refresh()
+                logging.info('{} refreshed, {} sequences checked in {:.1f} s'.format(self.refreshed, checked,
+                    time.time() - start))
+            except Exception as e:
+                # keep serving the last records if a refresh fails, e.g. an NFS mount is down
+                logging.info('refresh failed: {}'.format(e))
+            time.sleep(interval)
+
+
+class ShotRequestHandler(BaseHTTPRequestHandler):
+    ''' Answer GET requests from the ShotServer responses. '''
+
+
+    def do_GET(self):
+        body = self.server.shot_server.response(self.path.split('?')[0])
+        if body is None:
+            self.send_error(404, 'no records for: {}'.format(self.path))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def make_responses(records, labels, refreshed):
+    ''' Return {path: JSON bytes} for every request path. '''
+    responses = {}
+    sequences = {label: sorted({sequence for key_label, sequence in records if key_label == label}, key=int)
+            for label in labels}
+    responses['/'] = to_json({'refreshed': refreshed, 'sequences': sequences})
+    for sequence in sorted(set().union(*sequences.values()), key=int):
+        response = {'refreshed': refreshed, 'sequence': int(sequence)}
+        response.update({label: records.get((label, sequence), []) for label in labels})
+        responses['/sequence/{}'.format(int(sequence))] = to_json(response)
+    survey = [{'source': label, **record} for label in labels for sequence in sequences[label]
+            for record in records[(label, sequence)]]
+    responses['/survey'] = to_json({'refreshed': refreshed, 'records': survey})
+    return responses
+
+
+def serve(port, dropboxes, args, cache=None, lines=None):
+    ''' Refresh the records in a background thread and answer requests until ctrl-c. '''
+    shot_server = ShotServer(dropboxes, args, cache, lines)
+    shot_server.refresh()
+    threading.Thread(target=shot_server.run, args=(args.interval,), daemon=True).start()
+    address = args.bind or SERVER_ADDRESS
+    server = ThreadingHTTPServer((address, port), ShotRequestHandler)
+    server.shot_server = shot_server
+    logging.info('serving missing shots on {} port {}, refreshing every {} s, ctrl-c to stop'.format(address,
+        port, args.interval))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('\nstopped serving')
+    finally:
+        server.server_close()
+
+
+def to_json(response):
+    ''' Encode a response as JSON bytes. '''
+    return json.dumps(response).encode('utf-8')
@@ -0,0 +1,446 @@
+#!/usr/bin/python3
+''' Survey wide store of the shots found for each sequence, from each source.
+One compressed bitmap is kept per sequence per source and the whole store is
+saved to a single local file, so cross checks between sources are bitmap
+operations rather than re-reading everything from NFS.
+
+Sources:
+    dropbox01/dropobp, dropbox02/dropobp          segd files in the dropboxes
+    dropbox01/dropobp-nfh, dropbox02/dropobp-nfh  nfh files in the dropboxes
+    p111-p1, p111-s1                              P1 and S1 records in the P111
+    edits                                         Hard_edits.csv files
+    zero-depths                                   Zero_depth.csv files
+
+The bitmaps are roaring style. Shots are split into containers of 65536 shots.
+A container with few shots is a sorted array('H'), a container with many shots
+is a 65536 bit Python int.
+
+Use:
+
+To scan all the sources and save the store:
+./shot_store.py build
+
+To list what is in the store:
+./shot_store.py list
+
+To find shots that are in the P111 but in neither dropbox, survey wide:
+./shot_store.py query --in p111-p1 --not-in dropbox01/dropobp dropbox02/dropobp
+
+Last update: 2023-09-20 Matthew Oppenheim.
+'''
+
+import argparse
+from array import array
+import logging
+import os
+from range_strings import ShotIntervals, merge_tuples
+import struct
+import sys
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# local file the store is saved to
+STORE_FILE = os.path.join(os.path.expanduser('~'), '.shot_store.bin')
+
+# dropbox directories containing a folder for each sequence
+DROPBOX_SOURCES = {
+    'dropbox01/dropobp': r'/nfs/dropbox01/dropobp/',
+    'dropbox02/dropobp': r'/nfs/dropbox02/dropobp/',
+    'dropbox01/dropobp-nfh': r'/nfs/dropbox01/dropobp-nfh/',
+    'dropbox02/dropobp-nfh': r'/nfs/dropbox02/dropobp-nfh/',
+}
+
+P111_DIR = r'/nfs/dropbox01/dropnav/7021/P111_REG'
+P111_SUFFIX = r'.p111'
+# shotpoint number identifier in P111 file, line starts with this
+P1_LINE_ID = r'P1,'
+S1_LINE_ID = r'S1,'
+VESSEL_ID = r',AMU,'
+
+# edit .csv files directory
+EDITS_DIR = r'/nfs/D01/Reveal_Projects/7021_Eni_Hewett_Src/tables/edits/edits_linda'
+EDITS_SUFFIX = r'_Hard_edits.csv'
+
+# zero depth .csv files directory
+ZERO_DEPTHS_DIR = r'/nfs/D01/Reveal_Projects/7021_Eni_Hewett_Src/tables/PROD/P1_SEGD/Zero_Depth'
+ZERO_SUFFIX = r'_Zero_depth.csv'
+
+# file format identifier
+MAGIC = b'SHOTSTORE1'
+
+# containers with more than this many shots are stored as bitmaps
+ARRAY_MAX = 4096
+CONTAINER_BITS = 65536
+ARRAY_CONTAINER = 0
+BITMAP_CONTAINER = 1
+
+
+class RoaringBitmap():
+    ''' Compressed set of shots.
+    self.containers is {shot >> 16: container} where a container is either a
+    sorted array('H') of the low 16 bits, or a Python int used as a 65536 bit
+    bitmap when there are more than ARRAY_MAX shots in the container.
+    '''
+
+
+    def __init__(self, shots=None):
+        self.containers = {}
+        if shots is not None:
+            self.add_shots(shots)
+
+
+    def __and__(self, other):
+        return self.combine(other, lambda a, b: a & b, keep_missing=False)
+
+
+    def __eq__(self, other):
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        return list(self) == list(other)
+
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            for low in container_values(self.containers[high]):
+                yield (high << 16) + low
+
+
+    def __len__(self):
+        return sum(container_len(container) for container in self.containers.values())
+
+
+    def __or__(self, other):
+        return self.combine(other, lambda a, b: a | b, keep_missing=True)
+
+
+    def __sub__(self, other):
+        result = RoaringBitmap()
+        for high, container in self.containers.items():
+            if high in other.containers:
+                container = from_bits(to_bits(container) & ~to_bits(other.containers[high]))
+            if container_len(container):
+                result.containers[high] = container
+        return result
+
+
+    def add_shots(self, shots):
+        ''' Add a list of shots. '''
+        grouped = {}
+        for shot in shots:
+            grouped.setdefault(shot >> 16, set()).add(shot & 0xFFFF)
+        for high, lows in grouped.items():
+            if high in self.containers:
+                lows.update(container_values(self.containers[high]))
+            if len(lows) > ARRAY_MAX:
+                self.containers[high] = to_bits(lows)
+            else:
+                self.containers[high] = array('H', sorted(lows))
+        return self
+
+
+    def combine(self, other, operation, keep_missing):
+        ''' Apply a bitwise operation to matching containers. '''
+        result = RoaringBitmap()
+        for high in set(self.containers) | set(other.containers):
+            if high in self.containers and high in other.containers:
+                bits = operation(to_bits(self.containers[high]), to_bits(other.containers[high]))
+                container = from_bits(bits)
+            elif keep_missing:
+                container = self.containers.get(high, other.containers.get(high))
+            else:
+                continue
+            if container_len(container):
+                result.containers[high] = container
+        return result
+
+
+    def intervals(self):
+        ''' Return the shots as a ShotIntervals. '''
+        ranges = []
+        for high in sorted(self.containers):
+            offset = high << 16
+            ranges.extend((offset + first, offset + last)
+                    for first, last in container_ranges(self.containers[high]))
+        intervals = ShotIntervals()
+        intervals.ranges = merge_tuples(ranges)
+        return intervals
+
+
+class ShotStore():
+    ''' RoaringBitmaps keyed on (source, sequence). '''
+
+
+    def __init__(self):
+        self.bitmaps = {}
+
+
+    def add(self, source, sequence, shots):
+        ''' Add shots for a sequence from a source. '''
+        key = (source, int(sequence))
+        if key not in self.bitmaps:
+            self.bitmaps[key] = RoaringBitmap()
+        self.bitmaps[key].add_shots(shots)
+
+
+    def get(self, source, sequence):
+        ''' Return the RoaringBitmap for a source and sequence, empty if not found. '''
+        return self.bitmaps.get((source, int(sequence)), RoaringBitmap())
+
+
+    @classmethod
+    def load(cls, filepath):
+        ''' Load a store saved by save. '''
+        store = cls()
+        with open(filepath, 'rb') as store_file:
+            data = memoryview(store_file.read())
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError('not a shot store file: {}'.format(filepath))
+        offset = len(MAGIC)
+        (number_bitmaps,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        for _ in range(number_bitmaps):
+            (name_length,) = struct.unpack_from('<H', data, offset)
+            offset += 2
+            source = bytes(data[offset:offset+name_length]).decode('utf-8')
+            offset += name_length
+            sequence, number_containers = struct.unpack_from('<IH', data, offset)
+            offset += 6
+            bitmap = RoaringBitmap()
+            for _ in range(number_containers):
+                high, kind, length = struct.unpack_from('<HBI', data, offset)
+                offset += 7
+                payload = data[offset:offset+length]
+                offset += length
+                if kind == BITMAP_CONTAINER:
+                    bitmap.containers[high] = int.from_bytes(payload, 'little')
+                else:
+                    container = array('H', bytes(payload))
+                    if sys.byteorder == 'big':
+                        container.byteswap()
+                    bitmap.containers[high] = container
+            store.bitmaps[(source, sequence)] = bitmap
+        return store
+
+
+    def query(self, include, exclude=()):
+        ''' Return {sequence: RoaringBitmap} of shots found in every source in
+        include and in none of the sources in exclude. '''
+        results = {}
+        for sequence in self.sequences():
+            found = self.get(include[0], sequence)
+            for source in include[1:]:
+                found = found & self.get(source, sequence)
+            for source in exclude:
+                found = found - self.get(source, sequence)
+            if len(found):
+                results[sequence] = found
+        return results
+
+
+    def save(self, filepath):
+        ''' Save all the bitmaps to a single file. '''
+        chunks = [MAGIC, struct.pack('<I', len(self.bitmaps))]
+        for (source, sequence), bitmap in sorted(self.bitmaps.items()):
+            name = source.encode('utf-8')
+            chunks.append(struct.pack('<H', len(name)))
+            chunks.append(name)
+            chunks.append(struct.pack('<IH', sequence, len(bitmap.containers)))
+            for high, container in sorted(bitmap.containers.items()):
+                if isinstance(container, int):
+                    kind = BITMAP_CONTAINER
+                    payload = container.to_bytes(CONTAINER_BITS // 8, 'little')
+                else:
+                    kind = ARRAY_CONTAINER
+                    if sys.byteorder == 'big':
+                        container = array('H', container)
+                        container.byteswap()
+                    payload = container.tobytes()
+                chunks.append(struct.pack('<HBI', high, kind, len(payload)))
+                chunks.append(payload)
+        # write to a temporary file first so an interrupted save leaves the old store
+        temp_filepath = '{}.tmp'.format(filepath)
+        with open(temp_filepath, 'wb') as store_file:
+            store_file.write(b''.join(chunks))
+        os.replace(temp_filepath, filepath)
+
+
+    def sequences(self):
+        ''' Return a sorted list of the sequences in the store. '''
+        return sorted(set(sequence for source, sequence in self.bitmaps))
+
+
+    def sources(self):
+        ''' Return a sorted list of the sources in the store. '''
+        return sorted(set(source for source, sequence in self.bitmaps))
+
+
+def container_len(container):
+    ''' Number of shots in a container. '''
+    if isinstance(container, int):
+        return bin(container).count('1')
+    return len(container)
+
+
+def container_ranges(container):
+    ''' Return (first, last) tuples of consecutive values in a container. '''
+    if not isinstance(container, int):
+        return merge_tuples((value, value) for value in container)
+    # a range starts where the bit below is clear and ends where the bit above is clear
+    starts = set_bits(container & ~(container << 1))
+    ends = set_bits(container & ~(container >> 1))
+    return list(zip(starts, ends))
+
+
+def container_values(container):
+    ''' Return the values in a container in ascending order. '''
+    if isinstance(container, int):
+        return set_bits(container)
+    return container
+
+
+def from_bits(bits):
+    ''' Create the smallest container for a bitmap. '''
+    if bin(bits).count('1') > ARRAY_MAX:
+        return bits
+    return array('H', set_bits(bits))
+
+
+def set_bits(bits):
+    ''' Return the positions of the set bits in an int, in ascending order. '''
+    positions = []
+    while bits:
+        lowest = bits & -bits
+        positions.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return positions
+
+
+def to_bits(container):
+    ''' Return a container, or a set of values, as a bitmap int. '''
+    if isinstance(container, int):
+        return container
+    bitmap = bytearray(CONTAINER_BITS // 8)
+    for value in container:
+        bitmap[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def read_dropbox_shots(dropbox_dir):
+    ''' Return {sequence: [shots]} for the sequence folders in dropbox_dir. '''
+    sequence_shots = {}
+    if not os.path.isdir(dropbox_dir):
+        logging.info('cannot find directory: {}'.format(dropbox_dir))
+        return sequence_shots
+    for sequence in os.listdir(dropbox_dir):
+        sequence_dir = os.path.join(dropbox_dir, sequence)
+        if not sequence.isdigit() or not os.path.isdir(sequence_dir):
+            continue
+        sequence_shots[int(sequence)] = [int(filename[:5]) for filename in os.listdir(sequence_dir)
+                if filename.endswith('.segd') and filename[:5].isdigit()]
+    return sequence_shots
+
+
+def p111_records(p111_dir):
+    ''' Yield (sequence, line id, split line) for the P1 records from this vessel
+    and the S1 records in the P111 files, in file order. The shot is split line[4]. '''
+    if not os.path.isdir(p111_dir):
+        logging.info('cannot find directory: {}'.format(p111_dir))
+        return
+    for filename in os.listdir(p111_dir):
+        sequence = filename.split('.')[0]
+        if not filename.endswith(P111_SUFFIX) or not sequence.isdigit():
+            continue
+        with open(os.path.join(p111_dir, filename), 'r') as p1_file:
+            for line in p1_file:
+                if line.startswith(P1_LINE_ID) and VESSEL_ID in line:
+                    yield int(sequence), P1_LINE_ID, line.split(',')
+                elif line.startswith(S1_LINE_ID):
+                    yield int(sequence), S1_LINE_ID, line.split(',')
+
+
+def read_p111_shots(p111_dir):
+    ''' Return {sequence: [p1 shots]}, {sequence: [s1 shots]} from the P111 files. '''
+    p1_shots = {}
+    s1_shots = {}
+    for sequence, line_id, split_line in p111_records(p111_dir):
+        shots = p1_shots if line_id == P1_LINE_ID else s1_shots
+        shots.setdefault(sequence, []).append(int(split_line[4]))
+    return p1_shots, s1_shots
+
+
+def read_csv_shots(csv_dir, suffix, parse_line):
+    ''' Return {sequence: [shots]} from files named <sequence><suffix>. '''
+    sequence_shots = {}
+    if not os.path.isdir(csv_dir):
+        logging.info('cannot find directory: {}'.format(csv_dir))
+        return sequence_shots
+    for filename in os.listdir(csv_dir):
+        sequence = filename[:-len(suffix)]
+        if not filename.endswith(suffix) or not sequence.isdigit():
+            continue
+        with open(os.path.join(csv_dir, filename), 'r') as csv_file:
+            # first line contains headers
+            csv_file.readline()
+            sequence_shots[int(sequence)] = [parse_line(line) for line in csv_file if line.strip()]
+    return sequence_shots
+
+
+def build_store():
+    ''' Read every source and return a ShotStore. '''
+    store = ShotStore()
+    sources = {source: read_dropbox_shots(dropbox_dir) for source, dropbox_dir in DROPBOX_SOURCES.items()}
+    sources['p111-p1'], sources['p111-s1'] = read_p111_shots(P111_DIR)
+    sources['edits'] = read_csv_shots(EDITS_DIR, EDITS_SUFFIX, lambda line: int(line.split(';')[1]))
+    sources['zero-depths'] = read_csv_shots(ZERO_DEPTHS_DIR, ZERO_SUFFIX, lambda line: int(line.split(',')[0]))
+    for source, sequence_shots in sources.items():
+        for sequence, shots in sequence_shots.items():
+            store.add(source, sequence, shots)
+        logging.info('{}: {} sequences'.format(source, len(sequence_shots)))
+    return store
+
+
+def list_store(store):
+    ''' Display the number of shots for each source and sequence. '''
+    for sequence in store.sequences():
+        counts = ['{}: {}'.format(source, len(store.get(source, sequence))) for source in store.sources()]
+        logging.info('seq {} {}'.format(sequence, ', '.join(counts)))
+
+
+def query_store(store, include, exclude):
+    ''' Display the shots in all of include and none of exclude. '''
+    logging.info('shots in {} and not in {}'.format(' and '.join(include), ' or '.join(exclude) or 'nothing'))
+    results = store.query(include, exclude)
+    if not results:
+        logging.info('+++ no shots found')
+    for sequence, bitmap in results.items():
+        logging.info('seq {}: {} shots: {}'.format(sequence, len(bitmap), bitmap.intervals().to_string()))
+    return results
+
+
+def main(args):
+    if args.action == 'build':
+        store = build_store()
+        store.save(args.store)
+        logging.info('saved shot store: {}'.format(args.store))
+        return
+    if not os.path.exists(args.store):
+        logging.info('cannot find shot store: {}, run build first'.format(args.store))
+        return
+    store = ShotStore.load(args.store)
+    if args.action == 'list':
+        list_store(store)
+    elif args.action == 'query':
+        if not args.include:
+            logging.info('query needs at least one source after --in')
+            return
+        query_store(store, args.include, args.exclude)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('action', choices=['build', 'list', 'query'], help='build, list or query the store')
+    parser.add_argument('--store', type=str, default=STORE_FILE, help='shot store file')
+    parser.add_argument('--in', dest='include', nargs='+', default=[], help='sources the shots must be in')
+    parser.add_argument('--not-in', dest='exclude', nargs='+', default=[], help='sources the shots must not be in')
+    args = parser.parse_args()
+    main(args)
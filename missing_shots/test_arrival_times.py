@@ -0,0 +1,49 @@
+''' Tests for arrival_times.py
+run using:
+python -m pytest test_arrival_times.py
+'''
+
+from arrival_times import *
+import pytest
+
+START = 1696500000
+
+
+def line(count=30, interval=10.0):
+    ''' Shots from 1000 arriving every interval seconds. '''
+    shots = list(range(1000, 1000 + count))
+    return shots, [START + index * interval for index in range(count)]
+
+
+def test_arrival_timing(numpy_or_not):
+    shots, mtimes = line()
+    # the recorder stalls for 2 minutes after shot 1009
+    mtimes = mtimes[:10] + [mtime + 120 for mtime in mtimes[10:]]
+    # shot 1020 arrives after shot 1021
+    shots[20], shots[21] = shots[21], shots[20]
+    timing = arrival_timing(shots, mtimes)
+    assert timing.median == 10
+    assert timing.stalls == [Stall(1009, 1010, START + 90, 130)]
+    assert timing.bursts == []
+    assert timing.out_of_order.to_string() == '1020'
+    assert sum(timing.histogram) == len(shots) - 1
+    assert timing.histogram[2] == len(shots) - 2
+    assert timing.histogram[-1] == 1
+
+
+def test_arrival_timing_decrementing(numpy_or_not):
+    shots, mtimes = line(count=10)
+    shots.reverse()
+    shots[4], shots[5] = shots[5], shots[4]
+    assert arrival_timing(shots, mtimes, incrementing=False).out_of_order.to_string(False) == '1005'
+
+
+def test_arrival_timing_bursts(numpy_or_not):
+    # re-exports arriving one second apart, against a 10 s acquisition interval
+    shots = [1003, 1004, 1005, 1006, 1007, 1008, 1020, 1021, 1030]
+    mtimes = [START, START + 1, START + 2, START + 3, START + 4, START + 5, START + 600, START + 601, START + 900]
+    timing = arrival_timing(shots, mtimes, reference=10)
+    assert len(timing.bursts) == 1
+    assert timing.bursts[0].shots.to_string() == '1003-1008'
+    assert timing.bursts[0].seconds == 5
+    assert arrival_timing([1000], [START]) is None
@@ -0,0 +1,96 @@
+''' Tests for dir_snapshot.py
+run using:
+python -m pytest test_dir_snapshot.py
+'''
+
+import os
+import pytest
+from dir_snapshot import *
+
+
+def test_snapshot_directory(tmp_path):
+    for mtime, filename in enumerate(['01781.segd', '01779.segd', '01780.segd']):
+        filepath = os.path.join(tmp_path, filename)
+        with open(filepath, 'w') as segd:
+            segd.write('x' * mtime)
+        os.utime(filepath, (1000 + mtime, 1000 + mtime))
+    os.mkdir(os.path.join(tmp_path, 'subdir'))
+    entries = snapshot_directory(tmp_path)
+    assert len(entries) == 4
+    files = time_sorted_files(entries)
+    assert [entry.name for entry in files] == ['01781.segd', '01779.segd', '01780.segd']
+    assert [entry.size for entry in files] == [0, 1, 2]
+    assert files[0].mtime == 1000
+
+
+def test_snapshot_directory_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        snapshot_directory(os.path.join(tmp_path, 'missing'))
+
+
+def test_scan_directories(tmp_path):
+    found = os.path.join(tmp_path, 'found')
+    os.mkdir(found)
+    open(os.path.join(found, '01779.segd'), 'w').close()
+    missing = os.path.join(tmp_path, 'missing')
+    snapshots = scan_directories([found, missing])
+    assert list(snapshots) == [found, missing]
+    assert [entry.name for entry in snapshots[found]] == ['01779.segd']
+    assert snapshots[missing] is None
+
+
+def test_snapshot_cache(tmp_path):
+    sequence = os.path.join(tmp_path, 'sequence')
+    os.mkdir(sequence)
+    for shot in ['01779.segd', '01780.segd']:
+        open(os.path.join(sequence, shot), 'w').close()
+        os.utime(os.path.join(sequence, shot), (1000, 1000))
+    os.utime(sequence, (1000, 1000))
+    cache = SnapshotCache(cache_dir=os.path.join(tmp_path, 'cache'))
+    entries = cache.snapshot(sequence)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.snapshot(sequence) == entries
+    assert (cache.hits, cache.misses) == (1, 1)
+    # a new cache object reads the same files
+    assert SnapshotCache(cache_dir=cache.cache_dir).snapshot(sequence) == entries
+    # adding a file changes the directory mtime, so the directory is listed again
+    open(os.path.join(sequence, '01781.segd'), 'w').close()
+    assert sorted(entry.name for entry in cache.snapshot(sequence)) == ['01779.segd', '01780.segd', '01781.segd']
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.clear()
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_snapshot_cache_recent(tmp_path):
+    ''' Directories changed recently are not cached, files may still be being written. '''
+    open(os.path.join(tmp_path, '01779.segd'), 'w').close()
+    cache = SnapshotCache(cache_dir=os.path.join(tmp_path, 'cache'))
+    cache.snapshot(tmp_path)
+    cache.snapshot(tmp_path)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_scan_directories_cache(tmp_path):
+    found = os.path.join(tmp_path, 'found')
+    os.mkdir(found)
+    open(os.path.join(found, '01779.segd'), 'w').close()
+    missing = os.path.join(tmp_path, 'missing')
+    cache = SnapshotCache(cache_dir=os.path.join(tmp_path, 'cache'), min_age=0)
+    snapshots = scan_directories([found, missing], cache=cache)
+    assert snapshots[missing] is None
+    snapshots = scan_directories([found, missing], cache=cache)
+    assert [entry.name for entry in snapshots[found]] == ['01779.segd']
+    assert cache.hits == 1
+
+
+def test_directory_watch(tmp_path):
+    watch = DirectoryWatch(os.path.join(tmp_path, 'sequence'))
+    assert watch.poll() == []
+    os.mkdir(watch.directory)
+    for mtime, filename in enumerate(['01780.segd', '01779.segd']):
+        open(os.path.join(watch.directory, filename), 'w').close()
+        os.utime(os.path.join(watch.directory, filename), (1000 + mtime, 1000 + mtime))
+    assert [entry.name for entry in watch.poll()] == ['01780.segd', '01779.segd']
+    assert watch.poll() == []
+    open(os.path.join(watch.directory, '01781.segd'), 'w').close()
+    assert [entry.name for entry in watch.poll()] == ['01781.segd']
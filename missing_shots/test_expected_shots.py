@@ -0,0 +1,48 @@
+''' Tests for expected_shots.py
+run using:
+python -m pytest test_expected_shots.py
+'''
+
+import os
+from expected_shots import *
+from range_strings import ShotIntervals
+
+SUBS = '''Seq,Linename,a,b,c,d,e,FSP,LSP
+,,,,,,,,
+3605,7021HEW3605P1,x,x,x,x,x,1001,1450
+3606,7021HEW3606P1,x,x,x,x,x,2450,2001
+'''
+
+P111 = '''H0100,header
+P1,HEW3605P1,3605P1,0,1001,x
+P1,HEW3605P1,3605P1,0,1001,AMU,x
+S1,HEW3605P1,3605P1,0,1001,x
+P1,HEW3605P1,3605P1,0,1002,AMU,x
+P1,HEW3605P1,3605P1,0,1450,AMU,x
+'''
+
+
+def test_read_subs_lines(tmp_path):
+    subs_filepath = os.path.join(tmp_path, 'substitutions.csv')
+    with open(subs_filepath, 'w') as subs:
+        subs.write(SUBS)
+    lines = read_subs_lines(subs_filepath)
+    assert lines == {3605: Line_info(3605, '3605P1', 1001, 1450), 3606: Line_info(3606, '3606P1', 2450, 2001)}
+    assert read_subs_lines(os.path.join(tmp_path, 'missing.csv')) == {}
+
+
+def test_read_p111_lines(tmp_path):
+    with open(os.path.join(tmp_path, '3605.p111'), 'w') as p111:
+        p111.write(P111)
+    assert read_p111_lines(tmp_path) == {3605: Line_info(3605, '3605P1', 1001, 1450)}
+
+
+def test_expected_intervals():
+    line_info = Line_info(3606, '3606P1', 2450, 2001)
+    assert expected_bounds(line_info) == (2001, 2450)
+    assert expected_bounds(None) == (None, None)
+    assert len(expected_intervals(line_info)) == 450
+    intervals = ShotIntervals([(1999, 2100), (2440, 2455)])
+    assert outside_shots(intervals, line_info).to_string() == '1999-2000, 2451-2455'
+    assert intervals.complement(*expected_bounds(line_info)).to_string() == '2101-2439'
+    assert len(outside_shots(intervals, None)) == 0
@@ -0,0 +1,37 @@
+''' Tests for file_sizes.py
+run using:
+python -m pytest test_file_sizes.py
+'''
+
+from file_sizes import *
+import pytest
+
+SHOTS = list(range(1000, 1020))
+SIZES = [19180000] * 20
+SIZES[3] = 1000
+SIZES[4] = 0
+SIZES[12] = 19180320
+SIZES[15] = 38360000
+
+
+def test_size_outliers(numpy_or_not):
+    outliers = size_outliers(SHOTS, SIZES)
+    assert outliers.median == 19180000
+    assert outliers.mad == 0
+    assert outliers.small.to_string() == '1003-1004'
+    assert outliers.large.to_string() == '1015'
+
+
+def test_size_outliers_spread(numpy_or_not):
+    # sizes that vary a little are not outliers
+    sizes = [19180000 + 1000 * (shot % 7) for shot in SHOTS]
+    sizes[10] = 19000000
+    outliers = size_outliers(SHOTS, sizes)
+    assert outliers.small.to_string() == '1010'
+    assert len(outliers.large) == 0
+
+
+def test_size_outliers_empty(numpy_or_not):
+    outliers = size_outliers([], [])
+    assert outliers.median is None
+    assert len(outliers.small) == 0
@@ -0,0 +1,265 @@
+''' Tests for missing_shots_dropbox.py
+run using:
+python -m pytest test_missing_shots_dropbox.py
+'''
+
+import argparse
+from conftest import make_files
+import csv
+from expected_shots import Line_info
+import io
+import json
+import logging
+from missing_shots_dropbox import *
+import os
+import pytest
+from range_strings import ShotIntervals
+
+# seq 5 shot on every other shot number
+ODD_SHOTS = list(range(1, 40, 2))
+
+ARGS = argparse.Namespace(sequence=None, stride=1, sources=1, workers=2, verify=False, traces=False,
+    aux_channels=None, timing=False)
+
+
+def make_sequence(dropbox, sequence, shots):
+    # add a segd file for each shot to a sequence folder, made if it is not found
+    make_files(os.path.join(dropbox, sequence), ['{:05d}.segd'.format(shot) for shot in shots])
+
+
+def missing_strings(missing):
+    return {phase: missing_shots.to_string() for phase, (strided, missing_shots) in missing.items()}
+
+
+@pytest.mark.parametrize("sequence, expected", [('22', (22, 22)), ('3-45', (3, 45)), ('3-', (3, None)),
+    ('-45', (None, 45)), (None, (None, None)), ('', (None, None))])
+def test_first_last_seq(sequence, expected):
+    assert first_last_seq(sequence) == expected
+
+
+@pytest.mark.parametrize("sequence", ['-', '3-4-5', 'a', '3-a', '45-3'])
+def test_first_last_seq_invalid(sequence):
+    with pytest.raises(SystemExit):
+        first_last_seq(sequence)
+
+
+def test_find_sequences(tmp_path):
+    dropbox1, dropbox2 = str(tmp_path / 'dropbox1'), str(tmp_path / 'dropbox2')
+    make_sequence(dropbox1, '3', [1])
+    make_sequence(dropbox1, '22', [1])
+    make_sequence(dropbox2, '3', [2])
+    make_sequence(dropbox2, '45', [1])
+    os.makedirs(os.path.join(dropbox2, 'notes'))
+    assert find_sequences([dropbox1, dropbox2]) == ['3', '22', '45']
+    assert find_sequences([dropbox1, dropbox2], *first_last_seq('22')) == ['22']
+    assert find_sequences([dropbox1, dropbox2], *first_last_seq('4-')) == ['22', '45']
+    assert find_sequences([dropbox1, dropbox2], *first_last_seq('-22')) == ['3', '22']
+    # expected sequences with no folder are included
+    assert find_sequences([dropbox1, dropbox2], *first_last_seq('3-30'), expected=[30, 31]) == ['3', '22', '30']
+
+
+def test_check_sequences(tmp_path, caplog):
+    dropbox1, dropbox2 = str(tmp_path / 'dropbox1'), str(tmp_path / 'dropbox2')
+    make_sequence(dropbox1, '3', range(1, 11))
+    make_sequence(dropbox2, '3', [])
+    make_sequence(dropbox1, '4', [1, 2, 3, 5])
+    make_sequence(dropbox2, '4', [6])
+    with caplog.at_level(logging.INFO):
+        check_sequences(dropbox1, dropbox2, ARGS)
+    # the summary table has a line for each sequence, details only for seq 4
+    table = [message.split() for message in caplog.messages if message.strip().startswith(('3 |', '4 |'))]
+    assert [line[0] for line in table] == ['3', '4']
+    assert [line[-1] for line in table] == ['|', '***']
+    assert '\n*** details for seq 4' in caplog.messages
+    assert '\n*** details for seq 3' not in caplog.messages
+
+
+def test_sequence_watch_poll(tmp_path):
+    dropbox1, dropbox2 = str(tmp_path / 'dropbox1'), str(tmp_path / 'dropbox2')
+    make_sequence(dropbox1, '5', [1, 2, 3, 5, 6])
+    watch = SequenceWatch(dropbox1, dropbox2, '5')
+    update = watch.poll()
+    assert sorted(update.shots) == [1, 2, 3, 5, 6]
+    assert update.new_gaps.shots() == [4]
+    assert len(update.filled_gaps) == 0
+    # shot 4 arrives in dropbox2 with a second copy of shot 2, shot 7 is dropped
+    make_sequence(dropbox2, '5', [2, 4])
+    make_sequence(dropbox1, '5', [8])
+    update = watch.poll()
+    assert sorted(update.shots) == [2, 4, 8]
+    assert update.intervals.to_string() == '1-6, 8'
+    assert update.gaps.shots() == [7]
+    assert update.new_gaps.shots() == [7]
+    assert update.filled_gaps.shots() == [4]
+    assert update.new_duplicates.shots() == [2]
+    make_sequence(dropbox1, '5', [7])
+    update = watch.poll()
+    assert update.filled_gaps.shots() == [7]
+    assert len(update.gaps) == 0
+    assert len(update.new_duplicates) == 0
+
+
+def test_sequence_watch_poll_sources(tmp_path):
+    dropbox1, dropbox2 = str(tmp_path / 'dropbox1'), str(tmp_path / 'dropbox2')
+    make_sequence(dropbox1, '5', [1, 3, 5, 9])
+    watch = SequenceWatch(dropbox1, dropbox2, '5', sources=2)
+    # the second source has not fired
+    assert watch.poll().new_gaps.shots() == [2, 4, 6, 7, 8]
+    make_sequence(dropbox2, '5', [2, 4, 6, 8, 7])
+    update = watch.poll()
+    assert len(update.gaps) == 0
+    assert update.filled_gaps.shots() == [2, 4, 6, 7, 8]
+
+
+def test_record_writer_json():
+    stream = io.StringIO()
+    writer = RecordWriter('json', stream)
+    writer.write({'sequence': 5})
+    writer.write({'sequence': 6})
+    writer.close()
+    assert stream.getvalue() == '[\n{"sequence": 5},\n{"sequence": 6}\n]\n'
+    assert json.loads(stream.getvalue()) == [{'sequence': 5}, {'sequence': 6}]
+
+
+def test_record_writer_json_empty():
+    stream = io.StringIO()
+    RecordWriter('json', stream).close()
+    assert stream.getvalue() == '[]\n'
+    assert json.loads(stream.getvalue()) == []
+
+
+def test_record_writer_ndjson():
+    stream = io.StringIO()
+    writer = RecordWriter('ndjson', stream)
+    writer.write({'sequence': 5, 'missing': '4'})
+    writer.write({'sequence': 6, 'missing': ''})
+    writer.close()
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [{'sequence': 5, 'missing': '4'},
+        {'sequence': 6, 'missing': ''}]
+
+
+def test_record_writer_csv():
+    stream = io.StringIO()
+    writer = RecordWriter('csv', stream)
+    assert stream.getvalue() == ','.join(RECORD_FIELDS) + '\n'
+    writer.write(shot_record('5', None, 'combined', [1, 2, 4]))
+    writer.close()
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(rows) == 1
+    assert rows[0]['missing'] == '3'
+    assert rows[0]['fsp'] == ''
+
+
+def test_shot_record():
+    record = shot_record('5', '/dropbox1/5', 'dropbox1', [1, 2, 3, 5, 6, 6])
+    assert list(record) == RECORD_FIELDS
+    assert record['sequence'] == 5
+    assert (record['found'], record['first'], record['last'], record['expected']) == (5, 1, 6, 6)
+    assert (record['missing_count'], record['missing']) == (1, '4')
+    assert (record['duplicate_count'], record['duplicates']) == (1, '6')
+    assert (record['fsp'], record['lsp'], record['outside']) == (None, None, '')
+    assert (record['stride'], record['sources']) == (1, 1)
+
+
+def test_shot_record_line_info():
+    record = shot_record('5', '/dropbox1/5', 'dropbox1', [1, 2, 3, 5, 6, 9], line_info=Line_info(5, 'line5', 0, 8))
+    assert (record['fsp'], record['lsp']) == (0, 8)
+    assert (record['missing_count'], record['missing']) == (4, '0, 4, 7-8')
+    assert record['outside'] == '9'
+    assert record['expected'] == 9
+
+
+def test_shot_record_no_shots():
+    record = shot_record('5', '/dropbox1/5', 'dropbox1', [])
+    assert (record['found'], record['expected'], record['missing']) == (0, 0, '')
+    record = shot_record('5', '/dropbox1/5', 'dropbox1', [], line_info=Line_info(5, 'line5', 20, 11))
+    assert (record['expected'], record['missing_count'], record['missing']) == (10, 10, '20-11')
+
+
+def make_reconcile_dropboxes(tmp_path):
+    shot_dropboxes = [str(tmp_path / 'dropbox1' / 'dropobp'), str(tmp_path / 'dropbox2' / 'dropobp')]
+    nfh_dropboxes = [str(tmp_path / 'dropbox1' / 'dropobp-nfh'), str(tmp_path / 'dropbox2' / 'dropobp-nfh')]
+    make_sequence(shot_dropboxes[0], '5', [1, 2, 3, 4])
+    make_sequence(shot_dropboxes[1], '5', [5])
+    make_sequence(nfh_dropboxes[0], '5', [2, 3, 4, 5, 6])
+    make_sequence(nfh_dropboxes[1], '5', [7])
+    make_sequence(shot_dropboxes[0], '6', [10, 11, 12])
+    make_sequence(nfh_dropboxes[1], '6', [10, 11, 12])
+    # no nfh folder for seq 7
+    make_sequence(shot_dropboxes[0], '7', [20, 21, 23])
+    return shot_dropboxes, nfh_dropboxes
+
+
+def test_reconcile_sequence(tmp_path):
+    shot_dropboxes, nfh_dropboxes = make_reconcile_dropboxes(tmp_path)
+    result = reconcile_sequence('5', shot_dropboxes, nfh_dropboxes)
+    assert (result.sequence, len(result.segd), len(result.nfh)) == ('5', 5, 6)
+    assert result.segd_only.to_string() == '1'
+    assert result.nfh_only.to_string() == '6-7'
+    assert result.incrementing
+    result = reconcile_sequence('6', shot_dropboxes, nfh_dropboxes)
+    assert len(result.segd_only) == len(result.nfh_only) == 0
+
+
+def test_reconcile_sequence_no_nfh_folder(tmp_path):
+    shot_dropboxes, nfh_dropboxes = make_reconcile_dropboxes(tmp_path)
+    result = reconcile_sequence('7', shot_dropboxes, nfh_dropboxes)
+    assert len(result.nfh) == 0
+    assert result.segd_only.to_string() == '20-21, 23'
+    assert len(result.nfh_only) == 0
+
+
+def test_reconcile_sequences(tmp_path, caplog):
+    shot_dropboxes, nfh_dropboxes = make_reconcile_dropboxes(tmp_path)
+    reconciliations = reconcile_sequences(shot_dropboxes, nfh_dropboxes, workers=2)
+    assert [result.sequence for result in reconciliations] == ['5', '6', '7']
+    assert [result.sequence for result in reconcile_sequences(shot_dropboxes, nfh_dropboxes, 6)] == ['6', '7']
+    with caplog.at_level(logging.INFO):
+        display_reconciliation(reconciliations)
+    assert '\nsurvey: 3 sequences, 11 segd shots, 9 nfh shots' in caplog.messages
+    assert 'segd with no nfh: 4 shots, nfh with no segd: 2 shots, in 2 sequences' in caplog.messages
+    assert 'segd with no nfh: 20-21, 23' in caplog.messages
+    assert 'nfh with no segd: 6-7' in caplog.messages
+    assert '\n*** seq 6' not in caplog.messages
+
+
+@pytest.mark.parametrize("stride", [2, STRIDE_AUTO])
+def test_source_missing_every_other_shot(stride):
+    assert missing_strings(source_missing(ODD_SHOTS, source_stride(ODD_SHOTS, stride))) == {1: ''}
+
+
+def test_source_missing_every_other_shot_with_gap():
+    shots = [shot for shot in ODD_SHOTS if shot not in (11, 13)]
+    assert missing_strings(source_missing(shots, 2)) == {1: '11-13'}
+
+
+def test_source_missing_flip_flop():
+    shots = [1, 2, 3, 4, 6, 7, 8, 9, 10]
+    assert missing_strings(source_missing(shots, 1, sources=2)) == {0: '', 1: '5'}
+
+
+def test_source_missing_empty_source():
+    # only one of the two sources fired
+    missing = source_missing(ODD_SHOTS, 1, sources=2)
+    assert missing_strings(missing) == {0: '2-38', 1: ''}
+    assert len(missing[0][1]) == 19
+
+
+def test_source_missing_line_info():
+    line_info = Line_info(5, 'line5', 1, 43)
+    missing = source_missing(ODD_SHOTS, 2, line_info)
+    assert missing_strings(missing) == {1: '41-43'}
+    assert missing_strings(source_missing([], 1, line_info, sources=2)) == {0: '2-42', 1: '1-43'}
+
+
+def test_missing_intervals():
+    intervals = ShotIntervals.from_shots([1, 2, 3, 6, 7, 9])
+    assert missing_intervals(intervals).to_string() == '4-5, 8'
+    assert missing_intervals(intervals, line_info=Line_info(5, 'line5', 1, 12)).to_string() == '4-5, 8, 10-12'
+
+
+@pytest.mark.parametrize("stride, sources, expected", [(2, 1, [11, 13]), (STRIDE_AUTO, 1, [11, 13]),
+    (1, 1, list(range(2, 39, 2)) + [11, 13]), (1, 2, list(range(2, 39, 2)) + [11, 13])])
+def test_missing_intervals_stride(stride, sources, expected):
+    intervals = ShotIntervals.from_shots([shot for shot in ODD_SHOTS if shot not in (11, 13)])
+    assert missing_intervals(intervals, stride, sources=sources).shots() == sorted(expected)
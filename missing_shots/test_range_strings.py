@@ -8,6 +8,8 @@ python -m pytest test_range_strings.py
 import pytest
 from range_strings import *
 
+needs_numpy = pytest.mark.skipif(np is None, reason='numpy is not installed')
+
 range_tuples_data = [ ([18,1,121,94,0,120,121], [(0,1), (18, 18), (94, 94), (120, 121), (121,121)] ),
              ( [25, 7, 9], [(7, 7), (9, 9), (25, 25)] ),
              ( [1], [(1,1)] ),
@@ -23,6 +25,17 @@ reverse_ranges_data =  [ ('50,25,23-20,9-6,3-1', '1-3, 6-9, 20-23, 25, 50'),
         ('', ''),
         ('1, 1', '1, 1') ]
 
+parse_ranges_data = [ ('50, 25, 23-20, 9-6, 3-1', [(50, 50), (25, 25), (20, 23), (6, 9), (1, 3)]),
+        ('3012-3014', [(3012, 3014)]),
+        ([33, '50-60', '80-72'], [(33, 33), (50, 60), (72, 80)]),
+        ('1-100000', [(1, 100000)]),
+        ('-3--1, -7, 2--2', [(-3, -1), (-7, -7), (-2, 2)]),
+        ('', []) ]
+
+shot_intervals_data = [ ([25, 7, 9, 8, 6, 22, 22], [(6, 9), (22, 22), (25, 25)], {22: 1}),
+        ([3, 2, 1, 1, 1], [(1, 3)], {1: 2}),
+        ([], [], {}) ]
+
 
 def test_consecutives():
     assert consecutives([(0,1), (17, 17), (94, 94), (120, 121)]) == \
@@ -60,3 +73,181 @@ def test_range_tuples(test_list, expected):
 @pytest.mark.parametrize("test_list, expected", reverse_ranges_data)
 def test_reverse_ranges(test_list, expected):
     assert reverse_ranges(test_list) == expected
+
+
+def test_find_missing_leaves_list_unsorted():
+    shots = [6, 3, 0, 1]
+    find_missing(shots)
+    assert shots == [6, 3, 0, 1]
+
+
+@pytest.mark.parametrize("test_list, expected_ranges, expected_duplicates", shot_intervals_data)
+def test_shot_intervals_from_shots(test_list, expected_ranges, expected_duplicates):
+    intervals = ShotIntervals.from_shots(test_list)
+    assert intervals.ranges == expected_ranges
+    assert intervals.duplicates == expected_duplicates
+
+
+def test_shot_intervals_set_operations():
+    a = ShotIntervals([(1, 10), (20, 30)])
+    b = ShotIntervals([(5, 22)])
+    assert a.union(b).ranges == [(1, 30)]
+    assert a.intersection(b).ranges == [(5, 10), (20, 22)]
+    assert a.difference(b).ranges == [(1, 4), (23, 30)]
+    assert b.difference(a).ranges == [(11, 19)]
+    assert a.complement().ranges == [(11, 19)]
+    assert a.complement(0, 35).ranges == [(0, 0), (11, 19), (31, 35)]
+    assert a.count_between() == len(a)
+    assert a.count_between(5, 25) == 12
+    assert a.count_between(None, 5) == 5
+    assert a.count_between(12, 18) == 0
+
+
+def test_shot_intervals_merge_counts_duplicates():
+    a = ShotIntervals.from_shots([1, 2, 3, 3])
+    b = ShotIntervals.from_shots([3, 4])
+    merged = a.merge(b)
+    assert merged.ranges == [(1, 4)]
+    assert merged.duplicates == {3: 2}
+    assert merged.duplicate_count() == 2
+
+
+def test_shot_intervals_to_string():
+    intervals = ShotIntervals.from_shots(in_list)
+    assert intervals.to_string(incrementing=False) == reverse_ranges(intervals.to_string())
+    assert intervals.to_string(incrementing=False) == get_ranges(in_list)
+    assert intervals.complement().to_string(incrementing=False) == '49-26, 24, 19-10, 5-4'
+
+
+@needs_numpy
+@pytest.mark.parametrize("test_list, expected", find_missing_data)
+def test_np_find_missing(test_list, expected):
+    assert np_find_missing(test_list).tolist() == expected
+
+
+@needs_numpy
+def test_np_find_duplicates():
+    assert np_find_duplicates([1, 1, 2, 2, 3, 4, 5]).tolist() == [1, 2]
+    assert np_find_duplicates([]).tolist() == []
+
+
+@needs_numpy
+@pytest.mark.parametrize("test_list", [in_list, [18, 1, 121, 94, 0, 120, 121], [5, 4, 3, 1], [1], []])
+def test_np_get_ranges(test_list):
+    assert np_get_ranges(test_list) == get_ranges(test_list)
+    assert np_range_tuples(test_list) == range_tuples(remove_multiples(test_list))
+
+
+@needs_numpy
+def test_np_shot_intervals():
+    assert np_shot_intervals(in_list) == ShotIntervals.from_shots(in_list)
+
+
+def test_range_accumulator():
+    accumulator = RangeAccumulator()
+    for shot in [25, 7, 9, 8, 6, 21, 20, 3, 2, 1, 22, 23, 50]:
+        assert accumulator.add(shot)
+    assert not accumulator.add(22)
+    assert accumulator.add_shots([22, 4]) == [4]
+    assert accumulator.to_string() == get_ranges(in_list + [4])
+    assert accumulator.gaps().to_string() == '5, 10-19, 24, 26-49'
+    assert accumulator.duplicates == {22: 2}
+    assert len(accumulator) == 14
+
+
+def test_range_accumulator_matches_shot_intervals():
+    shots = [5, 3, 1, 2, 9, 9, 7, 6, 4, 12]
+    accumulator = RangeAccumulator(shots)
+    assert accumulator.intervals() == ShotIntervals.from_shots(shots)
+
+
+def test_shot_bitmap():
+    bitmap = ShotBitmap().add_shots(in_list)
+    assert bitmap.intervals() == ShotIntervals.from_shots(in_list)
+    assert bitmap.duplicates() == {22: 2}
+    assert bitmap.missing().to_string(incrementing=False) == '49-26, 24, 19-10, 5-4'
+    assert bitmap.missing(0, 52).ranges == [(0, 0), (4, 5), (10, 19), (24, 24), (26, 49), (51, 52)]
+    assert len(bitmap) == 13
+
+
+def test_shot_bitmap_merge_and_union():
+    a = ShotBitmap(1779, 1790).add_shots([1779, 1780, 1781, 1785, 1785])
+    b = ShotBitmap().add_shots([1781, 1782, 1783, 1784])
+    merged = a.merge(b)
+    assert merged.intervals().ranges == [(1779, 1785)]
+    assert merged.duplicates() == {1781: 1, 1785: 1}
+    union = a | b
+    assert union.intervals().ranges == [(1779, 1785)]
+    assert union.duplicates() == {1785: 1}
+    assert merged.intervals() == a.intervals().merge(b.intervals())
+
+
+@pytest.mark.parametrize("ranges, expected", parse_ranges_data)
+def test_parse_ranges(ranges, expected):
+    assert parse_ranges(ranges) == expected
+
+
+def test_parse_ranges_round_trip():
+    intervals = ShotIntervals.from_shots(in_list)
+    assert ShotIntervals(parse_ranges(get_ranges(in_list))).ranges == intervals.ranges
+
+
+def test_parse_ranges_negative_round_trip():
+    # a source with phase 1 and stride 2 has shots below its first index
+    strided = StridedIntervals(ShotIntervals([(-3, -1), (2, 4)]), 2, 1)
+    assert strided.to_string() == '-5--1, 5-9'
+    assert parse_ranges(strided.to_string()) == [(-5, -1), (5, 9)]
+    assert sorted(parse_ranges(strided.to_string(incrementing=False))) == parse_ranges(strided.to_string())
+
+
+def test_parse_ranges_not_valid():
+    with pytest.raises(ValueError):
+        parse_ranges('12-x')
+
+
+# flip-flop shooting, source 1 fires odd shots and source 2 fires even shots
+FLIP_FLOP_SHOTS = [1, 3, 5, 9, 11, 2, 4, 6, 8, 10, 12, 12]
+
+
+@pytest.mark.parametrize("test_list, expected", [(FLIP_FLOP_SHOTS, 1), ([1, 3, 5, 9, 11], 2),
+    ([30, 27, 24, 21, 15], 3), ([1, 2, 4, 8, 16], 1), ([5], 1), ([], 1)])
+def test_infer_stride(test_list, expected):
+    assert infer_stride(test_list, min_shots=2) == expected
+
+
+def test_infer_stride_min_shots():
+    assert infer_stride([1, 3, 5, 9, 11]) == 1
+    assert infer_stride([1790, 1795]) == 1
+    assert infer_stride(list(range(1001, 1041, 2))) == 2
+
+
+def test_phase_intervals():
+    phases = phase_intervals(FLIP_FLOP_SHOTS, 2)
+    assert sorted(phases) == [0, 1]
+    assert phases[1].to_string() == '1-5, 9-11'
+    assert phases[1].complement().shots() == [7]
+    assert phases[0].complement().shots() == []
+    assert phases[0].duplicate_shots().shots() == [12]
+    assert phases[0].to_string(incrementing=False) == '12-2'
+    assert phases[1].complement(-1, 15).to_string() == '-1, 7, 13-15'
+    assert phases[1].count_between(2, 10) == 3
+    assert phases[1].count_between(-1, 15) == len(phases[1])
+    assert len(phases[1]) == 5
+
+
+@pytest.mark.parametrize("test_list, stride", [(FLIP_FLOP_SHOTS, 2), (FLIP_FLOP_SHOTS, 3), ([1, 3, 5, 9, 11], 2),
+    ([30, 27, 24, 21, 15, 15], 3), ([-4, -3, -1, 0, 2, 7], 4), ([5], 4), ([], 2)])
+def test_split_phases(test_list, stride):
+    phases = ShotIntervals.from_shots(test_list).split_phases(stride)
+    expected = phase_intervals(test_list, stride)
+    assert sorted(phases) == sorted(expected)
+    for phase in phases:
+        assert phases[phase].intervals.ranges == expected[phase].intervals.ranges
+        assert phases[phase].duplicate_shots().shots() == expected[phase].duplicate_shots().shots()
+
+
+def test_strided_intervals_from_shots():
+    strided = StridedIntervals.from_shots([30, 27, 24, 21, 15], 3, 0)
+    assert strided.first() == 15
+    assert strided.last() == 30
+    assert strided.complement().shots(incrementing=False) == [18]
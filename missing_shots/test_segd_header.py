@@ -0,0 +1,68 @@
+''' Tests for segd_header.py
+run using:
+python -m pytest test_segd_header.py
+'''
+
+from datetime import datetime
+import os
+import pytest
+from segd_header import *
+
+
+def general_header(file_number, record_length=b'\x80\x08'):
+    ''' General header blocks 1 and 2 for 2023 day 278 12:34:56, SEG-D revision 2.1. '''
+    block1 = bytearray(32)
+    block2 = bytearray(32)
+    if file_number > 9999:
+        block1[0:2] = b'\xff\xff'
+        block2[0:3] = file_number.to_bytes(3, 'big')
+    else:
+        block1[0:2] = bytes.fromhex('{:04d}'.format(file_number))
+    # year 23, one additional general header block, julian day 278
+    block1[10:16] = bytes.fromhex('231278123456')
+    # record type 8, record length 3 bcd digits
+    block1[25:27] = record_length
+    block2[10:12] = b'\x02\x01'
+    # extended record length in ms
+    block2[14:17] = (12000).to_bytes(3, 'big')
+    return bytes(block1 + block2)
+
+
+def write_segd(directory, name, data):
+    with open(os.path.join(directory, name), 'wb') as segd:
+        segd.write(data + bytes(1000))
+
+
+def test_decode_general_header():
+    header = decode_general_header(general_header(1779))
+    assert header.file_number == 1779
+    assert header.timestamp == datetime(2023, 10, 5, 12, 34, 56)
+    # 8 x 0.512 s
+    assert header.record_length == 4096
+    assert header.revision == '2.1'
+    header = decode_general_header(general_header(12345, record_length=b'\x8f\xff'))
+    assert header.file_number == 12345
+    assert header.record_length == 12000
+
+
+def test_decode_general_header_invalid():
+    with pytest.raises(ValueError):
+        decode_general_header(general_header(1779)[:40])
+    data = bytearray(general_header(1779))
+    data[13] = 0x3a
+    with pytest.raises(ValueError):
+        decode_general_header(bytes(data))
+
+
+def test_check_directory(tmp_path):
+    write_segd(tmp_path, '01779.segd', general_header(1779))
+    write_segd(tmp_path, '01780.segd', general_header(1781))
+    with open(os.path.join(tmp_path, '01781.segd'), 'wb') as segd:
+        segd.write(general_header(1781)[:20])
+    open(os.path.join(tmp_path, 'notes.txt'), 'w').close()
+    checks = {check.name: check for check in check_directory(tmp_path)}
+    assert sorted(checks) == ['01779.segd', '01780.segd', '01781.segd']
+    assert checks['01779.segd'].error is None
+    assert checks['01780.segd'].error == 'file number 1781 does not match'
+    assert checks['01781.segd'].error.startswith('file too short')
+    assert [check.shot for check in display_checks(checks.values())] == [1780, 1781]
@@ -0,0 +1,111 @@
+''' Tests for segd_traces.py
+run using:
+python -m pytest test_segd_traces.py
+'''
+
+import os
+from segd_traces import *
+
+# 5 samples a trace: channel sets are 10 ms long with a 2 ms base scan interval
+SAMPLES = 5
+
+
+def segd_file(file_number, seismic=3, auxiliary=1, extension=False):
+    ''' A SEG-D file with 8058 format, one scan type and two channel sets, for 3
+    seismic channels and 1 auxiliary channel, with seismic and auxiliary traces. '''
+    block1 = bytearray(32)
+    block1[0:2] = bytes.fromhex('{:04d}'.format(file_number))
+    block1[2:4] = b'\x80\x58'
+    # one additional general header block, 2023 day 278 12:34:56
+    block1[10:16] = bytes.fromhex('231278123456')
+    # base scan interval in 1/16 ms
+    block1[22] = 32
+    # one scan type with two channel sets, no skew, extended or external blocks
+    block1[27:32] = b'\x01\x02\x00\x00\x00'
+    block2 = bytearray(32)
+    block2[10:12] = b'\x02\x01'
+    descriptors = b''
+    for number, channels, channel_type in [(1, 3, 1), (2, 1, 9)]:
+        descriptor = bytearray(32)
+        descriptor[0:2] = bytes([0x01, number])
+        descriptor[4:6] = (5).to_bytes(2, 'big')
+        descriptor[8:10] = bytes.fromhex('{:04d}'.format(channels))
+        descriptor[10] = channel_type << 4
+        descriptors += descriptor
+    traces = b''
+    for number, count in [(1, seismic), (2, auxiliary)]:
+        for trace in range(count):
+            trace_header = bytearray(20)
+            trace_header[2:4] = bytes([0x01, number])
+            trace_header[9] = 1 if extension else 0
+            traces += trace_header
+            if extension:
+                extension_block = bytearray(32)
+                extension_block[7:10] = SAMPLES.to_bytes(3, 'big')
+                traces += extension_block
+            traces += bytes(SAMPLES * 4)
+    return bytes(block1 + block2 + descriptors + traces)
+
+
+def write_segd(directory, name, data):
+    with open(os.path.join(directory, name), 'wb') as segd:
+        segd.write(data)
+
+
+def test_count_traces(tmp_path):
+    write_segd(tmp_path, '01779.segd', segd_file(1779))
+    count = count_traces(os.path.join(tmp_path, '01779.segd'))
+    assert count == TraceCount(3, 1, 4, False)
+    assert check_counts(count, expected_seismic=3, expected_auxiliary=1) is None
+    assert check_counts(count) == '3 seismic traces, expected {}'.format(CHANNELS_PER_STREAMER * MAX_STREAMER)
+    write_segd(tmp_path, '01780.segd', segd_file(1780, extension=True))
+    assert count_traces(os.path.join(tmp_path, '01780.segd')) == TraceCount(3, 1, 4, False)
+
+
+def test_count_traces_incomplete(tmp_path):
+    write_segd(tmp_path, '01779.segd', segd_file(1779, seismic=2))
+    count = count_traces(os.path.join(tmp_path, '01779.segd'))
+    assert check_counts(count, expected_seismic=3) == '3 traces, channel sets have 4'
+    write_segd(tmp_path, '01780.segd', segd_file(1780)[:-10])
+    count = count_traces(os.path.join(tmp_path, '01780.segd'))
+    assert count == TraceCount(3, 0, 4, True)
+    assert check_counts(count, expected_seismic=3) == 'file ends after 3 traces'
+
+
+def test_check_directory_cache(tmp_path):
+    sequence = os.path.join(tmp_path, 'sequence')
+    cache_dir = os.path.join(tmp_path, 'cache')
+    os.mkdir(sequence)
+    write_segd(sequence, '01779.segd', segd_file(1779))
+    write_segd(sequence, '01780.segd', b'short')
+    checks = check_directory(sequence, cache_dir=cache_dir)
+    assert [check.count for check in checks] == [TraceCount(3, 1, 4, False), None]
+    assert checks[1].error.startswith('file too short')
+    assert list(load_counts(sequence, cache_dir)) == ['01779.segd']
+    # the cached count is used while the size and mtime are unchanged
+    counts = load_counts(sequence, cache_dir)
+    counts['01779.segd'][2:] = [4794, 0, 4794, False]
+    save_counts(sequence, counts, cache_dir)
+    assert check_directory(sequence, cache_dir=cache_dir)[0].error is None
+    write_segd(sequence, '01779.segd', segd_file(1779, seismic=3))
+    os.utime(os.path.join(sequence, '01779.segd'), (1000, 1000))
+    assert check_directory(sequence, cache_dir=cache_dir)[0].count.seismic == 3
+
+
+def test_check_directory_auxiliary(tmp_path):
+    sequence = os.path.join(tmp_path, 'sequence')
+    cache_dir = os.path.join(tmp_path, 'cache')
+    os.mkdir(sequence)
+    for shot in (1779, 1780, 1781):
+        write_segd(sequence, '0{}.segd'.format(shot), segd_file(shot))
+    check_directory(sequence, cache_dir=cache_dir)
+    # cached counts with 2 auxiliary traces, except for one file with 1
+    counts = load_counts(sequence, cache_dir)
+    for name, auxiliary in [('01779.segd', 2), ('01780.segd', 1), ('01781.segd', 2)]:
+        counts[name][2:] = [4794, auxiliary, 4794 + auxiliary, False]
+    save_counts(sequence, counts, cache_dir)
+    assert usual_auxiliary([TraceCount(*counts[name][2:]) for name in counts]) == 2
+    checks = check_directory(sequence, cache_dir=cache_dir)
+    assert [check.error for check in checks] == [None, '1 auxiliary traces, expected 2', None]
+    checks = check_directory(sequence, cache_dir=cache_dir, expected_auxiliary=1)
+    assert [check.error is None for check in checks] == [False, True, False]
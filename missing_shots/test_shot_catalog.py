@@ -0,0 +1,61 @@
+''' Tests for shot_catalog.py
+run using:
+python -m pytest test_shot_catalog.py
+'''
+
+import os
+import shutil
+from shot_catalog import *
+
+# a time older than the mtime resolution, so an unchanged folder is not listed
+OLD_TIME = 1000000000
+
+
+def make_files(directory, names):
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as segd:
+            segd.write('segd')
+    os.utime(directory, (OLD_TIME, OLD_TIME))
+
+
+def test_valid_catalog_name():
+    assert valid_catalog_name('03012.segd')
+    assert valid_catalog_name('03012.segd.bak')
+    assert not valid_catalog_name('03012.txt')
+    assert not valid_catalog_name('notes.segd')
+
+
+def test_refresh_locate(tmp_path):
+    root1, root2 = str(tmp_path / 'dropbox01'), str(tmp_path / 'dropbox02')
+    make_files(os.path.join(root1, '22'), ['03011.segd', '03012.segd', '03012.segd.bak', 'notes.txt'])
+    make_files(os.path.join(root2, '22'), ['03012.segd'])
+    make_files(os.path.join(root1, '23'), ['04001.segd'])
+    catalog = ShotCatalog(str(tmp_path / 'catalog.sqlite'))
+    assert catalog.refresh([root1, root2]) == 3
+    assert [(root, name, renamed) for root, folder, name, size, mtime, renamed in catalog.locate(22, 3012)] == [
+        (root1, '03012.segd', 0), (root1, '03012.segd.bak', 1), (root2, '03012.segd', 0)]
+    assert catalog.copies(22) == {3012: 2}
+    assert catalog.sequences() == [(22, 4, 2, 1), (23, 1, 1, 0)]
+    # only changed folders are listed again
+    assert catalog.refresh([root1, root2]) == 0
+    make_files(os.path.join(root1, '23'), ['04002.segd'])
+    assert catalog.refresh([root1, root2]) == 1
+    assert len(catalog.locate(23, 4002)) == 1
+    shutil.rmtree(os.path.join(root2, '22'))
+    assert catalog.refresh([root1, root2]) == 0
+    assert catalog.copies(22) == {}
+    catalog.close()
+
+
+def test_refresh_folder_names(tmp_path):
+    root = str(tmp_path / 'dropbox01')
+    make_files(os.path.join(root, '22'), ['03011.segd'])
+    make_files(os.path.join(root, '022'), ['03012.segd'])
+    catalog = ShotCatalog(str(tmp_path / 'catalog.sqlite'))
+    assert catalog.refresh([root]) == 2
+    assert [row[1] for row in catalog.locate(22, 3011) + catalog.locate(22, 3012)] == ['22', '022']
+    shutil.rmtree(os.path.join(root, '022'))
+    catalog.refresh([root])
+    assert catalog.sequences() == [(22, 1, 1, 0)]
+    catalog.close()
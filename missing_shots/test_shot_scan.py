@@ -0,0 +1,59 @@
+''' Tests for shot_scan.py
+run using:
+python -m pytest test_shot_scan.py
+'''
+
+import argparse
+from conftest import make_files
+import logging
+from missing_shots_dropbox import MissingShots
+import os
+import pytest
+from range_strings import ShotIntervals
+from shot_scan import *
+
+
+def test_scan_shots(tmp_path):
+    make_files(tmp_path, ['01005.segd', '01004.segd', '01002.segd', '01002_a.segd', 'notes.txt'])
+    os.mkdir(tmp_path / '01003.segd')
+    shot_scan = scan_shots(str(tmp_path))
+    assert shot_scan.shots == (1005, 1004, 1002, 1002)
+    assert shot_scan.files[0] == ShotFile('01005.segd', 1005, 10, 1000000000)
+    assert [entry.name for entry in shot_scan.entries][-1] == 'notes.txt'
+    assert shot_scan.ranges == ((1002, 1002), (1004, 1005))
+    assert shot_scan.duplicate_counts == ((1002, 1),)
+    assert shot_scan.missing == ((1003, 1003),)
+    assert shot_scan.duplicates == ((1002, 1002),)
+    assert scan_intervals(shot_scan) == ShotIntervals.from_shots([1005, 1004, 1002, 1002])
+    assert not shot_scan.incrementing
+    # each call makes a new ShotIntervals, so a tool changing it does not change the ShotScan
+    scan_intervals(shot_scan).ranges.append((1010, 1010))
+    assert scan_intervals(shot_scan).last() == 1005
+
+
+def test_scan_shots_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        scan_shots(str(tmp_path / 'missing'))
+
+
+def test_scan_entries_empty():
+    shot_scan = scan_entries('empty', [])
+    assert shot_scan.shots == ()
+    assert len(shot_scan.missing) == 0
+    assert shot_scan.incrementing
+
+
+def test_missing_shots_scan_only(tmp_path, caplog):
+    os.mkdir(tmp_path / '7')
+    make_files(tmp_path / '7', ['01001.segd', '01002.segd', '01004.segd'])
+    args = argparse.Namespace(sequence='7', stride=1, sources=1, verify=False, traces=False, aux_channels=None, timing=False)
+    with caplog.at_level(logging.INFO):
+        missing_shots = MissingShots(str(tmp_path), args, report=False)
+    assert caplog.text == ''
+    assert missing_shots.shot_scan.missing == ((1003, 1003),)
+    # the ShotScan is displayed without listing the directory again
+    shot_scan = scan_entries(str(tmp_path / '7'), [])
+    assert MissingShots(str(tmp_path), args, shot_scan=shot_scan).shot_scan is shot_scan
+    with caplog.at_level(logging.INFO):
+        MissingShots(str(tmp_path), args, shot_scan=missing_shots.shot_scan)
+    assert 'missing shots' in caplog.text
@@ -0,0 +1,77 @@
+''' Tests for shot_server.py
+run using:
+python -m pytest test_shot_server.py
+'''
+
+import argparse
+from http.server import ThreadingHTTPServer
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from shot_server import *
+
+ARGS = argparse.Namespace(sequence=None, stride=1, sources=1, workers=2, interval=1, bind=None)
+
+
+def make_shots(directory, shots):
+    os.makedirs(directory, exist_ok=True)
+    for shot in shots:
+        with open(os.path.join(directory, '{:05d}.segd'.format(shot)), 'w') as segd:
+            segd.write('segd')
+
+
+@pytest.fixture
+def dropboxes(tmp_path):
+    dropbox1, dropbox2 = str(tmp_path / 'dropbox01'), str(tmp_path / 'dropbox02')
+    make_shots(os.path.join(dropbox1, '7'), [1001, 1002, 1004])
+    make_shots(os.path.join(dropbox2, '7'), [1001, 1002, 1004])
+    make_shots(os.path.join(dropbox1, '8'), [2001, 2002])
+    return {'dropobp': (dropbox1, dropbox2)}
+
+
+def test_refresh(dropboxes):
+    shot_server = ShotServer(dropboxes, ARGS)
+    assert shot_server.refresh() == 2
+    response = json.loads(shot_server.response('/sequence/7'))
+    assert response['sequence'] == 7
+    assert [record['missing'] for record in response['dropobp']] == ['1003', '1003', '1003']
+    assert json.loads(shot_server.response('/'))['sequences'] == {'dropobp': ['7', '8']}
+    assert len(json.loads(shot_server.response('/survey/'))['records']) == 6
+    assert shot_server.response('/sequence/9') is None
+
+
+def test_refresh_changed(dropboxes):
+    # folders older than the mtime resolution, so an unchanged stat is trusted
+    for dropbox in dropboxes['dropobp']:
+        for sequence in os.listdir(dropbox):
+            os.utime(os.path.join(dropbox, sequence), (1000000000, 1000000000))
+    shot_server = ShotServer(dropboxes, ARGS)
+    assert shot_server.refresh() == 2
+    assert shot_server.refresh() == 0
+    make_shots(os.path.join(dropboxes['dropobp'][0], '9'), [3001])
+    assert shot_server.refresh() == 1
+    assert json.loads(shot_server.response('/'))['sequences'] == {'dropobp': ['7', '8', '9']}
+    make_shots(os.path.join(dropboxes['dropobp'][1], '8'), [2001])
+    assert shot_server.refresh() == 2
+
+
+def test_serve_request(dropboxes):
+    shot_server = ShotServer(dropboxes, ARGS)
+    shot_server.refresh()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ShotRequestHandler)
+    server.shot_server = shot_server
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    try:
+        with urllib.request.urlopen(url + '/sequence/8') as response:
+            assert response.headers['Content-Type'] == 'application/json'
+            assert json.load(response)['dropobp'][0]['found'] == 2
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + '/sequence/99')
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
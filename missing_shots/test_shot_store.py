@@ -0,0 +1,51 @@
+''' Tests for shot_store.py
+run using:
+python -m pytest test_shot_store.py
+'''
+
+import pytest
+from range_strings import ShotIntervals
+from shot_store import *
+
+# enough shots to make a bitmap container, with a gap and a second container
+LARGE_SHOTS = [shot for shot in range(1000, 7000) if shot not in (3012, 3013, 3014)] + [70000, 70001]
+SMALL_SHOTS = [3011, 3012, 3013, 3014, 70001, 70002]
+
+
+@pytest.mark.parametrize("shots", [LARGE_SHOTS, SMALL_SHOTS, []])
+def test_roaring_bitmap_intervals(shots):
+    assert RoaringBitmap(shots).intervals() == ShotIntervals.from_shots(shots)
+    assert len(RoaringBitmap(shots)) == len(set(shots))
+
+
+def test_roaring_bitmap_operations():
+    large = RoaringBitmap(LARGE_SHOTS)
+    small = RoaringBitmap(SMALL_SHOTS)
+    assert list(large & small) == sorted(set(LARGE_SHOTS) & set(SMALL_SHOTS))
+    assert list(large | small) == sorted(set(LARGE_SHOTS) | set(SMALL_SHOTS))
+    assert list(small - large) == sorted(set(SMALL_SHOTS) - set(LARGE_SHOTS))
+    assert list(large - small) == sorted(set(LARGE_SHOTS) - set(SMALL_SHOTS))
+
+
+def test_shot_store_save_load_query(tmp_path):
+    store = ShotStore()
+    store.add('p111-p1', 22, range(1779, 4932))
+    store.add('dropbox01/dropobp', 22, [shot for shot in range(1779, 4932) if shot not in (3012, 3013, 3014)])
+    store.add('dropbox02/dropobp', 22, [3013])
+    store.add('p111-p1', 23, [1, 2, 3])
+    filepath = os.path.join(tmp_path, 'store.bin')
+    store.save(filepath)
+    loaded = ShotStore.load(filepath)
+    assert loaded.bitmaps == store.bitmaps
+    results = loaded.query(['p111-p1'], ['dropbox01/dropobp', 'dropbox02/dropobp'])
+    assert results[22].intervals().to_string() == '3012, 3014'
+    assert results[23].intervals().to_string() == '1-3'
+
+
+def test_read_p111_shots(tmp_path):
+    with open(os.path.join(tmp_path, '3605.p111'), 'w') as p111:
+        p111.write('H0100,header\nP1,HEW3605P1,3605P1,0,1001,x\nP1,HEW3605P1,3605P1,0,1001,AMU,x\n'
+            'S1,HEW3605P1,3605P1,0,1001,x\nP1,HEW3605P1,3605P1,0,1002,AMU,x\n')
+    open(os.path.join(tmp_path, 'notes.txt'), 'w').close()
+    assert read_p111_shots(tmp_path) == ({3605: [1001, 1002]}, {3605: [1001]})
+    assert read_p111_shots(os.path.join(tmp_path, 'missing')) == ({}, {})
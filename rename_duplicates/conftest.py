@@ -0,0 +1,16 @@
+''' Helpers shared by the tests
+run using:
+python -m pytest
+'''
+
+import os
+
+
+def make_files(directory, names):
+    # files written a second apart, in the order given, each containing its name
+    os.makedirs(directory, exist_ok=True)
+    for index, name in enumerate(names):
+        filepath = os.path.join(directory, name)
+        with open(filepath, 'w') as segd:
+            segd.write(name)
+        os.utime(filepath, (1000000000 + index, 1000000000 + index))
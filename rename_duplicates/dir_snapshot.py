@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+''' Directory listing in a single os.scandir pass.
+Collects the name, type, size and modification time of every entry in a
+directory without changing the working directory. On the NFS mounted dropboxes
+this replaces an os.path.isfile and an os.path.getmtime call for every file.
+
+Only the listing used by rename_duplicates.py is copied here from
+missing_shots/dir_snapshot.py, which also caches and polls the listings.
+
+Last update: 2023-09-27 Matthew Oppenheim.
+'''
+
+from collections import namedtuple
+import os
+
+# tuple to describe a directory entry: (filename, is a file, size in bytes, modification time)
+Entry = namedtuple('Entry', 'name is_file size mtime')
+
+
+def snapshot(directory):
+    ''' Return a list of Entry for directory.
+    Raises FileNotFoundError if directory does not exist. '''
+    return snapshot_directory(directory)
+
+
+def snapshot_directory(directory):
+    ''' Return a list of Entry for everything in directory.
+    Raises FileNotFoundError if directory does not exist. '''
+    entries = []
+    with os.scandir(directory) as dir_entries:
+        for dir_entry in dir_entries:
+            try:
+                is_file = dir_entry.is_file()
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                # file was removed or renamed during the scan
+                continue
+            entries.append(Entry(dir_entry.name, is_file, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def time_sorted_files(entries):
+    ''' Return the file entries sorted in modification time order. '''
+    files = [entry for entry in entries if entry.is_file]
+    files.sort(key=lambda entry: entry.mtime)
+    return files
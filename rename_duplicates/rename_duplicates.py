@@ -12,26 +12,60 @@ e.g.
 Leave the preceding 'r' as this compensates for the directory / symbols.
 
 Dependancies:
-    missing_shots_dropbox.py
+    dir_snapshot.py
     range_strings.py
+    shot_scan.py
 
 I wrote the above to solve other problems, might as well extend their use.
-Inefficient code as the directory listing is read for each duplicate to create
-a dictionary containing information about each duplicate.
+The duplicates are found from the ShotScan made by scan_shots, in a single
+pass with a set lookup on the shot number, so the directory is only listed once
+however many duplicates there are. The missing shots report is not displayed.
 
-Not yet used in anger. Creates the mv commands and displays them in a logging.info line.
-Tested. Looks good to go.
+By default the mv commands are only displayed in a logging.info line.
 
-Last update: 2023-09-18 Matthew Oppenheim.
+With --execute the renames are done in a pool of --workers threads. Every
+planned rename is written to a JSON lines journal before any file is moved, and
+each rename is added to the journal as it completes or fails:
+
+    {"op": "planned", "source": "/nfs/.../03012.segd", "target": "/nfs/.../03012.segd.bak"}
+    {"op": "renamed", "source": "/nfs/.../03012.segd", "target": "/nfs/.../03012.segd.bak"}
+    {"op": "failed", "source": "/nfs/.../03013.segd", "target": "/nfs/.../03013.segd.bak", "error": "..."}
+
+There is a journal for each sequence folder, named from the sequence and a hash
+of the folder path. If a run is interrupted, running --execute again finishes
+the planned renames from the journal, without listing the directory again. Add
+--rescan to then list the directory for any duplicates left. Failed renames are
+not tried again from the journal.
+
+A file is never renamed over an existing file. The file is linked to the new
+name, which fails if the name exists, then the old name is removed. Where hard
+links are not supported, os.rename is used after checking the new name.
+
+--undo reads the journal and renames the files back, latest rename first.
+
+--abandon marks the planned renames that are not done as abandoned, so they are
+not finished by the next --execute. They are kept in the journal for --undo.
+
+e.g.
+./rename_duplicates.py 38 --execute
+./rename_duplicates.py 38 --execute --rescan
+./rename_duplicates.py 38 --undo
+./rename_duplicates.py 38 --abandon
+
+Last update: 2023-10-22 Matthew Oppenheim.
 '''
 
 import argparse
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import errno
+import hashlib
+import json
 import logging
-from missing_shots_dropbox import MissingShots
 import os
 from pathlib import Path
-from range_strings import find_duplicates, find_missing, get_ranges
+from range_strings import ShotIntervals
+from shot_scan import scan_shots
 import sys
 
 # logging.basicConfig(level=logging.DEBUG, format='%(message)s')
@@ -47,40 +81,188 @@ FILE_SUFFIX = r'.segd'
 
 RENAMED_SUFFIX = r'.bak'
 
+# directory for the journals, one for each sequence
+JOURNAL_DIR = os.path.expanduser('~')
+
+# number of files renamed at the same time
+WORKERS = 8
+
+# errors from os.link on filesystems without hard links, os.rename is used instead
+LINK_UNSUPPORTED = {errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EMLINK}
+
 # tuple to describe duplicate files: (filename, modification time)
 Duplicate = namedtuple("Duplicate", "name mtime")
 
+# tuple to describe a rename: (file path, renamed file path)
+Rename = namedtuple("Rename", "source target")
+
 # reminder for vim key mapping - ignore this
 # nnoremap <leader>r :update<cr>:! %:p
 
-def create_duplicate_dict(directory, duplicates):
-    ''' Create duplicate_dict {shot, [duplicate_tuples]}. '''
+def abandon_renames(journal_filepath):
+    ''' Write abandoned to the journal for each planned rename that is not done,
+    so it is not finished by the next --execute. Returns the number abandoned. '''
+    pending = [rename for rename, op in journal_renames(journal_filepath).items() if op == 'planned']
+    with open_journal(journal_filepath) as journal_file:
+        for rename in pending:
+            write_journal(journal_file, 'abandoned', rename)
+    logging.info('{} planned renames abandoned in {}'.format(len(pending), journal_filepath))
+    return len(pending)
+
+
+def apply_rename(rename, undo=False):
+    ''' Rename source to target, or target to source to undo. Returns None if it is
+    done, or an error message. A rename done before an interruption counts as done.
+    The source is linked to the target, which fails if the target exists, then
+    unlinked, so a file that appears at the target is never replaced. '''
+    source, target = (rename.target, rename.source) if undo else rename
+    if not os.path.exists(source) and os.path.exists(target):
+        return None
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        # interrupted between the link and the unlink
+        if not os.path.samefile(source, target):
+            return 'target exists: {}'.format(target)
+    except OSError as e:
+        if e.errno not in LINK_UNSUPPORTED:
+            return str(e)
+        return rename_file(source, target)
+    try:
+        os.unlink(source)
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def create_duplicate_dict(shot_files, duplicates):
+    ''' Create duplicate_dict {shot, [duplicate_tuples]} from a list of ShotFile. '''
     duplicate_dict = {}
-    for filename in os.listdir(directory):
-        if filename.endswith(FILE_SUFFIX) and any(filename.startswith(str(shot).zfill(5)) for shot in duplicates):
-            filepath = os.path.join(directory, filename)
-            update_duplicate_dict(duplicate_dict, filepath)
+    duplicates = set(duplicates)
+    for shot_file in shot_files:
+        if shot_file.shot in duplicates:
+            update_duplicate_dict(duplicate_dict, shot_file)
     return duplicate_dict
 
 
+def execute_renames(renames, journal_filepath, workers=WORKERS):
+    ''' Write renames to the journal as planned, then rename the files in a thread
+    pool and write each rename to the journal as it completes. Returns the failures. '''
+    with open_journal(journal_filepath) as journal_file:
+        for rename in renames:
+            write_journal(journal_file, 'planned', rename)
+        # the plan is on disk before any file is moved
+        os.fsync(journal_file.fileno())
+        return run_renames(renames, journal_file, workers)
+
+
 def filename_shot(filename):
     ''' Get the shot from the filename. '''
     return str(filename[:5])
 
 
+def journal_path(sequence, directory):
+    ''' Path of the journal for a sequence folder, from the sequence and a hash of
+    the folder path, so each dropbox has its own journal. '''
+    digest = hashlib.sha1(os.path.abspath(directory).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(JOURNAL_DIR, 'rename_duplicates_{}_{}.jsonl'.format(sequence, digest[:12]))
+
+
+def journal_renames(journal_filepath):
+    ''' Return {Rename: last op} from the journal, in the order first planned. '''
+    renames = {}
+    try:
+        with open(journal_filepath, 'r') as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line written when the run was interrupted
+                    continue
+                renames[Rename(record['source'], record['target'])] = record['op']
+    except FileNotFoundError:
+        pass
+    return renames
+
+
+def open_journal(journal_filepath):
+    ''' Open the journal to add lines, after any line cut short by an interruption. '''
+    journal_file = open(journal_filepath, 'a')
+    if journal_file.tell():
+        with open(journal_filepath, 'rb') as journal_end:
+            journal_end.seek(-1, os.SEEK_END)
+            if journal_end.read() != b'\n':
+                journal_file.write('\n')
+    return journal_file
+
+
 def rename_all_duplicates(duplicate_dict, directory):
-    ''' Rename the oldest duplicates for each shot in duplicate_dict. '''
+    ''' Display the mv command for the oldest duplicates for each shot in duplicate_dict.
+    Returns a list of Rename. '''
+    renames = []
     for shot in duplicate_dict.keys():
         oldest_dups = oldest_duplicates(duplicate_dict[shot])
-        rename_shot_duplicates(oldest_dups, directory)
+        renames.extend(rename_shot_duplicates(oldest_dups, directory))
+    return renames
+
+
+def rename_file(source, target):
+    ''' Rename source to target with os.rename, for filesystems without hard links.
+    The target is checked first, but a file can still appear there before the rename.
+    Returns None if it is done, or an error message. '''
+    if os.path.exists(target):
+        return 'target exists: {}'.format(target)
+    try:
+        os.rename(source, target)
+    except OSError as e:
+        return str(e)
+    return None
 
 
 def rename_shot_duplicates(oldest_dups, directory):
-    ''' Rename the filenames in oldest_dups. '''
+    ''' Display the mv command for each filename in oldest_dups. Returns a list of Rename. '''
+    renames = []
     for duplicate in oldest_dups:
         filepath = os.path.join(directory, duplicate.name)
         renamed_filepath = '{}{}'.format(filepath, RENAMED_SUFFIX)
         logging.info('\ncommand: mv {} {}\n'.format(filepath, renamed_filepath))
+        renames.append(Rename(filepath, renamed_filepath))
+    return renames
+
+
+def run_renames(renames, journal_file, workers=WORKERS, undo=False):
+    ''' Apply renames in a thread pool, writing renamed, or undone, to the journal
+    for each one done, and failed, or undo failed, with the error for each one
+    that fails. Only this thread writes to the journal. Returns a list of
+    (Rename, error). '''
+    op = 'undone' if undo else 'renamed'
+    failed_op = 'undo failed' if undo else 'failed'
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(apply_rename, rename, undo): rename for rename in renames}
+        for future in as_completed(futures):
+            rename = futures[future]
+            error = future.result()
+            if error is None:
+                write_journal(journal_file, op, rename)
+            else:
+                logging.info('*** cannot rename {}: {}'.format(rename.source, error))
+                write_journal(journal_file, failed_op, rename, error)
+                failed.append((rename, error))
+    logging.info('{} files {}, {} failed'.format(len(renames) - len(failed), op, len(failed)))
+    return failed
+
+
+def undo_renames(journal_filepath, workers=WORKERS):
+    ''' Rename the files renamed in the journal back again, latest first. Planned and
+    abandoned renames are included, as a run may have been interrupted before a
+    rename was written to the journal, and undo failures are tried again. Returns
+    the failures. '''
+    renames = [rename for rename, op in journal_renames(journal_filepath).items()
+            if op in ('planned', 'renamed', 'abandoned', 'undo failed')]
+    renames.reverse()
+    with open_journal(journal_filepath) as journal_file:
+        return run_renames(renames, journal_file, workers, undo=True)
 
 
 def oldest_duplicates(duplicate_tuple_list):
@@ -94,36 +276,74 @@ def oldest_duplicates(duplicate_tuple_list):
     return oldest_duplicates
 
 
-def update_duplicate_dict(duplicate_dict, filepath):
-    ''' Add Duplicate named tuple to the duplicate_dict for the shot_id in filepath. '''
-    filename = os.path.basename(filepath)
-    shot_id = filename_shot(filename)
-    mtime = os.path.getmtime(filepath)
-    duplicate_tuple = Duplicate(filename, mtime)
-    if shot_id in duplicate_dict:
-        duplicate_dict[shot_id].append(duplicate_tuple)
-    else:
-        duplicate_dict[shot_id] = [duplicate_tuple]
+def update_duplicate_dict(duplicate_dict, shot_file):
+    ''' Add Duplicate named tuple to the duplicate_dict for the shot_id in a ShotFile. '''
+    shot_id = filename_shot(shot_file.name)
+    duplicate_tuple = Duplicate(shot_file.name, shot_file.mtime)
+    duplicate_dict.setdefault(shot_id, []).append(duplicate_tuple)
     return duplicate_dict
 
 
+def write_journal(journal_file, op, rename, error=None):
+    ''' Write a line for a rename to the journal and flush it to disk. '''
+    record = {'op': op, 'source': rename.source, 'target': rename.target}
+    if error is not None:
+        record['error'] = error
+    journal_file.write(json.dumps(record) + '\n')
+    journal_file.flush()
+
+
 def main(directory, args):
-    missing_shots = MissingShots(directory, args)
-    shot_list = missing_shots.shots
-    logging.debug('\nshots: {}'.format(shot_list))
-    duplicate_shots = find_duplicates(shot_list)
-    shot_directory = missing_shots.get_directory_path()
-    duplicate_dict = create_duplicate_dict(shot_directory, duplicate_shots)
-    rename_all_duplicates(duplicate_dict, directory)
+    directory = os.path.join(directory, args.sequence)
+    journal_filepath = args.journal or journal_path(args.sequence, directory)
+    if args.undo:
+        undo_renames(journal_filepath, args.workers)
+        return
+    if args.abandon:
+        abandon_renames(journal_filepath)
+        return
+    if args.execute:
+        # finish an interrupted run from the journal, only list the directory again with --rescan
+        pending = [rename for rename, op in journal_renames(journal_filepath).items() if op == 'planned']
+        if pending:
+            logging.info('finishing {} renames planned in {}'.format(len(pending), journal_filepath))
+            with open_journal(journal_filepath) as journal_file:
+                run_renames(pending, journal_file, args.workers)
+            if not args.rescan:
+                return
+    try:
+        shot_scan = scan_shots(directory)
+    except FileNotFoundError:
+        logging.info('cannot find directory: {}'.format(directory))
+        return
+    logging.info('\nseq {} directory: {}'.format(args.sequence, directory))
+    duplicates = ShotIntervals(shot_scan.duplicates)
+    logging.info('duplicates: {}'.format(duplicates.to_string(shot_scan.incrementing) or 'none'))
+    logging.debug('\nshots: {}'.format(shot_scan.shots))
+    duplicate_dict = create_duplicate_dict(shot_scan.files, duplicates)
+    renames = rename_all_duplicates(duplicate_dict, shot_scan.directory)
     logging.debug('duplicate_dict: {}'.format(duplicate_dict))
+    if args.execute and renames:
+        execute_renames(renames, journal_filepath, args.workers)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('sequence', type=str, help='sequence(s) to find missing shots, can be a range')
     parser.add_argument('dir', nargs='?', type=str, default=DROPBOX, help='directory to look for duplicates in')
+    parser.add_argument('--execute', action='store_true',
+            help='rename the duplicates, writing each rename to the journal, or finish an interrupted run')
+    parser.add_argument('--rescan', action='store_true',
+            help='after finishing an interrupted run, list the directory again for any duplicates left')
+    parser.add_argument('--undo', action='store_true', help='rename the files in the journal back again')
+    parser.add_argument('--abandon', action='store_true',
+            help='mark the planned renames that are not done as abandoned, so --execute does not finish them')
+    parser.add_argument('--journal', type=str, default=None,
+            help='journal file, default rename_duplicates_<sequence>_<folder hash>.jsonl in the home directory')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of files renamed at the same time')
     # comment out the following line for testing
     args = parser.parse_args()
     # uncomment the line below for testing
-    # args = argparse.Namespace(sequence=SEQ)
+    # args = argparse.Namespace(sequence=SEQ, execute=False, rescan=False, undo=False, abandon=False,
+    #     journal=None, workers=WORKERS)
     main(DROPBOX, args)
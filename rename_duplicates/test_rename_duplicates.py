@@ -0,0 +1,118 @@
+''' Tests for rename_duplicates.py
+run using:
+python -m pytest test_rename_duplicates.py
+'''
+
+import argparse
+from conftest import make_files
+import json
+import os
+from rename_duplicates import *
+
+
+def make_args(tmp_path, **options):
+    return argparse.Namespace(**{'sequence': '38', 'execute': False, 'rescan': False, 'undo': False, 'abandon': False,
+        'journal': str(tmp_path / 'journal.jsonl'), 'workers': 2, **options})
+
+
+def read_journal(args):
+    # (op, source file name) for each whole line in the journal
+    ops = []
+    with open(args.journal) as journal_file:
+        for line in journal_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            ops.append((record['op'], os.path.basename(record['source'])))
+    return ops
+
+
+def test_journal_path():
+    assert journal_path('38', '/nfs/dropbox01/dropobp/38') != journal_path('38', '/nfs/dropbox02/dropobp/38')
+    assert os.path.basename(journal_path('38', '/nfs/dropbox02/dropobp/38')).startswith('rename_duplicates_38_')
+
+
+def test_execute_undo(tmp_path):
+    sequence = str(tmp_path / '38')
+    make_files(sequence, ['01001.segd', '01002_old.segd', '01002.segd', '01003.segd'])
+    args = make_args(tmp_path)
+    main(str(tmp_path), args)
+    assert not os.path.exists(args.journal)
+    main(str(tmp_path), make_args(tmp_path, execute=True))
+    assert sorted(os.listdir(sequence)) == ['01001.segd', '01002.segd', '01002_old.segd.bak', '01003.segd']
+    assert read_journal(args) == [('planned', '01002_old.segd'), ('renamed', '01002_old.segd')]
+    main(str(tmp_path), make_args(tmp_path, undo=True))
+    assert sorted(os.listdir(sequence)) == ['01001.segd', '01002.segd', '01002_old.segd', '01003.segd']
+    assert read_journal(args)[-1] == ('undone', '01002_old.segd')
+
+
+def test_execute_resume(tmp_path):
+    sequence = str(tmp_path / '38')
+    make_files(sequence, ['01001_old.segd', '01001.segd', '01002_old.segd', '01002.segd', '01003_old.segd',
+        '01003.segd', '01004_old.segd', '01004.segd'])
+    args = make_args(tmp_path, execute=True)
+    renames = [Rename(os.path.join(sequence, name), os.path.join(sequence, name + RENAMED_SUFFIX))
+            for name in ['01001_old.segd', '01002_old.segd', '01003_old.segd']]
+    # interrupted after renaming 01001, and between the link and unlink of 01002
+    with open(args.journal, 'w') as journal_file:
+        for rename in renames:
+            write_journal(journal_file, 'planned', rename)
+        journal_file.write('{"op": "renamed", "sou')
+    os.rename(renames[0].source, renames[0].target)
+    os.link(renames[1].source, renames[1].target)
+    main(str(tmp_path), args)
+    # the planned renames are finished, the directory is not listed again
+    assert sorted(os.listdir(sequence)) == ['01001.segd', '01001_old.segd.bak', '01002.segd', '01002_old.segd.bak',
+        '01003.segd', '01003_old.segd.bak', '01004.segd', '01004_old.segd']
+    ops = read_journal(args)
+    assert sorted(ops[3:]) == [('renamed', '01001_old.segd'), ('renamed', '01002_old.segd'),
+        ('renamed', '01003_old.segd')]
+
+
+def test_execute_resume_rescan(tmp_path):
+    sequence = str(tmp_path / '38')
+    make_files(sequence, ['01001_old.segd', '01001.segd', '01002_old.segd', '01002.segd'])
+    args = make_args(tmp_path, execute=True, rescan=True)
+    rename = Rename(os.path.join(sequence, '01001_old.segd'), os.path.join(sequence, '01001_old.segd.bak'))
+    with open(args.journal, 'w') as journal_file:
+        write_journal(journal_file, 'planned', rename)
+    main(str(tmp_path), args)
+    # the planned rename is finished, then 01002 is found by listing the directory
+    assert sorted(os.listdir(sequence)) == ['01001.segd', '01001_old.segd.bak', '01002.segd', '01002_old.segd.bak']
+    assert read_journal(args)[1:] == [('renamed', '01001_old.segd'), ('planned', '01002_old.segd'),
+        ('renamed', '01002_old.segd')]
+
+
+def test_execute_failed_abandon(tmp_path):
+    sequence = str(tmp_path / '38')
+    make_files(sequence, ['01001_old.segd', '01001_old.segd.bak', '01001.segd'])
+    args = make_args(tmp_path, execute=True)
+    main(str(tmp_path), args)
+    # never renamed over an existing file, the failure is in the journal
+    with open(os.path.join(sequence, '01001_old.segd.bak')) as segd:
+        assert segd.read() == '01001_old.segd.bak'
+    assert read_journal(args) == [('planned', '01001_old.segd'), ('failed', '01001_old.segd')]
+    rename = Rename(os.path.join(sequence, '01001_old.segd'), os.path.join(sequence, '01001_old.segd.bak'))
+    assert apply_rename(rename) == 'target exists: {}'.format(rename.target)
+    # a stuck plan is abandoned, and not finished by the next run
+    os.remove(os.path.join(sequence, '01001.segd'))
+    with open_journal(args.journal) as journal_file:
+        write_journal(journal_file, 'planned', rename)
+    assert abandon_renames(args.journal) == 1
+    os.remove(rename.target)
+    main(str(tmp_path), args)
+    assert sorted(os.listdir(sequence)) == ['01001_old.segd']
+    assert read_journal(args)[-1] == ('abandoned', '01001_old.segd')
+
+
+def test_apply_rename_without_links(tmp_path, monkeypatch):
+    def no_link(source, target):
+        raise PermissionError(errno.EPERM, 'links not supported')
+    monkeypatch.setattr(os, 'link', no_link)
+    make_files(str(tmp_path), ['01001.segd', '01002.segd'])
+    rename = Rename(str(tmp_path / '01001.segd'), str(tmp_path / '01001.segd.bak'))
+    assert apply_rename(rename) is None
+    assert apply_rename(rename, undo=True) is None
+    assert apply_rename(Rename(str(tmp_path / '01001.segd'), str(tmp_path / '01002.segd'))).startswith('target exists')
+    assert sorted(os.listdir(tmp_path)) == ['01001.segd', '01002.segd']
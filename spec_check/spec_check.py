@@ -42,9 +42,11 @@ Last update: 2023_09_07 Matthew Oppenheim
 '''
 
 import argparse
+import bisect
 from collections import namedtuple
 import logging
 import os
+from range_strings import ShotIntervals, parse_ranges
 # Subs creates line information tuples from the substitutions.csv file
 from substitutions import Subs
 import sys
@@ -95,13 +97,21 @@ def check_survey_spec(percentage_bad):
         percentage_bad))
 
 
+def count_bad_shots_below(ranges, totals, shot):
+    ''' Count the bad shots below <shot> in the merged (first, last) <ranges>.
+    totals[i] is the number of bad shots in ranges[:i]. '''
+    index = bisect.bisect_left(ranges, (shot,))
+    if index == 0:
+        return 0
+    first, last = ranges[index-1]
+    return totals[index-1] + min(last, shot-1) - first + 1
+
+
 def expand_ranges(edits_list):
     ''' Expand shot ranges to a list of individual shots. '''
     shot_list = []
-    for edit in edits_list:
-        edit = str(edit)
-        shot_range = [int(x) for x in list(edit.split('-'))]
-        shot_list += ([a for a in range(min(shot_range), max(shot_range)+1)])
+    for first, last in parse_ranges(edits_list):
+        shot_list.extend(range(first, last+1))
     return shot_list
 
 
@@ -150,22 +160,40 @@ def read_edits_file(sequence):
 
 
 def single_spec_check(spec_for_bad, range_to_check, bad_shots):
-    ''' Checks if <spec_for_bad> bad shots over <range_to_check> shots in <bad_shots> is in spec. '''
-    tests_pass = True
+    ''' Checks if <spec_for_bad> bad shots over <range_to_check> shots in <bad_shots> is in spec.
+    bad_shots is a list of shots and ranges, e.g. ['1-2', 10, '60-57'], which are not expanded. '''
     logging.debug('spec_for_bad: {} range_to_check: {} bad_shots: {}'.format(spec_for_bad, range_to_check, bad_shots))
     logging.info('checking for {} bad shots in {} shots'.format(spec_for_bad, range_to_check))
-    bad_shots.sort()
-    for bad_shot in bad_shots:
-        test_range = range(bad_shot, bad_shot+range_to_check)
-        # find where the bad shots are in the range of shots we are testing over
-        bad_shots_in_test_range = intersect(test_range, bad_shots)
-        num_bad_shots = len(bad_shots_in_test_range)
+    ranges = ShotIntervals(parse_ranges(bad_shots)).ranges
+    totals = [0]
+    for first, last in ranges:
+        totals.append(totals[-1] + last - first + 1)
+    # the number of bad shots in the window starting at a shot only changes its
+    # slope where the window start or end crosses the start or end of a range
+    breaks = set()
+    for first, last in ranges:
+        breaks.update((first, last+1, first-range_to_check, last+1-range_to_check))
+    breaks = sorted(breaks)
+    failed_ranges = []
+    for start, end in zip(breaks, breaks[1:]):
+        # windows are only checked from bad shots
+        if not count_bad_shots_below(ranges, totals, start+1) - count_bad_shots_below(ranges, totals, start):
+            continue
+        num_bad_shots = count_bad_shots_below(ranges, totals, start+range_to_check) - \
+            count_bad_shots_below(ranges, totals, start)
         if num_bad_shots < spec_for_bad:
-            logging.debug('test passes at SP: {}'.format(bad_shot))
+            continue
+        # the window loses a bad shot at its start each step, and gains one at its
+        # end if that is also bad
+        if count_bad_shots_below(ranges, totals, start+range_to_check+1) - \
+            count_bad_shots_below(ranges, totals, start+range_to_check):
+            failed_ranges.append((start, end-1))
         else:
-            logging.info('*** fail shot {}: bad_shots: {}'.format(bad_shot, num_bad_shots))
-            tests_pass = False
-    return tests_pass
+            failed_ranges.append((start, min(end-1, start + num_bad_shots - spec_for_bad)))
+    # a long hard edit fails at every shot, so report the failures as ranges
+    if failed_ranges:
+        logging.info('*** fail shots: {}'.format(ShotIntervals(failed_ranges).to_string()))
+    return not failed_ranges
 
 
 def spec_check_all_sequences(subs_tuples, spec_tuples):
@@ -197,10 +225,8 @@ def spec_check_all_sequences(subs_tuples, spec_tuples):
 
 def spec_check_single_line(bad_shots, spec_tuples_list):
     ''' Check if <bad_shots> list is out of spec for the list of specs in spec_tuples_list. '''
-    bad_shots = expand_ranges(bad_shots)
-    bad_shots.sort()
     logging.debug('total edits: {}'.format(len(bad_shots)))
-    logging.debug('checking for bad edits in sorted list:\n{}'.format(bad_shots))
+    logging.debug('checking for bad edits in list:\n{}'.format(bad_shots))
     for illegal_bad, check_range in spec_tuples_list:
         test_passed = single_spec_check(illegal_bad, check_range, bad_shots)
         if test_passed:
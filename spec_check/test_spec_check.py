@@ -32,6 +32,9 @@ EXPANDED_EDIT_LIST_1 = [1, 2, 10, 12, 4, 5]
 EDIT_LIST_2 = []
 EXPANDED_EDIT_LIST_2 = []
 
+EDIT_LIST_3 = ['60-57', 3]
+EXPANDED_EDIT_LIST_3 = [57, 58, 59, 60, 3]
+
 
 @pytest.mark.parametrize('subs_tuple, expected',[(SUBS_TUPLE_1, 296), (SUBS_TUPLE_2, 1)])
 def test_total_line_shots(subs_tuple, expected):
@@ -39,7 +42,7 @@ def test_total_line_shots(subs_tuple, expected):
 
 
 @pytest.mark.parametrize('edits_list, expected', [(EDIT_LIST_1, EXPANDED_EDIT_LIST_1),
-    (EDIT_LIST_2, EXPANDED_EDIT_LIST_2)])
+    (EDIT_LIST_2, EXPANDED_EDIT_LIST_2), (EDIT_LIST_3, EXPANDED_EDIT_LIST_3)])
 def test_expand_ranges(edits_list, expected):
     assert expand_ranges(edits_list) == expected
 
@@ -66,3 +69,10 @@ def test_single_spec_check(spec_for_bad, range_to_check, bad_shots, expected):
     assert single_spec_check(spec_for_bad, range_to_check, bad_shots) == expected
 
 
+def test_single_spec_check_hard_edit():
+    assert single_spec_check(SPEC_TUPLE_1[0], SPEC_TUPLE_1[1], ['1-100000']) == False
+
+
+def test_single_spec_check_ranges():
+    assert single_spec_check(SPEC_TUPLE_1[0], SPEC_TUPLE_1[1], ['7-1', 9, '20']) == False
+    assert single_spec_check(SPEC_TUPLE_1[0], SPEC_TUPLE_1[1], ['3-1', 9, '20']) == True